@@ -1,3 +1,9 @@
+import itertools
+
+import torch
+
+from rob831.infrastructure import pytorch_util as ptu
+from rob831.infrastructure.device_dataset import DeviceDataset
 from rob831.infrastructure.replay_buffer import ReplayBuffer
 from rob831.policies.MLP_policy import MLPPolicySL
 from .base_agent import BaseAgent
@@ -23,6 +29,8 @@ class BCAgent(BaseAgent):
 
         # replay buffer
         self.replay_buffer = ReplayBuffer(self.agent_params['max_replay_buffer_size'])
+        # device copy of the buffer, used by train_epochs
+        self.dataset = DeviceDataset()
 
     def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
         # training a BC agent refers to updating its actor using
@@ -30,6 +38,36 @@ class BCAgent(BaseAgent):
         log = self.actor.update(ob_no, ac_na)  # HW1: you will modify this
         return log
 
+    def train_epochs(self, batch_size, num_steps=None, num_epochs=None, grad_accum_steps=1):
+        """
+        Trains on shuffled passes over the whole replay buffer, which is kept
+        on the device, instead of on independently sampled batches.
+
+        Each optimizer step accumulates gradients over grad_accum_steps
+        minibatches of batch_size, so the effective batch size is their
+        product. Runs num_steps optimizer steps, or num_epochs full passes if
+        num_steps is None. Losses are copied to the host once, at the end.
+        """
+        self.dataset.sync(self.replay_buffer)
+        # equal-sized minibatches, so that scaling each loss by 1/grad_accum_steps is exact
+        drop_last = len(self.dataset) >= batch_size
+        batches_per_epoch = len(self.dataset) // batch_size if drop_last else 1
+        if num_steps is None:
+            num_steps = max(1, num_epochs * batches_per_epoch // grad_accum_steps)
+
+        minibatches = itertools.chain.from_iterable(
+            self.dataset.iterate_epoch(batch_size, drop_last=drop_last) for _ in itertools.count())
+        losses = []
+        for _ in range(num_steps):
+            self.actor.optimizer.zero_grad()
+            loss = 0
+            for ob_batch, ac_batch in itertools.islice(minibatches, grad_accum_steps):
+                loss = loss + self.actor.accumulate_gradients(
+                    ob_batch, ac_batch, loss_scale=1.0 / grad_accum_steps)
+            self.actor.optimizer.step()
+            losses.append(loss / grad_accum_steps)
+        return [{'Training Loss': loss} for loss in ptu.to_numpy(torch.stack(losses))]
+
     def add_to_replay_buffer(self, paths):
         self.replay_buffer.add_rollouts(paths)
 
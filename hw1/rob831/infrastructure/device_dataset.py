@@ -0,0 +1,55 @@
+import numpy as np
+import torch
+
+from rob831.infrastructure import pytorch_util as ptu
+
+
+class DeviceDataset(object):
+    """
+    Observations and action labels of a ReplayBuffer, kept on ptu.device.
+
+    sync() uploads only the rows added since the last call (through pinned
+    memory on a GPU), and iterate_epoch() shuffles on the device, so a
+    training epoch makes no host-to-device copies at all.
+    """
+
+    def __init__(self):
+        self.obs = None
+        self.acs = None
+
+    def __len__(self):
+        return 0 if self.obs is None else self.obs.shape[0]
+
+    @staticmethod
+    def _upload(array):
+        if not array.flags.writeable:
+            # e.g. a memory-mapped ColumnarDataset; torch tensors must own writable memory
+            array = np.array(array)
+        tensor = torch.from_numpy(array).float()
+        if ptu.device.type == 'cuda':
+            return tensor.pin_memory().to(ptu.device, non_blocking=True)
+        return tensor.to(ptu.device)
+
+    def sync(self, replay_buffer):
+        """Mirrors replay_buffer.obs / replay_buffer.acs on the device"""
+        num_rows = len(replay_buffer)
+        if self.obs is not None and len(self) <= num_rows < replay_buffer.max_size:
+            # the buffer has only grown since the last sync: append the new rows
+            num_synced = len(self)
+            self.obs = torch.cat([self.obs, self._upload(replay_buffer.obs[num_synced:])])
+            self.acs = torch.cat([self.acs, self._upload(replay_buffer.acs[num_synced:])])
+        else:
+            # first sync, or the buffer is full and old rows have been dropped
+            self.obs = self._upload(replay_buffer.obs)
+            self.acs = self._upload(replay_buffer.acs)
+
+    def iterate_epoch(self, batch_size, drop_last=False):
+        """
+        Yields (ob, ac) minibatches that cover the dataset once, in random order.
+        The data is permuted with one gather, so every minibatch is a view.
+        """
+        permutation = torch.randperm(len(self), device=self.obs.device)
+        obs, acs = self.obs[permutation], self.acs[permutation]
+        end = len(self) - len(self) % batch_size if drop_last else len(self)
+        for start in range(0, end, batch_size):
+            yield obs[start:start + batch_size], acs[start:start + batch_size]
@@ -0,0 +1,71 @@
+import queue
+import threading
+
+import numpy as np
+import torch
+
+
+def relabel_paths(expert_policy, paths, chunk_size=None):
+    """
+    Replaces paths[i]["action"] with the expert's actions for paths[i]["observation"].
+
+    The observations of all paths go through the expert together, in
+    forward passes of at most chunk_size rows (one pass if None), and the
+    actions are split back by path offsets.
+    """
+    if len(paths) == 0:
+        return paths
+    observations = np.concatenate([path["observation"] for path in paths])
+    chunk_size = chunk_size or len(observations)
+    with torch.no_grad():
+        actions = np.concatenate([
+            expert_policy.get_action(observations[start:start + chunk_size])
+            for start in range(0, len(observations), chunk_size)
+        ])
+    offsets = np.cumsum([len(path["observation"]) for path in paths])[:-1]
+    for path, path_actions in zip(paths, np.split(actions, offsets)):
+        path["action"] = path_actions
+    return paths
+
+
+class BackgroundRelabeler(object):
+    """
+    Relabels paths on a worker thread as they are submitted, e.g. each
+    rollout as soon as sample_trajectories finishes it, so that labeling
+    overlaps with collecting the rest of the batch. Paths submitted while
+    the worker is busy are relabeled together in the next batched pass.
+    """
+
+    def __init__(self, expert_policy, chunk_size=None):
+        self.expert_policy = expert_policy
+        self.chunk_size = chunk_size
+        self.pending = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            paths = [self.pending.get()]
+            while True:
+                try:
+                    paths.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self.error is None:
+                    relabel_paths(self.expert_policy, paths, self.chunk_size)
+            except Exception as e:
+                self.error = e
+            for _ in paths:
+                self.pending.task_done()
+
+    def submit(self, path):
+        self.pending.put(path)
+
+    def wait(self):
+        """Blocks until every submitted path has been relabeled"""
+        self.pending.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
@@ -1,3 +1,4 @@
+from rob831.infrastructure.sampler import EpochSampler, sample_without_replacement
 from rob831.infrastructure.utils import *
 
 
@@ -76,27 +77,25 @@ class ReplayBuffer(object):
                 == self.terminals.shape[0]
         )
 
-        ## TODO return batch_size number of random entries from each of the 5 component arrays above [OK]
-        ## HINT 1: use np.random.permutation to sample random indices
-        ## HINT 2: return corresponding data points from each array (i.e., not different indices from each array)
-        ## HINT 3: look at the sample_recent_data function below
+        # batch_size distinct indices in O(batch_size), however large the buffer;
+        # a batch_size larger than the buffer returns every entry once
+        random_indices = sample_without_replacement(self.obs.shape[0], batch_size)
+        return self._gather(random_indices)
 
-        # total sizes
-        total_size = self.obs.shape[0]
-        
-        # handle the problem if batch_size is larger than total_size
-        actual_batch_size = min(batch_size, total_size)
-        random_indices = np.random.permutation(total_size)[:actual_batch_size]
-        
-        # return the corresponding data points from each array
+    def _gather(self, indices):
         return (
-            self.obs[random_indices],
-            self.acs[random_indices], 
-            self.rews[random_indices],
-            self.next_obs[random_indices],
-            self.terminals[random_indices],
+            self.obs[indices],
+            self.acs[indices],
+            self.rews[indices],
+            self.next_obs[indices],
+            self.terminals[indices],
         )
 
+    def iterate_epoch(self, batch_size, shuffle=True):
+        """Yields batches that together cover every stored transition exactly once"""
+        for indices in EpochSampler(self.obs.shape[0], batch_size, shuffle=shuffle):
+            yield self._gather(indices)
+
 
     def sample_recent_data(self, batch_size=1):
         return (
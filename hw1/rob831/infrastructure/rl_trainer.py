@@ -8,6 +8,8 @@ import torch
 from rob831.infrastructure import pytorch_util as ptu
 from rob831.infrastructure.logger import Logger
 from rob831.infrastructure import utils
+from rob831.infrastructure.columnar_dataset import load_paths
+from rob831.infrastructure.expert_relabeler import BackgroundRelabeler, relabel_paths
 import pickle 
 
 # how many rollouts to save as videos to tensorboard
@@ -94,6 +96,7 @@ class RL_Trainer(object):
 
         # init vars at beginning of training
         self.total_envsteps = 0
+        self.relabeler = None
         self.start_time = time.time()
 
         for itr in range(n_iter):
@@ -111,18 +114,30 @@ class RL_Trainer(object):
             else:
                 self.log_metrics = False
 
+            # with background relabeling, each collected rollout is handed to the
+            # expert as soon as it is finished, while the next ones are collected
+            relabel = relabel_with_expert and itr>=start_relabel_with_expert
+            relabeler = None
+            if relabel and self.params.get('background_relabel'):
+                if self.relabeler is None:
+                    self.relabeler = BackgroundRelabeler(expert_policy, self.params.get('relabel_chunk_size'))
+                relabeler = self.relabeler
+
             # collect trajectories, to be used for training
             training_returns = self.collect_training_trajectories(
                 itr,
                 initial_expertdata,
                 collect_policy,
-                self.params['batch_size']
+                self.params['batch_size'],
+                path_callback=relabeler.submit if relabeler is not None else None,
             )  # HW1: implement this function below (X)
             paths, envsteps_this_batch, train_video_paths = training_returns
             self.total_envsteps += envsteps_this_batch
 
             # relabel the collected obs with actions from a provided expert policy
-            if relabel_with_expert and itr>=start_relabel_with_expert:
+            if relabeler is not None:
+                relabeler.wait()
+            elif relabel:
                 paths = self.do_relabel_with_expert(expert_policy, paths)  # HW1: implement this function below
 
             # add collected data to replay buffer
@@ -153,12 +168,14 @@ class RL_Trainer(object):
             load_initial_expertdata,
             collect_policy,
             batch_size,
+            path_callback=None,
     ):
         """
         :param itr:
         :param load_initial_expertdata:  path to expert data pkl file
         :param collect_policy:  the current policy using which we collect data
         :param batch_size:  the number of transitions we collect
+        :param path_callback:  called on each newly collected rollout (not on loaded expert data)
         :return:
             paths: a list trajectories
             envsteps_this_batch: the sum over the numbers of environment steps in paths
@@ -176,8 +193,8 @@ class RL_Trainer(object):
             if load_initial_expertdata != None:
                 # Load the expert data from file
                 print(f"\nLoading expert data from {load_initial_expertdata}")
-                with open(load_initial_expertdata, 'rb') as f:
-                    loaded_paths = pickle.load(f)
+                # a pickle of paths, or a columnar dataset directory (memory-mapped)
+                loaded_paths = load_paths(load_initial_expertdata)
                 
                 # No environment steps taken this batch (just loading data)
                 envsteps_this_batch = 0
@@ -194,7 +211,7 @@ class RL_Trainer(object):
         # HINT2: you want each of these collected rollouts to be of length self.params['ep_len']
         print("\nCollecting data to be used for training...")
         paths, envsteps_this_batch = utils.sample_trajectories(self.env, collect_policy, batch_size,
-                                                               self.params['ep_len'])
+                                                               self.params['ep_len'], path_callback=path_callback)
 
         # collect more rollouts with the same policy, to be saved as videos in tensorboard
         # note: here, we collect MAX_NVIDEO rollouts, each of length MAX_VIDEO_LEN
@@ -208,6 +225,15 @@ class RL_Trainer(object):
 
 
     def train_agent(self):
+        if self.params.get('epoch_training'):
+            print('\nTraining agent on full epochs of the replay buffer...')
+            return self.agent.train_epochs(
+                self.params['train_batch_size'],
+                num_steps=None if self.params['num_epochs_per_iter'] else self.params['num_agent_train_steps_per_iter'],
+                num_epochs=self.params['num_epochs_per_iter'],
+                grad_accum_steps=self.params['grad_accum_steps'],
+            )
+
         print('\nTraining agent using sampled data from replay buffer...')
         all_logs = []
         for train_step in range(self.params['num_agent_train_steps_per_iter']):
@@ -231,10 +257,8 @@ class RL_Trainer(object):
         # HINT: query the policy (using the get_action function) with paths[i]["observation"]
         # and replace paths[i]["action"] with these expert labels
         # 这里的专家不再是之前的那个数据里的专家了 而是用expert——policy 另外一个pkl生成的神经网络来动态生成这个ob下该怎么做
-        for i in range(len(paths)):   
-            ob = paths[i]["observation"]
-            ac = expert_policy.get_action(ob)
-            paths[i]["action"] = ac
+        # all paths are labeled by one batched expert pass (chunked by relabel_chunk_size)
+        relabel_paths(expert_policy, paths, self.params.get('relabel_chunk_size'))
 
         return paths
 
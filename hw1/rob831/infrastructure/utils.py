@@ -1,6 +1,8 @@
 import numpy as np
 import time
 
+from rob831.infrastructure.columnar_dataset import ColumnarDataset
+
 ############################################
 ############################################
 
@@ -50,9 +52,11 @@ def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('
 
     return Path(obs, image_obs, acs, rewards, next_obs, terminals)
 
-def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, render=False, render_mode=('rgb_array')):
+def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, render=False, render_mode=('rgb_array'),
+                        path_callback=None):
     """
         Collect rollouts until we have collected min_timesteps_per_batch steps.
+        If given, path_callback(path) is called as soon as each rollout is finished.
 
         TODO implement this function (X)
         Hint1: use sample_trajectory to get each path (i.e. rollout) that goes into paths
@@ -64,6 +68,8 @@ def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, r
         
         path = sample_trajectory(env, policy, max_path_length, render,render_mode)
         paths.append(path)
+        if path_callback is not None:
+            path_callback(path)
         timesteps_this_batch += get_pathlength(path)
 
     return paths, timesteps_this_batch
@@ -108,6 +114,11 @@ def convert_listofrollouts(paths, concat_rew=True):
         and return separate arrays,
         where each array is a concatenation of that array from across the rollouts
     """
+    if isinstance(paths, ColumnarDataset):
+        # already concatenated (and memory-mapped): no copies
+        columns = paths.columns
+        rewards = columns["reward"] if concat_rew else paths.split_by_path("reward")
+        return columns["observation"], columns["action"], rewards, columns["next_observation"], columns["terminal"]
     observations = np.concatenate([path["observation"] for path in paths])
     actions = np.concatenate([path["action"] for path in paths])
     if concat_rew:
@@ -123,10 +123,25 @@ class MLPPolicySL(MLPPolicy):
             adv_n=None, acs_labels_na=None, qvals=None
     ):
         # TODO: update the policy and return the loss [X]
-        observations = ptu.from_numpy(observations)
+        self.optimizer.zero_grad()
+        loss = self.accumulate_gradients(observations, actions)
+        self.optimizer.step()
+
+        return {
+            # You can add extra logging information here, but keep this line
+            'Training Loss': ptu.to_numpy(loss),
+        }
+
+    def accumulate_gradients(self, observations, actions, loss_scale=1.0):
+        """
+        Adds loss_scale * grad(loss) to the parameters' .grad without stepping
+        the optimizer, and returns the (unscaled, detached) loss.
+        Takes numpy arrays or tensors that are already on ptu.device.
+        """
+        observations = ptu.as_tensor(observations)
+        actions = ptu.as_tensor(actions)
         # Get predicted action distribution and sample from it
         predicted_action_dist = self.forward(observations)
-        actions = ptu.from_numpy(actions)
         if self.discrete:
             log_prob = predicted_action_dist.log_prob(actions)
             loss = -log_prob.mean()
@@ -134,13 +149,6 @@ class MLPPolicySL(MLPPolicy):
             predicted_actions = predicted_action_dist.rsample()  # rsample preserves gradients
             # Compute MSE loss between predicted and actual actions
             loss = self.loss(predicted_actions, actions)
-        
-        # Perform gradient update
-        self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
 
-        return {
-            # You can add extra logging information here, but keep this line
-            'Training Loss': ptu.to_numpy(loss),
-        }
+        (loss * loss_scale).backward()
+        return loss.detach()
@@ -2,6 +2,7 @@ import numpy as np
 
 from rob831.infrastructure import pytorch_util as ptu
 from .base_policy import BasePolicy
+from .numpy_gaussian_policy import NumpyGaussianPolicy, load_expert_layers
 from torch import nn
 import torch
 import pickle
@@ -103,3 +104,59 @@ class LoadedGaussianPolicy(BasePolicy, nn.Module):
 
     def save(self, filepath):
         torch.save(self.state_dict(), filepath)
+
+
+class FrozenGaussianPolicy(BasePolicy, nn.Module):
+    """
+    Inference-only version of LoadedGaussianPolicy: the observation
+    normalization is folded into the first layer, the weights are
+    parameters with requires_grad=False, and actions are computed under
+    torch.inference_mode(). script=True additionally freezes the network
+    as a TorchScript module; TorchScript is deprecated in recent torch
+    releases, so it is off by default.
+    """
+
+    def __init__(self, filename, script=False, **kwargs):
+        super().__init__(**kwargs)
+        self.nonlin_type, layers = load_expert_layers(filename)
+        if self.nonlin_type == 'lrelu':
+            non_lin = nn.LeakyReLU(0.01)
+        elif self.nonlin_type == 'tanh':
+            non_lin = nn.Tanh()
+        else:
+            raise NotImplementedError()
+
+        modules = []
+        for W, b in layers:
+            linear_layer = nn.Linear(*W.shape)
+            linear_layer.weight = nn.Parameter(torch.from_numpy(W.T.copy()), requires_grad=False)
+            linear_layer.bias = nn.Parameter(torch.from_numpy(b[0].copy()), requires_grad=False)
+            modules += [linear_layer, non_lin]
+        net = nn.Sequential(*modules[:-1]).to(ptu.device).eval()
+        self.net = torch.jit.freeze(torch.jit.script(net)) if script else net
+
+    def forward(self, obs):
+        return self.net(obs)
+
+    def update(self, obs_no, acs_na, adv_n=None, acs_labels_na=None):
+        raise NotImplementedError('expert policies are loaded, not trained')
+
+    def get_action(self, obs):
+        if len(obs.shape) == 1:
+            obs = obs[None, :]
+        with torch.inference_mode():
+            return ptu.to_numpy(self.net(ptu.from_numpy(np.asarray(obs, dtype=np.float32))))
+
+    def save(self, filepath):
+        torch.save(self.state_dict(), filepath)
+
+
+def load_expert_policy(filename, backend='torch'):
+    """backend: 'torch' (LoadedGaussianPolicy), 'frozen' (FrozenGaussianPolicy) or 'numpy'"""
+    if backend == 'torch':
+        return LoadedGaussianPolicy(filename)
+    if backend == 'frozen':
+        return FrozenGaussianPolicy(filename)
+    if backend == 'numpy':
+        return NumpyGaussianPolicy(filename)
+    raise ValueError('unknown expert backend: {}'.format(backend))
@@ -0,0 +1,64 @@
+"""
+Torch-free expert inference, e.g. for rollout workers that only need to
+query an expert. Imports nothing but numpy.
+"""
+import pickle
+
+import numpy as np
+
+from .base_policy import BasePolicy
+
+
+def load_expert_layers(filename):
+    """
+    Reads an expert pickle and returns (nonlin_type, layers), where layers is
+    a list of float32 (W, b) with y = x @ W + b, and the observation
+    normalization (obs - mean) / (std + 1e-6) already folded into the first layer.
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.loads(f.read())
+    nonlin_type = data['nonlin_type']
+    params = data['GaussianPolicy']
+
+    standardizer = params['obsnorm']['Standardizer']
+    mean = standardizer['mean_1_D'].astype(np.float64)
+    std = np.sqrt(np.maximum(0, standardizer['meansq_1_D'] - np.square(mean))) + 1e-6
+
+    hidden = params['hidden']['FeedforwardNet']
+    layers = [hidden[name]['AffineLayer'] for name in sorted(hidden.keys())]
+    layers.append(params['out']['AffineLayer'])
+    layers = [(layer['W'].astype(np.float64), layer['b'].astype(np.float64)) for layer in layers]
+
+    # ((x - mean) / std) @ W + b == x @ (W / std^T) + (b - (mean / std) @ W)
+    W, b = layers[0]
+    layers[0] = (W / std.T, b - (mean / std) @ W)
+    return nonlin_type, [(W.astype(np.float32), b.astype(np.float32)) for W, b in layers]
+
+
+class NumpyGaussianPolicy(BasePolicy):
+    """Deterministic (mean) actions of an expert pickle, computed in numpy"""
+
+    def __init__(self, filename):
+        self.nonlin_type, self.layers = load_expert_layers(filename)
+        if self.nonlin_type not in ('lrelu', 'tanh'):
+            raise NotImplementedError()
+
+    def _non_lin(self, h):
+        if self.nonlin_type == 'lrelu':
+            return np.maximum(h, 0.01 * h)
+        return np.tanh(h, out=h)
+
+    def get_action(self, obs):
+        h = np.asarray(obs, dtype=np.float32)
+        if h.ndim == 1:
+            h = h[None]
+        for W, b in self.layers[:-1]:
+            h = self._non_lin(h @ W + b)
+        W, b = self.layers[-1]
+        return h @ W + b
+
+    def update(self, obs_no, acs_na, adv_n=None, acs_labels_na=None):
+        raise NotImplementedError('expert policies are loaded, not trained')
+
+    def save(self, filepath):
+        raise NotImplementedError('expert policies are loaded, not trained')
@@ -0,0 +1,46 @@
+"""
+Time per sample_random_data batch as the replay buffer grows, for the old
+full-permutation draw and the O(batch_size) samplers.
+
+    python rob831/scripts/benchmark_sampling.py --batch_size 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rob831.infrastructure.sampler import sample_with_replacement, sample_without_replacement
+
+
+def permutation_draw(num_items, batch_size):
+    return np.random.permutation(num_items)[:batch_size]
+
+
+def microseconds_per_draw(draw, num_items, batch_size, num_draws):
+    draw(num_items, batch_size)
+    start = time.time()
+    for _ in range(num_draws):
+        draw(num_items, batch_size)
+    return (time.time() - start) / num_draws * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=100)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--num_draws', type=int, default=200)
+    args = parser.parse_args()
+
+    draws = {
+        'permutation': permutation_draw,
+        'without_replacement': sample_without_replacement,
+        'with_replacement': sample_with_replacement,
+    }
+    print('{:>10} | '.format('size') + ' | '.join('{:>19}'.format(name) for name in draws) + '   (us per batch)')
+    for size in args.sizes:
+        times = [microseconds_per_draw(draw, size, args.batch_size, args.num_draws) for draw in draws.values()]
+        print('{:>10} | '.format(size) + ' | '.join('{:>19.1f}'.format(t) for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import time
 
 from rob831.infrastructure.rl_trainer import RL_Trainer
 from rob831.agents.bc_agent import BCAgent
-from rob831.policies.loaded_gaussian_policy import LoadedGaussianPolicy
+from rob831.policies.loaded_gaussian_policy import load_expert_policy
 
 class BC_Trainer(object):
 
@@ -35,7 +35,7 @@ class BC_Trainer(object):
         #######################
 
         print('Loading expert policy from...', self.params['expert_policy_file'])
-        self.loaded_expert_policy = LoadedGaussianPolicy(self.params['expert_policy_file'])
+        self.loaded_expert_policy = load_expert_policy(self.params['expert_policy_file'], self.params['expert_backend'])
         print('Done restoring expert policy...')
 
     def run_training_loop(self):
@@ -54,9 +54,12 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--expert_policy_file', '-epf', type=str, required=True)  # relative to where you're running this script from
     parser.add_argument('--expert_data', '-ed', type=str, required=True) #relative to where you're running this script from
+    parser.add_argument('--expert_backend', type=str, default='torch', choices=['torch', 'frozen', 'numpy'])  # how the expert policy is evaluated when relabeling
     parser.add_argument('--env_name', '-env', type=str, help='choices: Ant-v2, Humanoid-v2, Walker-v2, HalfCheetah-v2, Hopper-v2', required=True)
     parser.add_argument('--exp_name', '-exp', type=str, default='pick an experiment name', required=True)
     parser.add_argument('--do_dagger', action='store_true')
+    parser.add_argument('--background_relabel', action='store_true')  # relabel each DAgger rollout on a worker thread while collecting the next
+    parser.add_argument('--relabel_chunk_size', type=int, default=0)  # max observations per expert forward pass when relabeling (0: all at once)
     parser.add_argument('--ep_len', type=int, default=1000)
 
     parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=1000)  # number of gradient steps for training policy (per iter in n_iter)
@@ -67,6 +70,9 @@ def main():
                         default=1000)  # eval data collected (in the env) for logging metrics
     parser.add_argument('--train_batch_size', type=int,
                         default=100)  # number of sampled data points to be used per gradient/train step
+    parser.add_argument('--epoch_training', action='store_true')  # keep the dataset on the device and train on shuffled epochs
+    parser.add_argument('--num_epochs_per_iter', type=int, default=0)  # with --epoch_training: full passes per iter, instead of num_agent_train_steps_per_iter steps
+    parser.add_argument('--grad_accum_steps', type=int, default=1)  # with --epoch_training: minibatches of train_batch_size per gradient step
 
     parser.add_argument('--n_layers', type=int, default=2)  # depth, of policy to be learned
     parser.add_argument('--size', type=int, default=64)  # width of each layer, of policy to be learned
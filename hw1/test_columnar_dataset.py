@@ -0,0 +1,82 @@
+"""
+Checks that a list of paths survives the round trip through the columnar
+dataset format, and through the pickle converter.
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from rob831.infrastructure import utils
+from rob831.infrastructure.columnar_dataset import (
+    FIELDS, ColumnarDataset, convert_pickle, load_paths, save_columnar)
+
+
+def make_paths(lengths=(5, 1, 7), ob_dim=3, ac_dim=2):
+    rng = np.random.RandomState(0)
+    paths = []
+    for length in lengths:
+        obs = rng.randn(length + 1, ob_dim).astype(np.float32)
+        paths.append(utils.Path(
+            list(obs[:-1]), [np.zeros((2, 2, 3), dtype=np.uint8)] * length,
+            list(rng.randn(length, ac_dim)), list(rng.randn(length)),
+            list(obs[1:]), list(np.arange(length) == length - 1)))
+    return paths
+
+
+def assert_same_paths(dataset, paths):
+    assert len(dataset) == len(paths)
+    for loaded, path in zip(dataset, paths):
+        for field in FIELDS:
+            np.testing.assert_array_equal(loaded[field], path[field])
+            assert loaded[field].dtype == path[field].dtype
+
+
+def test_round_trip(tmp_path):
+    paths = make_paths()
+    save_columnar(paths, str(tmp_path / 'dataset'))
+    dataset = load_paths(str(tmp_path / 'dataset'))
+
+    assert isinstance(dataset, ColumnarDataset)
+    assert isinstance(dataset.columns['observation'], np.memmap)
+    assert dataset.num_transitions == 13
+    assert_same_paths(dataset, paths)
+    np.testing.assert_array_equal(dataset[-1]['action'], paths[-1]['action'])
+    with pytest.raises(IndexError):
+        dataset[len(paths)]
+
+    for split, path in zip(dataset.split_by_path('reward'), paths):
+        np.testing.assert_array_equal(split, path['reward'])
+
+
+def test_convert_listofrollouts_matches(tmp_path):
+    paths = make_paths()
+    save_columnar(paths, str(tmp_path / 'dataset'))
+    dataset = load_paths(str(tmp_path / 'dataset'))
+    for concat_rew in (True, False):
+        expected = utils.convert_listofrollouts(paths, concat_rew)
+        for array, expected_array in zip(utils.convert_listofrollouts(dataset, concat_rew), expected):
+            if concat_rew or not isinstance(expected_array, list):
+                np.testing.assert_array_equal(array, expected_array)
+            else:
+                for rews, expected_rews in zip(array, expected_array):
+                    np.testing.assert_array_equal(rews, expected_rews)
+
+
+def test_convert_pickle(tmp_path):
+    paths = make_paths()
+    filename = str(tmp_path / 'expert_data.pkl')
+    with open(filename, 'wb') as f:
+        pickle.dump(paths, f)
+
+    assert_same_paths(load_paths(filename), paths)
+    convert_pickle(filename, str(tmp_path / 'dataset'))
+    assert_same_paths(load_paths(str(tmp_path / 'dataset')), paths)
+
+
+def test_plural_field_names(tmp_path):
+    # the pointmass offline buffers name their fields in the plural
+    paths = [{field + 's': path[field] for field in FIELDS} for path in make_paths()]
+    save_columnar(paths, str(tmp_path / 'dataset'))
+    assert_same_paths(load_paths(str(tmp_path / 'dataset')), make_paths())
@@ -1,3 +1,5 @@
+from rob831.infrastructure.sampler import EpochSampler, sample_without_replacement
+from rob831.infrastructure.trajectory_index import TrajectoryIndex
 from rob831.infrastructure.utils import *
 
 
@@ -6,20 +8,16 @@ class ReplayBuffer(object):
     def __init__(self, max_size=1000000):
 
         self.max_size = max_size
-        self.paths = []
+        # where each rollout lives in the arrays below; rollouts are not stored separately
+        self.trajectories = TrajectoryIndex()
         self.obs = None
         self.acs = None
         self.concatenated_rews = None
-        self.unconcatenated_rews = None
         self.next_obs = None
         self.terminals = None
 
     def add_rollouts(self, paths, noised=False):
 
-        # add new rollouts into our list of rollouts
-        for path in paths:
-            self.paths.append(path)
-
         # convert new rollouts into their component arrays, and append them onto our arrays
         observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(paths)
 
@@ -33,7 +31,6 @@ class ReplayBuffer(object):
             self.next_obs = next_observations[-self.max_size:]
             self.terminals = terminals[-self.max_size:]
             self.concatenated_rews = concatenated_rews[-self.max_size:]
-            self.unconcatenated_rews = unconcatenated_rews[-self.max_size:]
         else:
             self.obs = np.concatenate([self.obs, observations])[-self.max_size:]
             self.acs = np.concatenate([self.acs, actions])[-self.max_size:]
@@ -46,20 +43,31 @@ class ReplayBuffer(object):
             self.concatenated_rews = np.concatenate(
                 [self.concatenated_rews, concatenated_rews]
             )[-self.max_size:]
-            if isinstance(unconcatenated_rews, list):
-                self.unconcatenated_rews += unconcatenated_rews  # TODO keep only latest max_size around
-            else:
-                self.unconcatenated_rews.append(unconcatenated_rews)  # TODO keep only latest max_size around
+
+        self.trajectories.add([len(rews) for rews in unconcatenated_rews], len(self.obs))
 
     ########################################
     ########################################
 
+    def _rollouts(self, starts, ends):
+        # views into the flat arrays, not copies
+        return [
+            {"observation": self.obs[start:end], "action": self.acs[start:end],
+             "reward": self.concatenated_rews[start:end], "next_observation": self.next_obs[start:end],
+             "terminal": self.terminals[start:end]}
+            for start, end in zip(starts, ends)
+        ]
+
     def sample_random_rollouts(self, num_rollouts):
-        rand_indices = np.random.permutation(len(self.paths))[:num_rollouts]
-        return self.paths[rand_indices]
+        return self._rollouts(*self.trajectories.random_k(num_rollouts))
 
     def sample_recent_rollouts(self, num_rollouts=1):
-        return self.paths[-num_rollouts:]
+        return self._rollouts(*self.trajectories.last_k(num_rollouts))
+
+    @property
+    def unconcatenated_rews(self):
+        """Per-rollout views of concatenated_rews"""
+        return self.trajectories.split(self.concatenated_rews)
 
     ########################################
     ########################################
@@ -69,45 +77,37 @@ class ReplayBuffer(object):
         assert (
                 self.obs.shape[0]
                 == self.acs.shape[0]
-                == self.rews.shape[0]
+                == self.concatenated_rews.shape[0]
                 == self.next_obs.shape[0]
                 == self.terminals.shape[0]
         )
 
-        ## TODO return batch_size number of random entries from each of the 5 component arrays above [OK]
-        ## HINT 1: use np.random.permutation to sample random indices
-        ## HINT 2: return corresponding data points from each array (i.e., not different indices from each array)
-        ## HINT 3: look at the sample_recent_data function below
-
-        # total sizes
-        total_size = self.obs.shape[0]
-        
-        # handle the problem if batch_size is larger than total_size
-        actual_batch_size = min(batch_size, total_size)
-        random_indices = np.random.permutation(total_size)[:actual_batch_size]
-        
-        # return the corresponding data points from each array
+        # batch_size distinct indices in O(batch_size), however large the buffer;
+        # a batch_size larger than the buffer returns every entry once
+        random_indices = sample_without_replacement(self.obs.shape[0], batch_size)
+        return self._gather(random_indices)
+
+    def _gather(self, indices):
         return (
-            self.obs[random_indices],
-            self.acs[random_indices], 
-            self.rews[random_indices],
-            self.next_obs[random_indices],
-            self.terminals[random_indices],
+            self.obs[indices],
+            self.acs[indices],
+            self.concatenated_rews[indices],
+            self.next_obs[indices],
+            self.terminals[indices],
         )
 
+    def iterate_epoch(self, batch_size, shuffle=True):
+        """Yields batches that together cover every stored transition exactly once"""
+        for indices in EpochSampler(self.obs.shape[0], batch_size, shuffle=shuffle):
+            yield self._gather(indices)
+
     def sample_recent_data(self, batch_size=1, concat_rew=True):
 
         if concat_rew:
             return self.obs[-batch_size:], self.acs[-batch_size:], self.concatenated_rews[-batch_size:], self.next_obs[-batch_size:], self.terminals[-batch_size:]
         else:
-            num_recent_rollouts_to_return = 0
-            num_datapoints_so_far = 0
-            index = -1
-            while num_datapoints_so_far < batch_size:
-                recent_rollout = self.paths[index]
-                index -=1
-                num_recent_rollouts_to_return +=1
-                num_datapoints_so_far += get_pathlength(recent_rollout)
-            rollouts_to_return = self.paths[-num_recent_rollouts_to_return:]
-            observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(rollouts_to_return)
-            return observations, actions, unconcatenated_rews, next_observations, terminals
+            # the most recent whole rollouts holding at least batch_size transitions, as views
+            first_path = self.trajectories.first_covering(batch_size)
+            start = self.trajectories.offsets(first_path)[0]
+            unconcatenated_rews = self.trajectories.split(self.concatenated_rews, first_path)
+            return self.obs[start:], self.acs[start:], unconcatenated_rews, self.next_obs[start:], self.terminals[start:]
@@ -11,6 +11,7 @@ import torch
 from rob831.infrastructure import pytorch_util as ptu
 
 from rob831.infrastructure import utils
+from rob831.infrastructure.columnar_dataset import load_paths
 from rob831.infrastructure.logger import Logger
 from rob831.infrastructure.action_noise_wrapper import ActionNoiseWrapper
 
@@ -157,7 +158,7 @@ class RL_Trainer(object):
         # TODOX: get this from hw1 X
         if itr == 0:
             if load_initial_expertdata:
-                paths = pickle.load(open(self.params['expert_data'], 'rb'))
+                paths = load_paths(self.params['expert_data'])  # pickle or columnar dataset directory
                 return paths, 0, None
             else:
                 num_transitions_to_sample = self.params['batch_size_initial']
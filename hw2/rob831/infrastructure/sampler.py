@@ -0,0 +1,54 @@
+"""
+Index samplers for the replay buffers.
+
+Drawing a batch costs O(batch_size) regardless of how many transitions the
+buffer holds; only EpochSampler touches every index, once per epoch.
+"""
+import numpy as np
+
+
+def sample_with_replacement(num_items, batch_size, rng=np.random):
+    return rng.randint(0, num_items, size=batch_size)
+
+
+def sample_without_replacement(num_items, batch_size, rng=np.random):
+    """
+    batch_size distinct indices in [0, num_items), in random order.
+    If batch_size >= num_items, every index is returned once.
+    """
+    if batch_size >= num_items:
+        return rng.permutation(num_items)
+    if 4 * batch_size > num_items:
+        # dense draw: a full permutation costs about as much as the batch
+        return rng.permutation(num_items)[:batch_size]
+    # sparse draw: duplicates are rare, so redraw just the missing ones
+    indices = np.unique(rng.randint(0, num_items, size=batch_size))
+    while len(indices) < batch_size:
+        extra = rng.randint(0, num_items, size=batch_size - len(indices))
+        indices = np.unique(np.concatenate([indices, extra]))
+    rng.shuffle(indices)
+    return indices
+
+
+class EpochSampler(object):
+    """
+    Iterates over shuffled batches of indices that cover [0, num_items)
+    exactly once per epoch, e.g. for supervised training on a fixed dataset.
+    """
+
+    def __init__(self, num_items, batch_size, shuffle=True, drop_last=False, rng=np.random):
+        self.num_items = num_items
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rng = rng
+
+    def __len__(self):
+        if self.drop_last:
+            return self.num_items // self.batch_size
+        return (self.num_items + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        order = self.rng.permutation(self.num_items) if self.shuffle else np.arange(self.num_items)
+        for start in range(0, len(self) * self.batch_size, self.batch_size):
+            yield order[start:start + self.batch_size]
@@ -1,5 +1,7 @@
 import numpy as np
 import time
+
+from rob831.infrastructure.columnar_dataset import ColumnarDataset
 import copy
 
 ############################################
@@ -143,6 +145,11 @@ def convert_listofrollouts(paths):
         and return separate arrays,
         where each array is a concatenation of that array from across the rollouts
     """
+    if isinstance(paths, ColumnarDataset):
+        # already concatenated (and memory-mapped): no copies
+        columns = paths.columns
+        return (columns["observation"], columns["action"], columns["next_observation"], columns["terminal"],
+                columns["reward"], paths.split_by_path("reward"))
     observations = np.concatenate([path["observation"] for path in paths])
     actions = np.concatenate([path["action"] for path in paths])
     next_observations = np.concatenate([path["next_observation"] for path in paths])
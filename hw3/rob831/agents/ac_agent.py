@@ -1,7 +1,10 @@
 from collections import OrderedDict
 
+import torch
+
 from rob831.critics.bootstrapped_continuous_critic import \
     BootstrappedContinuousCritic
+from rob831.infrastructure import pytorch_util as ptu
 from rob831.infrastructure.replay_buffer import ReplayBuffer
 from rob831.infrastructure.utils import *
 from rob831.policies.MLP_policy import MLPPolicyAC
@@ -57,13 +60,17 @@ class ACAgent(BaseAgent):
         # 3) estimate the Q value as Q(s, a) = r(s, a) + gamma*V(s')
         # HINT: Remember to cut off the V(s') term (ie set it to 0) at terminal states (ie terminal_n=1)
         # 4) calculate advantage (adv_n) as A(s, a) = Q(s, a) - V(s)
-        vs = self.critic.forward_np(ob_no)
-        vs_next = self.critic.forward_np(next_ob_no)
+        # batches may be numpy arrays or prefetched tensors; work on the device
+        # and return the advantages as a tensor there, which actor.update takes as is
+        ob_no, next_ob_no, re_n, terminal_n = map(ptu.as_tensor, (ob_no, next_ob_no, re_n, terminal_n))
+        with torch.no_grad():
+            vs = self.critic(ob_no)
+            vs_next = self.critic(next_ob_no)
         q_value = re_n + self.gamma * vs_next * (1 - terminal_n)
         adv_n = q_value - vs
 
         if self.standardize_advantages:
-            adv_n = (adv_n - adv_n.mean()) / (adv_n.std() + 1e-8)
+            adv_n = (adv_n - adv_n.mean()) / (adv_n.std(correction=0) + 1e-8)
         return adv_n
 
     def add_to_replay_buffer(self, paths):
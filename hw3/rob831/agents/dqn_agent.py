@@ -1,6 +1,20 @@
+import atexit
+import copy
+import os
+import threading
+
 import numpy as np
 
-from rob831.infrastructure.dqn_utils import MemoryOptimizedReplayBuffer, PiecewiseSchedule
+from rob831.infrastructure.dqn_utils import (
+    CompressedReplayBuffer,
+    DeviceReplayBuffer,
+    LockedReplayBuffer,
+    MemmapReplayBuffer,
+    MemoryOptimizedReplayBuffer,
+    MultiStreamReplayBuffer,
+    PiecewiseSchedule,
+    SharedMemoryReplayBuffer,
+)
 from rob831.policies.argmax_policy import ArgMaxPolicy
 from rob831.critics.dqn_critic import DQNCritic
 
@@ -19,6 +33,13 @@ class DQNAgent(object):
         self.learning_freq = agent_params['learning_freq']
         self.target_update_freq = agent_params['target_update_freq']
 
+        # env may be a SerialVecEnv stepping several envs together
+        self.num_envs = getattr(env, 'num_envs', 1)
+        # gradient updates per env step; defaults to one every learning_freq steps
+        self.fixed_updates_per_env_step = agent_params.get('updates_per_env_step')
+        self.updates_per_env_step = self.fixed_updates_per_env_step or 1.0 / self.learning_freq
+        self.pending_updates = 0.0
+
         self.replay_buffer_idx = None
         self.exploration = agent_params['exploration_schedule']
         self.optimizer_spec = agent_params['optimizer_spec']
@@ -27,10 +48,53 @@ class DQNAgent(object):
         self.actor = ArgMaxPolicy(self.critic)
 
         lander = agent_params['env_name'].startswith('LunarLander')
-        self.replay_buffer = MemoryOptimizedReplayBuffer(
-            agent_params['replay_buffer_size'], agent_params['frame_history_len'], lander=lander)
+        replay_buffer_dir = agent_params.get('replay_buffer_dir')
+        if replay_buffer_dir:
+            # frames live in a memory-mapped file instead of RAM
+            make_stream = lambda i, size: MemmapReplayBuffer(
+                size, agent_params['frame_history_len'], os.path.join(replay_buffer_dir, 'stream_{}'.format(i)),
+                lander=lander, resume=agent_params.get('resume_replay_buffer', False))
+        elif agent_params.get('device_replay_buffer', False):
+            # low-dimensional transitions are sampled on the training device
+            assert lander, 'device_replay_buffer is for low-dimensional observations'
+            make_stream = lambda i, size: DeviceReplayBuffer(
+                size, agent_params['frame_history_len'], lander=lander)
+        elif agent_params.get('compress_replay_buffer', False):
+            # frames are zlib-compressed in RAM
+            make_stream = lambda i, size: CompressedReplayBuffer(
+                size, agent_params['frame_history_len'], lander=lander)
+        else:
+            make_stream = lambda i, size: MemoryOptimizedReplayBuffer(
+                size, agent_params['frame_history_len'], lander=lander)
+        # the vec env stores its transitions in the replay buffer itself
+        self.env_stores_transitions = self.num_envs > 1 and agent_params.get('shared_memory_replay_buffer', False)
+        if self.env_stores_transitions:
+            # the envs' (and vec env workers') frames go straight into shared memory
+            self.replay_buffer = SharedMemoryReplayBuffer(
+                agent_params['replay_buffer_size'], agent_params['frame_history_len'],
+                env.observation_space.shape, self.num_envs, lander=lander)
+            atexit.register(self.replay_buffer.close)
+            self.env.attach_replay_buffer(self.replay_buffer)
+            self.last_obs = None
+        elif self.num_envs > 1:
+            self.replay_buffer = MultiStreamReplayBuffer(
+                agent_params['replay_buffer_size'], agent_params['frame_history_len'], self.num_envs,
+                lander=lander, make_stream=make_stream)
+        else:
+            self.replay_buffer = make_stream(0, agent_params['replay_buffer_size'])
+        if replay_buffer_dir:
+            # the newest transitions since the last periodic flush reach disk on exit too
+            atexit.register(self.replay_buffer.flush)
         self.t = 0
         self.num_param_updates = 0
+        # set by RL_Trainer when batches are sampled on a background thread,
+        # once learning has started
+        self.prefetcher = None
+
+        # asynchronous actor/learner mode, see start_async_actor
+        self.async_actor = False
+        self.actor_sync_freq = agent_params.get('actor_sync_freq', 100)
+        self.max_actor_lead = agent_params.get('max_actor_lead', 1000)
 
     def add_to_replay_buffer(self, paths):
         pass
@@ -42,6 +106,8 @@ class DQNAgent(object):
             advanced one step, and the replay buffer should contain one more transition.
             Note that self.last_obs must always point to the new latest observation.
         """        
+        if self.num_envs > 1:
+            return self.step_vec_env()
 
         # TODOX store the latest observation ("frame") into the replay buffer
         # HINT: the replay buffer used here is `MemoryOptimizedReplayBuffer`
@@ -83,6 +149,103 @@ class DQNAgent(object):
         if done:
             self.last_obs = self.env.reset()
 
+    def step_vec_env(self):
+        """
+            Step all K envs at once and store K transitions, one per env stream.
+            Actions for every env come from a single Q-network forward pass,
+            with an independent epsilon draw per env.
+        """
+        if not self.env_stores_transitions:
+            replay_buffer_idxes = self.replay_buffer.store_frames(self.last_obs)
+
+        eps = self.exploration.value(self.t)
+        perform_random_action = (np.random.random(self.num_envs) < eps) | (self.t < self.learning_starts)
+        actions = np.random.randint(self.num_actions, size=self.num_envs)
+        if not np.all(perform_random_action):
+            greedy_actions = self.actor.get_actions(self.replay_buffer.encode_recent_observations())
+            actions = np.where(perform_random_action, actions, greedy_actions)
+
+        # envs that finish are reset by the vec env, so obs already holds their first observation
+        obs, rewards, dones, infos = self.env.step(actions)
+        self.last_obs = obs
+
+        if not self.env_stores_transitions:
+            self.replay_buffer.store_effects(replay_buffer_idxes, actions, rewards, dones)
+
+    ####################################
+    ####################################
+
+    def start_async_actor(self, num_env_steps):
+        """
+            Step the env(s) on a background actor thread until num_env_steps,
+            acting with a copy of q_net that the learner syncs every
+            actor_sync_freq updates. The replay buffer becomes shared, and
+            train() then runs learner updates at updates_per_env_step,
+            while the actor never runs more than max_actor_lead env steps
+            ahead of what the learner has consumed.
+        """
+        self.async_actor = True
+        self.replay_buffer = LockedReplayBuffer(self.replay_buffer)
+        self.actor_lock = threading.Lock()
+        self.actor_q_net = copy.deepcopy(self.critic.q_net)
+        self.actor = ArgMaxPolicy(self.critic, q_net=self.actor_q_net, lock=self.actor_lock)
+        self.progress = threading.Condition()
+        self.stop_actor = False
+        self.actor_thread = threading.Thread(target=self._run_actor, args=(num_env_steps,), daemon=True)
+        self.actor_thread.start()
+
+    def actor_running(self):
+        return self.actor_thread.is_alive()
+
+    def stop_async_actor(self):
+        with self.progress:
+            self.stop_actor = True
+            self.progress.notify_all()
+        self.actor_thread.join()
+
+    def _allowed_updates(self):
+        return self.updates_per_env_step * max(0, self.t - self.learning_starts)
+
+    def _run_actor(self, num_env_steps):
+        while self.t < num_env_steps and not self.stop_actor:
+            with self.progress:
+                # env steps the learner has consumed so far, at the replay ratio
+                while (not self.stop_actor
+                       and self.t > self.learning_starts
+                       and self.num_param_updates + self.max_actor_lead * self.updates_per_env_step < self._allowed_updates()):
+                    self.progress.wait(0.1)
+            self.step_env()
+            with self.progress:
+                self.t += self.num_envs
+                self.progress.notify_all()
+
+    def sync_actor(self):
+        with self.actor_lock:
+            self.actor_q_net.load_state_dict(self.critic.q_net.state_dict())
+
+    def train_async(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
+        log = {}
+        with self.progress:
+            if self.num_param_updates >= self._allowed_updates():
+                # learner is ahead of the data; wait for the actor
+                self.progress.wait(0.01)
+                return log
+        if len(ob_no) == 0:
+            return log
+
+        log = self.critic.update(
+            ob_no, ac_na, next_ob_no, re_n, terminal_n
+        )
+        if self.num_param_updates % self.target_update_freq == 0:
+            self.critic.update_target_network()
+        if self.num_param_updates % self.actor_sync_freq == 0:
+            self.sync_actor()
+
+        with self.progress:
+            self.num_param_updates += 1
+            self.progress.notify_all()
+        return log
+
     def sample(self, batch_size):
         if self.replay_buffer.can_sample(self.batch_size):
             return self.replay_buffer.sample(batch_size)
@@ -90,23 +253,44 @@ class DQNAgent(object):
             return [],[],[],[],[]
 
     def train(self, ob_no, ac_na, re_n, next_ob_no, terminal_n):
+        if self.async_actor:
+            return self.train_async(ob_no, ac_na, re_n, next_ob_no, terminal_n)
         log = {}
         if (self.t > self.learning_starts
-                and self.t % self.learning_freq == 0
                 and self.replay_buffer.can_sample(self.batch_size)
         ):
+            num_updates = self._num_updates()
+            for update in range(num_updates):
+                if update > 0:
+                    if self.prefetcher is not None:
+                        ob_no, ac_na, re_n, next_ob_no, terminal_n = self.prefetcher.get()
+                    else:
+                        ob_no, ac_na, re_n, next_ob_no, terminal_n = self.sample(self.batch_size)
 
-            # TODOX fill in the call to the update function using the appropriate tensors
-            log = self.critic.update(
-                ob_no, ac_na, next_ob_no, re_n, terminal_n
-            )
+                # TODOX fill in the call to the update function using the appropriate tensors
+                log = self.critic.update(
+                    ob_no, ac_na, next_ob_no, re_n, terminal_n
+                )
 
-            # TODOX update the target network periodically 
-            # HINT: your critic already has this functionality implemented
-            if self.num_param_updates % self.target_update_freq == 0:
-                self.critic.update_target_network()
+                # TODOX update the target network periodically 
+                # HINT: your critic already has this functionality implemented
+                if self.num_param_updates % self.target_update_freq == 0:
+                    self.critic.update_target_network()
 
-            self.num_param_updates += 1
+                self.num_param_updates += 1
 
-        self.t += 1
+        self.t += self.num_envs
         return log
+
+    def _num_updates(self):
+        """Gradient updates due for the env steps t .. t + num_envs - 1"""
+        if self.fixed_updates_per_env_step is None:
+            if self.num_envs == 1:
+                return int(self.t % self.learning_freq == 0)
+            # one update per step that is a multiple of learning_freq
+            return (self.t + self.num_envs - 1) // self.learning_freq - (self.t - 1) // self.learning_freq
+        # with K envs, each call accounts for K env steps
+        self.pending_updates += self.num_envs * self.fixed_updates_per_env_step
+        num_updates = int(self.pending_updates)
+        self.pending_updates -= num_updates
+        return num_updates
@@ -88,10 +88,10 @@ class BootstrappedContinuousCritic(nn.Module, BaseCritic):
         # HINT: make sure to squeeze the output of the critic_network to ensure
         #       that its dimensions match the reward
         loss = None
-        ob_no = ptu.from_numpy(ob_no)
-        next_ob_no = ptu.from_numpy(next_ob_no)
-        reward_n = ptu.from_numpy(reward_n)
-        terminal_n = ptu.from_numpy(terminal_n)
+        ob_no = ptu.as_tensor(ob_no)
+        next_ob_no = ptu.as_tensor(next_ob_no)
+        reward_n = ptu.as_tensor(reward_n)
+        terminal_n = ptu.as_tensor(terminal_n)
         
         for i in range (self.num_target_updates):
             v_s_next = self.forward(next_ob_no)
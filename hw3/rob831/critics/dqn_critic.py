@@ -57,11 +57,11 @@ class DQNCritic(BaseCritic):
             returns:
                 nothing
         """
-        ob_no = ptu.from_numpy(ob_no)
-        ac_na = ptu.from_numpy(ac_na).to(torch.long)
-        next_ob_no = ptu.from_numpy(next_ob_no)
-        reward_n = ptu.from_numpy(reward_n)
-        terminal_n = ptu.from_numpy(terminal_n)
+        ob_no = ptu.as_tensor(ob_no)
+        ac_na = ptu.as_tensor(ac_na).to(torch.long)
+        next_ob_no = ptu.as_tensor(next_ob_no)
+        reward_n = ptu.as_tensor(reward_n)
+        terminal_n = ptu.as_tensor(terminal_n)
 
         qa_t_values = self.q_net(ob_no)
         q_t_values = torch.gather(qa_t_values, 1, ac_na.unsqueeze(1)).squeeze(1)
@@ -106,7 +106,9 @@ class DQNCritic(BaseCritic):
         ):
             target_param.data.copy_(param.data)
 
-    def qa_values(self, obs):
+    def qa_values(self, obs, q_net=None):
+        # q_net: evaluate a different copy of the network, e.g. an actor's
+        q_net = self.q_net if q_net is None else q_net
         obs = ptu.from_numpy(obs)
-        qa_values = self.q_net(obs)
+        qa_values = q_net(obs)
         return ptu.to_numpy(qa_values)
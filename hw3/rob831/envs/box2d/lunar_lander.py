@@ -118,7 +118,12 @@ class LunarLander(gym.Env):
 
     continuous = False
 
-    def __init__(self):
+    def __init__(self, headless=False):
+        # headless: don't simulate the engine exhaust particles. They are only
+        # decoration (they collide with the ground alone and never touch the
+        # lander) but each firing adds a Box2D body, and they only expire when
+        # rendered. Dynamics, rewards and RNG draws are unchanged.
+        self.headless = headless
         self._seed()
         self.viewer = None
 
@@ -168,7 +173,7 @@ class LunarLander(gym.Env):
         # terrain
         CHUNKS = 11
         height = self.np_random.uniform(0, H/2, size=(CHUNKS+1,) )
-        chunk_x  = [W/(CHUNKS-1)*i for i in range(CHUNKS)]
+        chunk_x  = W/(CHUNKS-1)*np.arange(CHUNKS)
 
         # randomize helipad x-coord
         helipad_chunk = np.random.choice(range(1, CHUNKS-1))
@@ -181,13 +186,14 @@ class LunarLander(gym.Env):
         height[helipad_chunk+0] = self.helipad_y
         height[helipad_chunk+1] = self.helipad_y
         height[helipad_chunk+2] = self.helipad_y
-        smooth_y = [0.33*(height[i-1] + height[i+0] + height[i+1]) for i in range(CHUNKS)]
+        # 0.33*(height[i-1] + height[i] + height[i+1]), with height[-1] for i == 0
+        smooth_y = 0.33*(np.roll(height, 1)[:CHUNKS] + height[:CHUNKS] + height[1:CHUNKS+1])
 
         self.moon = self.world.CreateStaticBody( shapes=edgeShape(vertices=[(0, 0), (W, 0)]) )
         self.sky_polys = []
         for i in range(CHUNKS-1):
-            p1 = (chunk_x[i],   smooth_y[i])
-            p2 = (chunk_x[i+1], smooth_y[i+1])
+            p1 = (float(chunk_x[i]),   float(smooth_y[i]))
+            p2 = (float(chunk_x[i+1]), float(smooth_y[i+1]))
             self.moon.CreateEdgeFixture(
                 vertices=[p1,p2],
                 density=0,
@@ -292,8 +298,9 @@ class LunarLander(gym.Env):
             ox =  tip[0]*(4/SCALE + 2*dispersion[0]) + side[0]*dispersion[1]   # 4 is move a bit downwards, +-2 for randomness
             oy = -tip[1]*(4/SCALE + 2*dispersion[0]) - side[1]*dispersion[1]
             impulse_pos = (self.lander.position[0] + ox, self.lander.position[1] + oy)
-            p = self._create_particle(3.5, impulse_pos[0], impulse_pos[1], m_power)    # particles are just a decoration, 3.5 is here to make particle speed adequate
-            p.ApplyLinearImpulse(           ( ox*MAIN_ENGINE_POWER*m_power,  oy*MAIN_ENGINE_POWER*m_power), impulse_pos, True)
+            if not self.headless:
+                p = self._create_particle(3.5, impulse_pos[0], impulse_pos[1], m_power)    # particles are just a decoration, 3.5 is here to make particle speed adequate
+                p.ApplyLinearImpulse(           ( ox*MAIN_ENGINE_POWER*m_power,  oy*MAIN_ENGINE_POWER*m_power), impulse_pos, True)
             self.lander.ApplyLinearImpulse( (-ox*MAIN_ENGINE_POWER*m_power, -oy*MAIN_ENGINE_POWER*m_power), impulse_pos, True)
 
         s_power = 0.0
@@ -305,8 +312,9 @@ class LunarLander(gym.Env):
             ox =  tip[0]*dispersion[0] + side[0]*(3*dispersion[1]+direction*SIDE_ENGINE_AWAY/SCALE)
             oy = -tip[1]*dispersion[0] - side[1]*(3*dispersion[1]+direction*SIDE_ENGINE_AWAY/SCALE)
             impulse_pos = (self.lander.position[0] + ox - tip[0]*17/SCALE, self.lander.position[1] + oy + tip[1]*SIDE_ENGINE_HEIGHT/SCALE)
-            p = self._create_particle(0.7, impulse_pos[0], impulse_pos[1], s_power)
-            p.ApplyLinearImpulse(           ( ox*SIDE_ENGINE_POWER*s_power,  oy*SIDE_ENGINE_POWER*s_power), impulse_pos, True)
+            if not self.headless:
+                p = self._create_particle(0.7, impulse_pos[0], impulse_pos[1], s_power)
+                p.ApplyLinearImpulse(           ( ox*SIDE_ENGINE_POWER*s_power,  oy*SIDE_ENGINE_POWER*s_power), impulse_pos, True)
             self.lander.ApplyLinearImpulse( (-ox*SIDE_ENGINE_POWER*s_power, -oy*SIDE_ENGINE_POWER*s_power), impulse_pos, True)
 
         # perform normal update
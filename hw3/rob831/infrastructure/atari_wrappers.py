@@ -92,12 +92,28 @@ class EpisodicLifeEnv(gym.Wrapper):
 
 
 class MaxAndSkipEnv(gym.Wrapper):
-    def __init__(self, env, skip=4):
-        """Return only every `skip`-th frame"""
+    def __init__(self, env, skip=4, grayscale=False):
+        """Return only every `skip`-th frame.
+        With grayscale=True the last two frames are converted to uint8
+        grayscale before max pooling, so the pooling (and everything after
+        it) works on a third of the data. Envs that already emit grayscale
+        frames (obs_type='grayscale') are pooled as they are.
+        """
         gym.Wrapper.__init__(self, env)
+        shape = env.observation_space.shape
+        if grayscale:
+            shape = shape[:2]
+            self.observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
         # most recent raw observations (for max pooling across time steps)
-        self._obs_buffer = np.zeros((2,)+env.observation_space.shape, dtype=np.uint8)
+        self._obs_buffer = np.zeros((2,)+shape, dtype=np.uint8)
         self._skip       = skip
+        self._grayscale  = grayscale
+
+    def _store(self, i, obs):
+        if self._grayscale:
+            _grayscale(obs, out=self._obs_buffer[i])
+        else:
+            self._obs_buffer[i] = obs
 
     def step(self, action):
         """Repeat action, sum reward, and max over last observations."""
@@ -105,19 +121,20 @@ class MaxAndSkipEnv(gym.Wrapper):
         done = None
         for i in range(self._skip):
             obs, reward, done, info = self.env.step(action)
-            if i == self._skip - 2: self._obs_buffer[0] = obs
-            if i == self._skip - 1: self._obs_buffer[1] = obs
+            if i == self._skip - 2: self._store(0, obs)
+            if i == self._skip - 1: self._store(1, obs)
             total_reward += reward
             if done:
                 break
         # Note that the observation on the done=True frame
         # doesn't matter
-        max_frame = self._obs_buffer.max(axis=0)
+        max_frame = np.maximum(self._obs_buffer[0], self._obs_buffer[1])
 
         return max_frame, total_reward, done, info
 
     def reset(self, **kwargs):
-        return self.env.reset(**kwargs)
+        obs = self.env.reset(**kwargs)
+        return _grayscale(obs) if self._grayscale else obs
 
 
 def _process_frame84(frame):
@@ -143,6 +160,52 @@ class ProcessFrame84(gym.Wrapper):
         return _process_frame84(self.env.reset())
 
 
+def _grayscale(frame, out=None):
+    """uint8 RGB frame -> uint8 grayscale, using cv2's fixed-point luma weights.
+    Frames that are already grayscale are copied as they are."""
+    import cv2
+    frame = np.reshape(frame, frame.shape[:2] + (-1,))
+    if out is None:
+        out = np.empty(frame.shape[:2], dtype=np.uint8)
+    if frame.shape[2] == 1:
+        out[...] = frame[:, :, 0]
+    else:
+        cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=out)
+    return out
+
+
+def _process_gray_frame84(frame, resized=None):
+    """
+    uint8 grayscale 210x160 frame -> uint8 84x84x1, all in integer arithmetic.
+    :param resized: optional (110, 84) uint8 scratch array for the resize
+    """
+    import cv2
+    out = np.empty((84, 84, 1), dtype=np.uint8)
+    resized = cv2.resize(frame, (84, 110), dst=resized, interpolation=cv2.INTER_LINEAR)
+    out[:, :, 0] = resized[18:102, :]
+    return out
+
+
+class ProcessGrayFrame84(gym.Wrapper):
+    """ProcessFrame84 for the uint8 grayscale frames of MaxAndSkipEnv(grayscale=True)."""
+
+    def __init__(self, env=None):
+        super(ProcessGrayFrame84, self).__init__(env)
+        self.observation_space = spaces.Box(low=0, high=255, shape=(84, 84, 1), dtype=np.uint8)
+        self._resized = np.empty((110, 84), dtype=np.uint8)
+
+    def _process(self, frame):
+        # a fresh output per step: the replay buffer and Monitor keep references to observations
+        return _process_gray_frame84(frame, resized=self._resized)
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        return self._process(obs), reward, done, info
+
+    def reset(self):
+        return self._process(self.env.reset())
+
+
 class ClipRewardEnv(gym.RewardWrapper):
     def __init__(self, env):
         gym.RewardWrapper.__init__(self, env)
@@ -162,15 +225,19 @@ def wrap_deepmind_ram(env):
     return env
 
 
-def wrap_deepmind(env):
+def wrap_deepmind(env, fast_preprocessing=False):
     """Configure environment for DeepMind-style Atari.
+    fast_preprocessing: grayscale and max pool raw uint8 frames and resize
+        in integer arithmetic, instead of pooling RGB frames and converting
+        each one to float; frames are close to, not identical to, the
+        default path since the max is taken after the grayscale
     """
     # assert 'NoFrameskip' in env.spec.id
     env = EpisodicLifeEnv(env)
     env = NoopResetEnv(env, noop_max=30)
-    env = MaxAndSkipEnv(env, skip=4)
+    env = MaxAndSkipEnv(env, skip=4, grayscale=fast_preprocessing)
     if 'FIRE' in env.unwrapped.get_action_meanings():
         env = FireResetEnv(env)
-    env = ProcessFrame84(env)
+    env = ProcessGrayFrame84(env) if fast_preprocessing else ProcessFrame84(env)
     env = ClipRewardEnv(env)
     return env
@@ -0,0 +1,97 @@
+import queue
+import threading
+
+import numpy as np
+import torch
+
+from rob831.infrastructure import pytorch_util as ptu
+
+
+class BatchPrefetcher(object):
+    """
+    Samples training batches on a background thread, keeping up to `depth`
+    of them ready on the training device.
+
+    Each batch is copied into one of depth + 1 preallocated slots (pinned
+    host tensors plus device tensors when training on a GPU), so the
+    learner gets tensors that are already on ptu.device and the critics
+    skip their own from_numpy copies. The slot handed out by get() is
+    reused only once get() is called again.
+    """
+
+    def __init__(self, sample_fn, batch_size, depth=2, num_batches=None):
+        """
+        :param sample_fn: sample_fn(batch_size) -> (ob, ac, re, next_ob, terminal) numpy arrays
+        :param batch_size: passed to sample_fn
+        :param depth: number of batches prepared ahead of the learner
+        :param num_batches: stop after this many batches, or None to run until close()
+        """
+        self.sample_fn = sample_fn
+        self.batch_size = batch_size
+        self.num_batches = num_batches
+        self.slots = [None] * (depth + 1)
+        self.free_slots = queue.Queue()
+        for i in range(depth + 1):
+            self.free_slots.put(i)
+        self.ready = queue.Queue()
+        self.in_use = None
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _allocate(self, batch):
+        use_cuda = ptu.device is not None and ptu.device.type == 'cuda'
+        host, device = [], []
+        for array in batch:
+            tensor = torch.empty(array.shape, dtype=torch.from_numpy(array).dtype, pin_memory=use_cuda)
+            host.append(tensor)
+            device.append(torch.empty_like(tensor, device=ptu.device) if use_cuda else tensor)
+        event = torch.cuda.Event() if use_cuda else None
+        return host, device, event
+
+    def _fill(self, slot, batch):
+        if self.slots[slot] is None or self.slots[slot][0][0].shape != batch[0].shape:
+            self.slots[slot] = self._allocate(batch)
+        host, device, event = self.slots[slot]
+        if event is not None:
+            # the previous copy out of this slot's pinned memory must be done
+            event.synchronize()
+        for host_tensor, device_tensor, array in zip(host, device, batch):
+            host_tensor.copy_(torch.from_numpy(array))
+            if device_tensor is not host_tensor:
+                device_tensor.copy_(host_tensor, non_blocking=True)
+        if event is not None:
+            event.record()
+        return tuple(device)
+
+    def _run(self):
+        produced = 0
+        try:
+            while not self.stopped and (self.num_batches is None or produced < self.num_batches):
+                slot = self.free_slots.get()
+                if slot is None:
+                    return
+                batch = self.sample_fn(self.batch_size)
+                if len(batch[0]) > 0 and not isinstance(batch[0], torch.Tensor):
+                    batch = self._fill(slot, [np.ascontiguousarray(array) for array in batch])
+                # else nothing to sample, or the buffer already returned tensors
+                # (DeviceReplayBuffer); the batch still holds its slot so the
+                # queue stays bounded
+                self.ready.put((slot, batch))
+                produced += 1
+        except Exception as e:
+            self.ready.put((None, e))
+
+    def get(self):
+        """Returns the next batch; the previously returned one may then be overwritten."""
+        if self.in_use is not None:
+            self.free_slots.put(self.in_use)
+        self.in_use, batch = self.ready.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+    def close(self):
+        self.stopped = True
+        self.free_slots.put(None)
+        self.thread.join()
@@ -1,18 +1,26 @@
 """This file includes a collection of utility functions that are useful for
 implementing DQN."""
+import functools
+import json
+import os
 import random
+import threading
+import uuid
+import zlib
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 
 import gym
 import numpy as np
+import torch
 from torch import nn
 import torch.optim as optim
 
+from rob831.infrastructure import pytorch_util as ptu
 from rob831.infrastructure.atari_wrappers import wrap_deepmind
 from gym.envs.registration import register
 
-import torch
-
 
 class Flatten(torch.nn.Module):
     def forward(self, x):
@@ -34,9 +42,56 @@ def register_custom_envs():
             max_episode_steps=1000,
             reward_threshold=200,
         )
+    if 'LunarLanderHeadless-v3' not in registry.env_specs:
+        # same dynamics as LunarLander-v3, without the exhaust particles
+        register(
+            id='LunarLanderHeadless-v3',
+            entry_point='rob831.envs.box2d.lunar_lander:LunarLander',
+            max_episode_steps=1000,
+            reward_threshold=200,
+            kwargs={'headless': True},
+        )
+    if 'LunarLanderVec-v3' not in registry.env_specs:
+        # gym.make('LunarLanderVec-v3', num_envs=..., num_workers=...) returns a
+        # vec env; the time limit is applied to every lander inside it
+        register(
+            id='LunarLanderVec-v3',
+            entry_point='rob831.infrastructure.dqn_utils:make_vec_lander',
+            reward_threshold=200,
+            disable_env_checker=True,
+        )
+
+
+def lunar_empty_wrapper(env):
+    # module level, so that SubprocVecEnv workers can unpickle it
+    return env
+
 
+def make_env(env_name, env_wrappers=None):
+    """gym.make for the custom envs too; picklable through functools.partial,
+    so it can build envs inside SubprocVecEnv workers"""
+    register_custom_envs()
+    env = gym.make(env_name)
+    if env_wrappers is not None:
+        env = env_wrappers(env)
+    return env
 
-def get_env_kwargs(env_name):
+
+def make_vec_lander(num_envs=8, num_workers=0, headless=False, seed=None):
+    """num_envs LunarLander-v3 envs (LunarLanderHeadless-v3 if headless) stepped
+    as one batch: in this process, or spread over num_workers subprocesses"""
+    env_name = 'LunarLanderHeadless-v3' if headless else 'LunarLander-v3'
+    env_fns = [functools.partial(make_env, env_name) for _ in range(num_envs)]
+    if num_workers > 0:
+        vec_env = SubprocVecEnv(env_fns, num_workers=num_workers, start_method='spawn')
+    else:
+        vec_env = SerialVecEnv([env_fn() for env_fn in env_fns])
+    if seed is not None:
+        vec_env.seed(seed)
+    return vec_env
+
+
+def get_env_kwargs(env_name, fast_atari_preprocessing=False):
     if env_name in ['MsPacman-v0', 'PongNoFrameskip-v4']:
         kwargs = {
             'learning_starts': 50000,
@@ -47,16 +102,14 @@ def get_env_kwargs(env_name):
             'learning_freq': 4,
             'grad_norm_clipping': 10,
             'input_shape': (84, 84, 4),
-            'env_wrappers': wrap_deepmind,
+            'env_wrappers': functools.partial(wrap_deepmind, fast_preprocessing=fast_atari_preprocessing),
             'frame_history_len': 4,
             'gamma': 0.99,
         }
         kwargs['optimizer_spec'] = atari_optimizer(kwargs['num_timesteps'])
         kwargs['exploration_schedule'] = atari_exploration_schedule(kwargs['num_timesteps'])
 
-    elif env_name == 'LunarLander-v3':
-        def lunar_empty_wrapper(env):
-            return env
+    elif env_name in ['LunarLander-v3', 'LunarLanderHeadless-v3']:
         kwargs = {
             'optimizer_spec': lander_optimizer(),
             'q_func': create_lander_q_network,
@@ -326,6 +379,233 @@ def initialize_interdependent_variables(session, vars_list, feed_dict):
         else:
             vars_left = new_vars_left
 
+def _step_envs(envs, actions):
+    """Steps each env with its action, resetting the envs that finish"""
+    results = []
+    for env, action in zip(envs, actions):
+        ob, reward, done, info = env.step(action)
+        if done:
+            ob = env.reset()
+        results.append((ob, reward, done, info))
+    return results
+
+
+def _step_envs_into(envs, actions, streams):
+    """_step_envs that stores each transition in its env's replay stream
+    instead of returning the observation"""
+    results = []
+    for env, action, stream in zip(envs, actions, streams):
+        ob, reward, done, info = env.step(action)
+        # the env's newest frame, stored after its previous step
+        stream.store_effect((stream.next_idx - 1) % stream.size, action, reward, done)
+        if done:
+            ob = env.reset()
+        stream.store_frame(ob)
+        results.append((None, reward, done, info))
+    return results
+
+
+def _reset_envs_into(envs, streams):
+    for env, stream in zip(envs, streams):
+        stream.store_frame(env.reset())
+
+
+def _stack_results(results):
+    obs, rewards, dones, infos = zip(*results)
+    obs = None if obs[0] is None else np.stack(obs)
+    return obs, np.array(rewards, dtype=np.float32), np.array(dones), list(infos)
+
+
+class SerialVecEnv(object):
+    """Steps K envs together in this process.
+
+    step() takes one action per env and returns stacked observations,
+    rewards and dones. Envs that finish an episode are reset right away,
+    so the returned observation for them is the first of the next episode.
+    """
+
+    def __init__(self, envs):
+        self.envs = envs
+        self.num_envs = len(envs)
+        self.action_space = envs[0].action_space
+        self.observation_space = envs[0].observation_space
+        self.spec = envs[0].spec
+        self.streams = None
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def seed(self, seed):
+        for i, env in enumerate(self.envs):
+            env.seed(seed + i)
+
+    def reset(self):
+        return np.stack([env.reset() for env in self.envs])
+
+    def attach_replay_buffer(self, replay_buffer):
+        """From now on each env stores its transitions in its own stream of
+        replay_buffer (a SharedMemoryReplayBuffer), and step() returns None
+        for the observations. The envs are reset and their first frames stored."""
+        self.streams = [replay_buffer.writer(i) for i in range(self.num_envs)]
+        _reset_envs_into(self.envs, self.streams)
+
+    def step(self, actions):
+        if self.streams is not None:
+            return _stack_results(_step_envs_into(self.envs, actions, self.streams))
+        return _stack_results(_step_envs(self.envs, actions))
+
+    def close(self):
+        self.streams = None
+        for env in self.envs:
+            env.close()
+
+
+def _vec_env_worker(remote, parent_remote, env_fns):
+    parent_remote.close()
+    # forked workers would all inherit the parent's global RNG (LunarLander
+    # places its helipad with it); 'seed' reseeds it deterministically
+    np.random.seed()
+    envs = [env_fn() for env_fn in env_fns]
+    replay_buffer, streams = None, None
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                if streams is not None:
+                    remote.send(_step_envs_into(envs, data, streams))
+                else:
+                    remote.send(_step_envs(envs, data))
+            elif cmd == 'attach':
+                # the buffer arrives by name and maps the same shared memory
+                replay_buffer, stream_ids = data
+                streams = [replay_buffer.writer(i) for i in stream_ids]
+                _reset_envs_into(envs, streams)
+                remote.send(None)
+            elif cmd == 'reset':
+                remote.send([env.reset() for env in envs])
+            elif cmd == 'seed':
+                np.random.seed(data)
+                for i, env in enumerate(envs):
+                    env.seed(data + i)
+                remote.send(None)
+            elif cmd == 'spaces':
+                remote.send((envs[0].observation_space, envs[0].action_space, envs[0].spec))
+            elif cmd == 'close':
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for env in envs:
+            env.close()
+        if replay_buffer is not None:
+            streams = None
+            replay_buffer.close()
+        remote.close()
+
+
+class SubprocVecEnv(object):
+    """SerialVecEnv with the envs spread over num_workers subprocesses.
+
+    env_fns build the envs inside the workers, so they must be picklable
+    (e.g. functools.partial(make_env, env_name)); the callers here spawn the
+    workers rather than fork them from a process that has initialized torch. local_envs are stepped in
+    this process while the workers step theirs, and come first in the
+    batch; the trainer keeps its Monitor-wrapped env there so that it can
+    read episode statistics from it.
+    """
+
+    def __init__(self, env_fns, num_workers=None, local_envs=(), start_method=None):
+        import multiprocessing as mp
+        ctx = mp.get_context(start_method)
+        self.local_envs = list(local_envs)
+        num_workers = min(num_workers or len(env_fns), len(env_fns))
+        # contiguous groups of envs, so the batch keeps the order of env_fns
+        groups = np.array_split(np.arange(len(env_fns)), num_workers)
+        self.worker_sizes = [len(group) for group in groups]
+        self.remotes, self.processes = [], []
+        for group in groups:
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(target=_vec_env_worker,
+                                  args=(worker_remote, remote, [env_fns[i] for i in group]),
+                                  daemon=True)
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.num_envs = len(self.local_envs) + len(env_fns)
+        self.local_streams = None
+        self.closed = False
+
+        if self.local_envs:
+            env = self.local_envs[0]
+            self.observation_space, self.action_space, self.spec = env.observation_space, env.action_space, env.spec
+        else:
+            self.remotes[0].send(('spaces', None))
+            self.observation_space, self.action_space, self.spec = self.remotes[0].recv()
+
+    @property
+    def unwrapped(self):
+        return self
+
+    def seed(self, seed):
+        for i, env in enumerate(self.local_envs):
+            env.seed(seed + i)
+        offset = len(self.local_envs)
+        for remote, size in zip(self.remotes, self.worker_sizes):
+            remote.send(('seed', seed + offset))
+            offset += size
+        for remote in self.remotes:
+            remote.recv()
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        obs = [env.reset() for env in self.local_envs]
+        for remote in self.remotes:
+            obs.extend(remote.recv())
+        return np.stack(obs)
+
+    def attach_replay_buffer(self, replay_buffer):
+        """As SerialVecEnv.attach_replay_buffer; the workers write their
+        envs' frames into the shared memory themselves, so observations no
+        longer go through the pipes."""
+        offset = len(self.local_envs)
+        for remote, size in zip(self.remotes, self.worker_sizes):
+            remote.send(('attach', (replay_buffer, list(range(offset, offset + size)))))
+            offset += size
+        self.local_streams = [replay_buffer.writer(i) for i in range(len(self.local_envs))]
+        _reset_envs_into(self.local_envs, self.local_streams)
+        for remote in self.remotes:
+            remote.recv()
+
+    def step(self, actions):
+        # the workers step while this process steps the local envs
+        offset = len(self.local_envs)
+        for remote, size in zip(self.remotes, self.worker_sizes):
+            remote.send(('step', actions[offset:offset + size]))
+            offset += size
+        if self.local_streams is not None:
+            results = _step_envs_into(self.local_envs, actions[:len(self.local_envs)], self.local_streams)
+        else:
+            results = _step_envs(self.local_envs, actions[:len(self.local_envs)])
+        for remote in self.remotes:
+            results.extend(remote.recv())
+        return _stack_results(results)
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        for env in self.local_envs:
+            env.close()
+        self.local_streams = None
+        self.closed = True
+
+
 def get_wrapper_by_name(env, classname):
     currentenv = env
     while True:
@@ -515,3 +795,485 @@ class MemoryOptimizedReplayBuffer(object):
         self.reward[idx] = reward
         self.done[idx]   = done
 
+
+
+class MultiStreamReplayBuffer(object):
+    def __init__(self, size, frame_history_len, num_streams, lander=False, make_stream=None):
+        """Replay buffer for K envs stepped together.
+
+        Each env writes to its own MemoryOptimizedReplayBuffer of size
+        size // num_streams, so the frames of different envs never interleave
+        and frame history is encoded exactly as for a single env. Samples are
+        drawn across all streams in proportion to how full they are.
+
+        make_stream: optional function (stream index, stream size) -> buffer,
+            to use another storage backend for each stream
+        """
+        self.num_streams = num_streams
+        self.frame_history_len = frame_history_len
+        if make_stream is None:
+            make_stream = lambda i, stream_size: MemoryOptimizedReplayBuffer(stream_size, frame_history_len, lander=lander)
+        self.streams = [make_stream(i, size // num_streams) for i in range(num_streams)]
+
+    @property
+    def num_in_buffer(self):
+        return sum(stream.num_in_buffer for stream in self.streams)
+
+    def can_sample(self, batch_size):
+        return all(stream.num_in_buffer > 1 for stream in self.streams) and \
+            batch_size + self.num_streams <= self.num_in_buffer
+
+    def sample(self, batch_size):
+        assert self.can_sample(batch_size)
+        return self._sample_streams(self.streams, batch_size)
+
+    @staticmethod
+    def _sample_streams(streams, batch_size):
+        # transitions available per stream (the newest frame has no successor)
+        counts = np.array([stream.num_in_buffer - 1 for stream in streams])
+        stream_sizes = np.random.multinomial(batch_size, counts / counts.sum())
+        # a stream can't give more unique transitions than it holds
+        while np.any(stream_sizes > counts):
+            over = np.argmax(stream_sizes - counts)
+            stream_sizes[over] -= 1
+            stream_sizes[np.argmax(counts - stream_sizes)] += 1
+        batches = [stream.sample(n) for stream, n in zip(streams, stream_sizes) if n > 0]
+        if isinstance(batches[0][0], torch.Tensor):
+            return tuple(torch.cat(parts, 0) for parts in zip(*batches))
+        return tuple(np.concatenate(parts, 0) for parts in zip(*batches))
+
+    def store_frames(self, frames):
+        """Store one frame per stream; returns the indices for store_effects."""
+        return [stream.store_frame(frame) for stream, frame in zip(self.streams, frames)]
+
+    def encode_recent_observations(self):
+        return np.stack([stream.encode_recent_observation() for stream in self.streams])
+
+    def store_effects(self, idxes, actions, rewards, dones):
+        for stream, idx, action, reward, done in zip(self.streams, idxes, actions, rewards, dones):
+            stream.store_effect(idx, action, reward, done)
+
+    def flush(self):
+        """For streams that keep their data on disk (MemmapReplayBuffer)"""
+        for stream in self.streams:
+            stream.flush()
+
+
+class LockedReplayBuffer(object):
+    """Serializes every method call on a replay buffer that is shared by an
+    actor thread (storing frames) and a learner thread (sampling)."""
+
+    def __init__(self, replay_buffer):
+        self.replay_buffer = replay_buffer
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.replay_buffer, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class _SharedStream(MemoryOptimizedReplayBuffer):
+    """One writer's slot range of a SharedMemoryReplayBuffer.
+
+    obs/action/reward/done are views into the shared arrays, and
+    next_idx/num_in_buffer live in a shared counter row, so every process
+    sees the same stream and _encode_observation works unchanged.
+    """
+
+    def __init__(self, obs, action, reward, done, counters, frame_history_len, lander):
+        super().__init__(obs.shape[0], frame_history_len, lander=lander)
+        self._counters = counters
+        self.obs = obs
+        self.action = action
+        self.reward = reward
+        self.done = done
+
+    @property
+    def next_idx(self):
+        return int(self._counters[0])
+
+    @next_idx.setter
+    def next_idx(self, value):
+        if hasattr(self, '_counters'):
+            self._counters[0] = value
+
+    @property
+    def num_in_buffer(self):
+        return int(self._counters[1])
+
+    @num_in_buffer.setter
+    def num_in_buffer(self, value):
+        if hasattr(self, '_counters'):
+            self._counters[1] = value
+
+
+class SharedMemoryReplayBuffer(MultiStreamReplayBuffer):
+    def __init__(self, size, frame_history_len, frame_shape, num_writers, lander=False, name=None):
+        """MultiStreamReplayBuffer whose arrays live in named shared memory.
+
+        The buffer is split into num_writers slot ranges, one per env. A
+        writer only ever touches its own range and its own counters, so
+        inserts from several processes need no locks. sample() draws from
+        the streams that hold data under a lock of the sampling process;
+        reads of a slot that a writer is overwriting can still be torn, as
+        in any lock-free buffer.
+
+        Pass the buffer (it pickles by name) to another process and call
+        `writer(i)` there to get the stream to store frames into, or attach
+        it to a vec env with attach_replay_buffer. The process that created
+        the buffer owns the memory and must `close()` it.
+
+        Parameters
+        ----------
+        frame_shape: tuple
+            Shape of a single frame, needed up front to size the arrays.
+        name: str
+            Prefix of the shared memory blocks; random if omitted.
+        """
+        self.num_streams = num_writers
+        self.frame_history_len = frame_history_len
+        self.lander = lander
+        self.segment_size = size // num_writers
+        self.frame_shape = tuple(frame_shape)
+        self.name = name or 'replay_' + uuid.uuid4().hex[:12]
+        self._attach(create=True)
+
+    def _layout(self):
+        total = self.segment_size * self.num_streams
+        return {
+            'obs':      ((total,) + self.frame_shape, np.float32 if self.lander else np.uint8),
+            'action':   ((total,),                    np.int32),
+            'reward':   ((total,),                    np.float32),
+            'done':     ((total,),                    bool),
+            'counters': ((self.num_streams, 2),       np.int64),
+        }
+
+    def _attach(self, create):
+        self._owner = create
+        self.lock = threading.Lock()
+        self._shms = {}
+        arrays = {}
+        for key, (shape, dtype) in self._layout().items():
+            nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(name='{}_{}'.format(self.name, key), create=create, size=nbytes)
+            self._shms[key] = shm
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if create:
+            arrays['counters'][:] = 0
+
+        self.streams = []
+        for i in range(self.num_streams):
+            segment = slice(i * self.segment_size, (i + 1) * self.segment_size)
+            self.streams.append(_SharedStream(
+                arrays['obs'][segment], arrays['action'][segment], arrays['reward'][segment],
+                arrays['done'][segment], arrays['counters'][i], self.frame_history_len, self.lander))
+
+    def writer(self, writer_id):
+        """The stream owned by writer `writer_id`: store_frame, store_effect and
+        encode_recent_observation behave as in MemoryOptimizedReplayBuffer."""
+        return self.streams[writer_id]
+
+    def can_sample(self, batch_size):
+        # writers start at different times; sample from whichever have data
+        return batch_size + self.num_streams <= self.num_in_buffer
+
+    def sample(self, batch_size):
+        assert self.can_sample(batch_size)
+        with self.lock:
+            streams = [stream for stream in self.streams if stream.num_in_buffer > 1]
+            return self._sample_streams(streams, batch_size)
+
+    def __getstate__(self):
+        return {key: value for key, value in self.__dict__.items()
+                if key not in ('_shms', 'streams', '_owner', 'lock')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._attach(create=False)
+
+    def close(self):
+        # the streams' views must go before the memory can be unmapped
+        self.streams = []
+        for shm in self._shms.values():
+            try:
+                shm.close()
+            except BufferError:
+                # a writer stream is still referenced; the mapping goes with it
+                pass
+            if self._owner:
+                shm.unlink()
+        self._shms = {}
+
+
+class MemmapReplayBuffer(MemoryOptimizedReplayBuffer):
+    def __init__(self, size, frame_history_len, directory, lander=False,
+                 hot_cache_size=1000, resume=False, metadata_freq=10000):
+        """MemoryOptimizedReplayBuffer that keeps its frames on disk.
+
+        `obs` is a np.memmap of shape (size, img_h, img_w, img_c), so each
+        frame and each run of consecutive frames (a frame history) is one
+        contiguous span of the file, and the OS page cache decides what
+        stays in RAM. The last `hot_cache_size` frames are also kept in an
+        in-RAM ring, which is what the actor reads every step.
+        action/reward/done are small and memory-mapped next to it.
+
+        The buffer counters are written to `directory/meta.json` every
+        `metadata_freq` transitions and on `flush()`. With resume=True an
+        existing buffer in `directory` is reopened where it left off instead
+        of being refilled from scratch; its last frame is marked done, since
+        the episode it belonged to was cut off.
+        """
+        super().__init__(size, frame_history_len, lander=lander)
+        self.directory = directory
+        self.hot_cache_size = max(hot_cache_size, frame_history_len)
+        self.metadata_freq = metadata_freq
+        self.hot_cache = None
+        os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(self._path('meta.json')):
+            self._reopen()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open_arrays(self, frame_shape, mode):
+        obs_dtype = np.float32 if self.lander else np.uint8
+        self.obs    = np.memmap(self._path('obs.dat'),    dtype=obs_dtype, mode=mode, shape=(self.size,) + tuple(frame_shape))
+        self.action = np.memmap(self._path('action.dat'), dtype=np.int32,   mode=mode, shape=(self.size,))
+        self.reward = np.memmap(self._path('reward.dat'), dtype=np.float32, mode=mode, shape=(self.size,))
+        self.done   = np.memmap(self._path('done.dat'),   dtype=bool,       mode=mode, shape=(self.size,))
+        self.hot_cache = np.empty((self.hot_cache_size,) + tuple(frame_shape), dtype=obs_dtype)
+
+    def _reopen(self):
+        with open(self._path('meta.json'), 'r') as f:
+            meta = json.load(f)
+        assert meta['size'] == self.size and meta['lander'] == self.lander, \
+            "buffer in {} was created with different settings".format(self.directory)
+        self._open_arrays(meta['frame_shape'], 'r+')
+        self.next_idx = meta['next_idx']
+        self.num_in_buffer = meta['num_in_buffer']
+        if self.num_in_buffer > 0:
+            # the interrupted episode ends here, so frame histories don't run across the restart
+            self.done[(self.next_idx - 1) % self.size] = True
+        # refill the hot cache from disk
+        for idx in range(self.next_idx - min(self.num_in_buffer, self.hot_cache_size), self.next_idx):
+            self.hot_cache[idx % self.hot_cache_size] = self.obs[idx % self.size]
+        print('Resumed replay buffer from {} with {} frames'.format(self.directory, self.num_in_buffer))
+
+    def store_frame(self, frame):
+        if self.obs is None:
+            self._open_arrays(frame.shape, 'w+')
+        self.hot_cache[self.next_idx % self.hot_cache_size] = frame
+        return super().store_frame(frame)
+
+    def store_effect(self, idx, action, reward, done):
+        super().store_effect(idx, action, reward, done)
+        # flushed after the effect, so every frame on disk has its action, reward and done
+        if (idx + 1) % self.metadata_freq == 0:
+            self.flush()
+
+    def encode_recent_observation(self):
+        assert self.num_in_buffer > 0
+        idx = (self.next_idx - 1) % self.size
+        if self.num_in_buffer == self.size and self.size % self.hot_cache_size != 0:
+            # ring indices of cache and buffer no longer line up after wrapping
+            return self._encode_observation(idx)
+        obs = self.obs
+        self.obs = _HotCacheView(self.hot_cache, self.obs)
+        try:
+            return self._encode_observation(idx)
+        finally:
+            self.obs = obs
+
+    def flush(self):
+        if self.obs is None:
+            return
+        for array in (self.obs, self.action, self.reward, self.done):
+            array.flush()
+        meta = {
+            'size': self.size,
+            'frame_history_len': self.frame_history_len,
+            'lander': self.lander,
+            'frame_shape': list(self.obs.shape[1:]),
+            'next_idx': self.next_idx,
+            'num_in_buffer': self.num_in_buffer,
+        }
+        tmp_path = self._path('meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path('meta.json'))
+
+
+class _HotCacheView(object):
+    """Indexes the hot cache ring with buffer indices, for the recent frames
+    that _encode_observation reads in encode_recent_observation."""
+
+    def __init__(self, hot_cache, obs):
+        self.hot_cache = hot_cache
+        self.shape = obs.shape
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            idxes = np.arange(idx.start, idx.stop) % self.hot_cache.shape[0]
+            return self.hot_cache[idxes]
+        return self.hot_cache[idx % self.hot_cache.shape[0]]
+
+
+class CompressedReplayBuffer(MemoryOptimizedReplayBuffer):
+    def __init__(self, size, frame_history_len, lander=False, compression_level=1, num_threads=4):
+        """MemoryOptimizedReplayBuffer that stores every frame zlib-compressed.
+
+        Consecutive Atari frames are mostly background, so a compressed
+        84x84 frame takes a fraction of its raw 7 KB. Frames are compressed
+        once in store_frame. A sampled batch first gathers the frames its
+        observations need, decompresses each of them once on a thread pool
+        (zlib releases the GIL), and then encodes frame histories as usual.
+        """
+        super().__init__(size, frame_history_len, lander=lander)
+        self.compression_level = compression_level
+        self.frames = [None] * size
+        self.frame_shape = None
+        self.frame_dtype = None
+        self.num_threads = num_threads
+        self.pool = ThreadPoolExecutor(max_workers=num_threads) if num_threads > 1 else None
+
+    def _decompress(self, idx):
+        return np.frombuffer(zlib.decompress(self.frames[idx]), dtype=self.frame_dtype).reshape(self.frame_shape)
+
+    def _decompress_many(self, idxes):
+        return [self._decompress(idx) for idx in idxes]
+
+    def _encode_sample(self, idxes):
+        # every frame any obs/next_obs in the batch needs, decompressed once
+        needed = set()
+        for idx in idxes:
+            for offset in range(-self.frame_history_len + 1, 2):
+                needed.add((idx + offset) % self.size)
+        needed = [idx for idx in needed if self.frames[idx] is not None]
+        if self.pool is not None and len(needed) >= 64 * self.num_threads:
+            # one chunk per thread; per-frame tasks would cost more than they save
+            chunks = [needed[i::self.num_threads] for i in range(self.num_threads)]
+            decoded = {}
+            for chunk, frames in zip(chunks, self.pool.map(self._decompress_many, chunks)):
+                decoded.update(zip(chunk, frames))
+        else:
+            decoded = dict(zip(needed, self._decompress_many(needed)))
+
+        self.obs = _DecodedFrames(decoded, self.size, self.frame_shape, self.frame_dtype)
+        try:
+            return super()._encode_sample(idxes)
+        finally:
+            self.obs = _CompressedFrames(self)
+
+    def encode_recent_observation(self):
+        return self._encode_sample([(self.next_idx - 1) % self.size])[0][0]
+
+    def store_frame(self, frame):
+        if self.action is None:
+            self.frame_shape = frame.shape
+            self.frame_dtype = np.float32 if self.lander else np.uint8
+            self.obs      = _CompressedFrames(self)
+            self.action   = np.empty([self.size], dtype=np.int32)
+            self.reward   = np.empty([self.size], dtype=np.float32)
+            self.done     = np.empty([self.size], dtype=bool)
+        frame = np.ascontiguousarray(frame, dtype=self.frame_dtype)
+        self.frames[self.next_idx] = zlib.compress(frame.tobytes(), self.compression_level)
+
+        ret = self.next_idx
+        self.next_idx = (self.next_idx + 1) % self.size
+        self.num_in_buffer = min(self.size, self.num_in_buffer + 1)
+
+        return ret
+
+    def frame_nbytes(self):
+        """Bytes held by the compressed frames (payload only)"""
+        return sum(len(frame) for frame in self.frames if frame is not None)
+
+
+class _DecodedFrames(object):
+    """Frames already decompressed for one batch, indexed like `obs`."""
+
+    def __init__(self, decoded, size, frame_shape, frame_dtype):
+        self.decoded = decoded
+        self.shape = (size,) + tuple(frame_shape)
+        self.zeros = np.zeros(frame_shape, dtype=frame_dtype)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return np.stack([self[i] for i in range(idx.start, idx.stop)])
+        return self.decoded.get(idx, self.zeros)
+
+
+class _CompressedFrames(object):
+    """Read-only `obs` view of a CompressedReplayBuffer, decompressing on access."""
+
+    def __init__(self, replay_buffer):
+        self.replay_buffer = replay_buffer
+        self.shape = (replay_buffer.size,) + tuple(replay_buffer.frame_shape)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return np.stack([self[i] for i in range(*idx.indices(self.shape[0]))])
+        return self.replay_buffer._decompress(idx)
+
+
+class DeviceReplayBuffer(MemoryOptimizedReplayBuffer):
+    def __init__(self, size, frame_history_len=1, lander=True):
+        """MemoryOptimizedReplayBuffer for low-dimensional observations that
+        samples straight from tensors on ptu.device.
+
+        Frames and effects are still written to the numpy arrays (the actor
+        encodes its observations from them), and the rows written since the
+        last sample are copied to the device tensors in one go. sample() then
+        draws indices with torch.randint and gathers on the device, so a batch
+        never goes through numpy or from_numpy. Indices are drawn with
+        replacement.
+        """
+        assert frame_history_len == 1, 'DeviceReplayBuffer stores single low-dimensional frames'
+        super().__init__(size, frame_history_len, lander=lander)
+        self.num_stored = 0
+        self.num_synced = 0
+        self.device_obs = None
+
+    def store_frame(self, frame):
+        assert np.ndim(frame) == 1, 'DeviceReplayBuffer stores single low-dimensional frames'
+        self.num_stored += 1
+        return super().store_frame(frame)
+
+    def _allocate(self):
+        self.device_obs    = torch.empty(self.obs.shape, dtype=torch.float32, device=ptu.device)
+        self.device_action = torch.empty(self.size,      dtype=torch.long,    device=ptu.device)
+        self.device_reward = torch.empty(self.size,      dtype=torch.float32, device=ptu.device)
+        self.device_done   = torch.empty(self.size,      dtype=torch.float32, device=ptu.device)
+
+    def _sync(self):
+        if self.device_obs is None:
+            self._allocate()
+        count = min(self.num_stored - self.num_synced, self.size)
+        start = (self.num_stored - count) % self.size
+        # at most two contiguous runs of the ring
+        for lo, hi in [(start, min(start + count, self.size)), (0, max(start + count - self.size, 0))]:
+            if hi > lo:
+                self.device_obs[lo:hi].copy_(torch.from_numpy(self.obs[lo:hi]), non_blocking=True)
+                self.device_action[lo:hi].copy_(torch.from_numpy(self.action[lo:hi]), non_blocking=True)
+                self.device_reward[lo:hi].copy_(torch.from_numpy(self.reward[lo:hi]), non_blocking=True)
+                self.device_done[lo:hi].copy_(torch.from_numpy(self.done[lo:hi]), non_blocking=True)
+        # the newest row's effect may not be stored yet, so it is copied again next time
+        self.num_synced = self.num_stored - 1
+
+    def sample(self, batch_size):
+        """Same batch as MemoryOptimizedReplayBuffer.sample, as tensors on ptu.device
+        (actions are int64, done_mask is float32)."""
+        assert self.can_sample(batch_size)
+        self._sync()
+        # the oldest num_in_buffer - 1 transitions; the newest has no next obs yet
+        oldest = self.next_idx - self.num_in_buffer
+        idxes = (torch.randint(0, self.num_in_buffer - 1, (batch_size,), device=ptu.device) + oldest) % self.size
+        next_idxes = (idxes + 1) % self.size
+        return (self.device_obs[idxes], self.device_action[idxes], self.device_reward[idxes],
+                self.device_obs[next_idxes], self.device_done[idxes])
@@ -238,6 +238,10 @@ class Monitor(Wrapper):
     def get_episode_lengths(self):
         return self.stats_recorder.episode_lengths
 
+    def get_episode_stats(self):
+        """EpisodeStats over the most recent episodes"""
+        return self.stats_recorder.stats
+
 def detect_training_manifests(training_dir, files=None):
     if files is None:
         files = os.listdir(training_dir)
@@ -2,14 +2,61 @@ import json
 import os
 import time
 
+import numpy as np
 from gym import error
 from .utils import atomic_write
 from .utils.json_utils import json_encode_np
 
+class EpisodeStats(object):
+    """
+    Returns and lengths of the last `window` episodes in a fixed-size ring,
+    with the rolling mean return and the best rolling mean kept up to date
+    in O(1) per episode.
+    """
+
+    def __init__(self, window=100):
+        self.window = window
+        self.returns = np.zeros(window)
+        self.lengths = np.zeros(window, dtype=np.int64)
+        self.num_episodes = 0
+        self.return_sum = 0.0
+        self.length_sum = 0
+        # only set once more than `window` episodes have finished
+        self.best_mean_return = -float('inf')
+
+    def add(self, episode_return, episode_length):
+        i = self.num_episodes % self.window
+        if self.num_episodes >= self.window:
+            self.return_sum -= self.returns[i]
+            self.length_sum -= self.lengths[i]
+        self.returns[i] = episode_return
+        self.lengths[i] = episode_length
+        self.return_sum += episode_return
+        self.length_sum += episode_length
+        self.num_episodes += 1
+        if i == self.window - 1:
+            # resum once per lap so float error can't build up
+            self.return_sum = float(self.returns.sum())
+        if self.num_episodes > self.window:
+            self.best_mean_return = max(self.best_mean_return, self.mean_return)
+
+    def _count(self):
+        return min(self.num_episodes, self.window)
+
+    @property
+    def mean_return(self):
+        return self.return_sum / self._count() if self.num_episodes > 0 else float('nan')
+
+    @property
+    def mean_length(self):
+        return self.length_sum / self._count() if self.num_episodes > 0 else float('nan')
+
+
 class StatsRecorder(object):
     def __init__(self, directory, file_prefix, autoreset=False, env_id=None):
         self.autoreset = autoreset
         self.env_id = env_id
+        self.stats = EpisodeStats()
 
         self.initial_reset_timestamp = None
         self.directory = directory
@@ -84,6 +131,7 @@ class StatsRecorder(object):
             self.episode_lengths.append(self.steps)
             self.episode_rewards.append(float(self.rewards))
             self.timestamps.append(time.time())
+            self.stats.add(float(self.rewards), self.steps)
 
     def close(self):
         self.flush()
@@ -1,7 +1,9 @@
 import json
 import os
+import queue
 import subprocess
 import tempfile
+import threading
 import os.path
 import distutils.spawn, distutils.version
 import numpy as np
@@ -236,7 +238,11 @@ class TextEncoder(object):
         return {'backend':'TextEncoder','version':1}
 
 class ImageEncoder(object):
-    def __init__(self, output_path, frame_shape, frames_per_sec, output_frames_per_sec):
+    """Pipes frames to ffmpeg/avconv. Frames are queued and written to the
+    encoder's stdin by a background thread, so capture_frame only blocks
+    once max_queue frames are waiting."""
+
+    def __init__(self, output_path, frame_shape, frames_per_sec, output_frames_per_sec, max_queue=64):
         self.proc = None
         self.output_path = output_path
         # Frame shape should be lines-first, so w and h are swapped
@@ -248,6 +254,7 @@ class ImageEncoder(object):
         self.frame_shape = frame_shape
         self.frames_per_sec = frames_per_sec
         self.output_frames_per_sec = output_frames_per_sec
+        self.max_queue = max_queue
 
         if distutils.spawn.find_executable('avconv') is not None:
             self.backend = 'avconv'
@@ -294,6 +301,25 @@ class ImageEncoder(object):
         else:
             self.proc = subprocess.Popen(self.cmdline, stdin=subprocess.PIPE)
 
+        self.frame_queue = queue.Queue(maxsize=self.max_queue)
+        self.writer = threading.Thread(target=self._write_frames, daemon=True)
+        self.writer.start()
+
+    def _write_frames(self):
+        broken = False
+        while True:
+            frame_bytes = self.frame_queue.get()
+            if frame_bytes is None:
+                return
+            if broken:
+                # keep draining so capture_frame never blocks on a dead encoder
+                continue
+            try:
+                self.proc.stdin.write(frame_bytes)
+            except (BrokenPipeError, ValueError):
+                # encoder died; close() reports its exit status
+                broken = True
+
     def capture_frame(self, frame):
         if not isinstance(frame, (np.ndarray, np.generic)):
             raise error.InvalidFrame('Wrong type {} for {} (must be np.ndarray or np.generic)'.format(type(frame), frame))
@@ -302,12 +328,15 @@ class ImageEncoder(object):
         if frame.dtype != np.uint8:
             raise error.InvalidFrame("Your frame has data type {}, but we require uint8 (i.e. RGB values from 0-255).".format(frame.dtype))
 
+        # copy now: the env may reuse its render buffer for the next frame
         if distutils.version.LooseVersion(np.__version__) >= distutils.version.LooseVersion('1.9.0'):
-            self.proc.stdin.write(frame.tobytes())
+            self.frame_queue.put(frame.tobytes())
         else:
-            self.proc.stdin.write(frame.tostring())
+            self.frame_queue.put(frame.tostring())
 
     def close(self):
+        self.frame_queue.put(None)
+        self.writer.join()
         self.proc.stdin.close()
         ret = self.proc.wait()
         if ret != 0:
@@ -75,5 +75,12 @@ def from_numpy(*args, **kwargs):
     return torch.from_numpy(*args, **kwargs).float().to(device)
 
 
+def as_tensor(data):
+    # like from_numpy, but also takes batches that are already tensors
+    if isinstance(data, torch.Tensor):
+        return data.to(device).float()
+    return from_numpy(data)
+
+
 def to_numpy(tensor):
     return tensor.to('cpu').detach().numpy()
@@ -1,4 +1,5 @@
 from collections import OrderedDict
+import functools
 import pickle
 import os
 import sys
@@ -14,9 +15,14 @@ from rob831.infrastructure import utils
 from rob831.infrastructure.logger import Logger
 
 from rob831.agents.dqn_agent import DQNAgent
+from rob831.infrastructure.batch_prefetcher import BatchPrefetcher
 from rob831.infrastructure.dqn_utils import (
         get_wrapper_by_name,
+        LockedReplayBuffer,
+        make_env,
         register_custom_envs,
+        SerialVecEnv,
+        SubprocVecEnv,
 )
 from rob831.infrastructure.monitor import Monitor
 
@@ -91,6 +97,14 @@ class RL_Trainer(object):
         self.params['agent_params']['ac_dim'] = ac_dim
         self.params['agent_params']['ob_dim'] = ob_dim
 
+        # rgb_array rendering for video rollouts
+        self.renderer_kwargs = {
+            'height': self.params.get('video_height', 500),
+            'width': self.params.get('video_width', 500),
+            'frame_skip': self.params.get('video_frame_skip', 1),
+        }
+        self.renderer = utils.FrameRenderer(**self.renderer_kwargs)
+
         # simulation timestep, will be used for video saving
         if 'model' in dir(self.env):
             self.fps = 1/self.env.model.opt.timestep
@@ -107,7 +121,22 @@ class RL_Trainer(object):
         #############
 
         agent_class = self.params['agent_class']
-        self.agent = agent_class(self.env, self.params['agent_params'])
+        agent_env = self.env
+        num_envs = self.params.get('num_envs', 1)
+        if num_envs > 1:
+            # only the first env is monitored; it is used for episode statistics
+            env_fns = [functools.partial(make_env, self.params['env_name'], params.get('env_wrappers'))] * (num_envs - 1)
+            num_workers = self.params.get('vec_env_workers', 0)
+            if num_workers > 0:
+                # the extra envs step in worker processes, alongside the monitored one;
+                # spawned, so the workers don't inherit this process's torch/CUDA state
+                agent_env = SubprocVecEnv(env_fns, num_workers=num_workers, local_envs=[self.env],
+                                          start_method='spawn')
+            else:
+                agent_env = SerialVecEnv([self.env] + [env_fn() for env_fn in env_fns])
+            # env i gets seed + i
+            agent_env.seed(seed)
+        self.agent = agent_class(agent_env, self.params['agent_params'])
 
     def run_training_loop(self, n_iter, collect_policy, eval_policy,
                           initial_expertdata=None, relabel_with_expert=False,
@@ -126,6 +155,17 @@ class RL_Trainer(object):
         self.total_envsteps = 0
         self.start_time = time.time()
 
+        if isinstance(self.agent, DQNAgent) and self.params.get('async_actor', False):
+            return self.run_async_dqn_training_loop(n_iter)
+
+        try:
+            self._run_training_loop(n_iter, collect_policy, eval_policy, initial_expertdata,
+                                    relabel_with_expert, start_relabel_with_expert, expert_policy)
+        finally:
+            self.close_dqn_prefetcher()
+
+    def _run_training_loop(self, n_iter, collect_policy, eval_policy, initial_expertdata,
+                           relabel_with_expert, start_relabel_with_expert, expert_policy):
         print_period = 1000 if isinstance(self.agent, DQNAgent) else 1
 
         for itr in range(n_iter + 1):
@@ -150,7 +190,7 @@ class RL_Trainer(object):
             if isinstance(self.agent, DQNAgent):
                 # only perform an env step and add to replay buffer for DQN
                 self.agent.step_env()
-                envsteps_this_batch = 1
+                envsteps_this_batch = self.agent.num_envs
                 train_video_paths = None
                 paths = None
             else:
@@ -188,6 +228,36 @@ class RL_Trainer(object):
                 if self.params['save_params']:
                     self.agent.save('{}/agent_itr_{}.pt'.format(self.params['logdir'], itr))
 
+    def run_async_dqn_training_loop(self, n_iter):
+        """
+        DQN with the actor stepping envs on its own thread while this thread
+        keeps sampling and updating; logging is triggered by env steps
+        :param n_iter: number of iterations, each stepping agent.num_envs envs
+        """
+        num_env_steps = n_iter * self.agent.num_envs
+        self.agent.start_async_actor(num_env_steps)
+
+        log_freq = self.params['scalar_log_freq'] * self.agent.num_envs
+        next_log_step = 0
+        last_log = {}
+        try:
+            while self.agent.actor_running():
+                all_logs = self.train_agent()
+                if all_logs[-1]:
+                    last_log = all_logs[-1]
+
+                self.logmetrics = self.params['scalar_log_freq'] != -1 and self.agent.t >= next_log_step
+                if self.logmetrics:
+                    print('\nBeginning logging procedure...')
+                    self.total_envsteps = self.agent.t
+                    self.perform_dqn_logging([last_log])
+                    next_log_step += log_freq
+                    if self.params['save_params']:
+                        self.agent.save('{}/agent_itr_{}.pt'.format(self.params['logdir'], self.agent.t))
+        finally:
+            self.agent.stop_async_actor()
+            self.close_dqn_prefetcher()
+
     ####################################
     ####################################
 
@@ -218,34 +288,101 @@ class RL_Trainer(object):
         train_video_paths = None
         if self.logvideo:
             print('Collecting rollouts for video...')
-            train_video_paths = utils.sample_n_trajectories(
+            train_video_paths = self.sample_video_paths(collect_policy, itr, 'train_rollouts')
+
+        return paths, envsteps_this_batch, train_video_paths
+
+    def sample_video_paths(self, policy, itr, video_title):
+        """
+        Collects MAX_NVIDEO rendered rollouts and logs them as videos, either
+        streaming frames to the logger as they are rendered or, with
+        video_workers > 0, rendering in separate worker processes
+        """
+        fps = self.fps / self.renderer.frame_skip
+        num_workers = self.params.get('video_workers', 0)
+        if num_workers > 0:
+            video_paths = utils.sample_n_trajectories_in_workers(
+                self.params['env_name'],
+                policy,
+                MAX_NVIDEO,
+                MAX_VIDEO_LEN,
+                num_workers,
+                seed=self.params['seed'] + itr,
+                renderer_kwargs=self.renderer_kwargs,
+            )
+            self.logger.log_paths_as_videos(video_paths, itr, fps=fps, max_videos_to_save=MAX_NVIDEO,
+                                            video_title=video_title)
+        else:
+            stream = self.logger.video_stream(itr, max_videos_to_save=MAX_NVIDEO, fps=fps, video_title=video_title)
+            video_paths = utils.sample_n_trajectories(
                 self.env,
-                collect_policy,
+                policy,
                 MAX_NVIDEO,
                 MAX_VIDEO_LEN,
-                True
+                True,
+                renderer=self.renderer,
+                video_stream=stream,
             )
-
-        return paths, envsteps_this_batch, train_video_paths
+            stream.close()
+        return video_paths
 
     def train_agent(self):
         all_logs = []
-        for train_step in range(self.params['num_agent_train_steps_per_iter']):
-            obs_batch, act_batch, rew_batch, nobs_batch, term_batch = self.agent.sample(self.params['train_batch_size'])
-            train_log = self.agent.train(obs_batch, act_batch, rew_batch, nobs_batch, term_batch)
-            all_logs.append(train_log)
+        num_train_steps = self.params['num_agent_train_steps_per_iter']
+        prefetcher = self.batch_prefetcher(num_train_steps)
+        try:
+            for train_step in range(num_train_steps):
+                if prefetcher is None:
+                    obs_batch, act_batch, rew_batch, nobs_batch, term_batch = self.agent.sample(self.params['train_batch_size'])
+                else:
+                    obs_batch, act_batch, rew_batch, nobs_batch, term_batch = prefetcher.get()
+                train_log = self.agent.train(obs_batch, act_batch, rew_batch, nobs_batch, term_batch)
+                all_logs.append(train_log)
+        finally:
+            if prefetcher is not None and not isinstance(self.agent, DQNAgent):
+                prefetcher.close()
         return all_logs
 
+    def batch_prefetcher(self, num_train_steps):
+        """
+        Returns a BatchPrefetcher over agent.sample when prefetch_batches > 0.
+        DQN samples from a replay buffer that grows one step at a time, so its
+        prefetcher lives for the rest of the run (behind a locked buffer) and
+        is only started once learning starts and the buffer can be sampled;
+        until then DQN samples directly. Other agents only sample between
+        data collections, so they get one per call.
+        """
+        depth = self.params.get('prefetch_batches', 0)
+        if not depth:
+            return None
+        if isinstance(self.agent, DQNAgent):
+            if self.agent.prefetcher is None:
+                if (self.agent.t <= self.agent.learning_starts
+                        or not self.agent.replay_buffer.can_sample(self.params['train_batch_size'])):
+                    return None
+                if not isinstance(self.agent.replay_buffer, LockedReplayBuffer):
+                    self.agent.replay_buffer = LockedReplayBuffer(self.agent.replay_buffer)
+                self.agent.prefetcher = BatchPrefetcher(
+                    self.agent.sample, self.params['train_batch_size'], depth=depth)
+            return self.agent.prefetcher
+        return BatchPrefetcher(
+            self.agent.sample, self.params['train_batch_size'], depth=depth, num_batches=num_train_steps)
+
+    def close_dqn_prefetcher(self):
+        if isinstance(self.agent, DQNAgent) and self.agent.prefetcher is not None:
+            self.agent.prefetcher.close()
+            self.agent.prefetcher = None
+
     ####################################
     ####################################
     def perform_dqn_logging(self, all_logs):
         last_log = all_logs[-1]
 
-        episode_rewards = get_wrapper_by_name(self.env, "Monitor").get_episode_rewards()
-        if len(episode_rewards) > 0:
-            self.mean_episode_reward = np.mean(episode_rewards[-100:])
-        if len(episode_rewards) > 100:
-            self.best_mean_episode_reward = max(self.best_mean_episode_reward, self.mean_episode_reward)
+        episode_stats = get_wrapper_by_name(self.env, "Monitor").get_episode_stats()
+        if episode_stats.num_episodes > 0:
+            self.mean_episode_reward = episode_stats.mean_return
+        if episode_stats.num_episodes > 100:
+            self.best_mean_episode_reward = episode_stats.best_mean_return
 
         logs = OrderedDict()
 
@@ -267,9 +404,8 @@ class RL_Trainer(object):
 
         sys.stdout.flush()
 
-        for key, value in logs.items():
-            print('{} : {}'.format(key, value))
-            self.logger.log_scalar(value, key, self.agent.t)
+        print('\n'.join('{} : {}'.format(key, value) for key, value in logs.items()))
+        self.logger.log_scalar_dict(logs, self.agent.t)
         print('Done logging...\n\n')
 
         self.logger.flush()
@@ -285,15 +421,9 @@ class RL_Trainer(object):
 
         # save eval rollouts as videos in tensorboard event file
         if self.logvideo and train_video_paths != None:
+            # train videos were already logged while they were collected
             print('\nCollecting video rollouts eval')
-            eval_video_paths = utils.sample_n_trajectories(self.env, eval_policy, MAX_NVIDEO, MAX_VIDEO_LEN, True)
-
-            #save train/eval videos
-            print('\nSaving train rollouts as videos...')
-            self.logger.log_paths_as_videos(train_video_paths, itr, fps=self.fps, max_videos_to_save=MAX_NVIDEO,
-                                            video_title='train_rollouts')
-            self.logger.log_paths_as_videos(eval_video_paths, itr, fps=self.fps,max_videos_to_save=MAX_NVIDEO,
-                                             video_title='eval_rollouts')
+            eval_video_paths = self.sample_video_paths(eval_policy, itr, 'eval_rollouts')
 
         #######################
 
@@ -330,9 +460,8 @@ class RL_Trainer(object):
             logs["Initial_DataCollection_AverageReturn"] = self.initial_return
 
             # perform the logging
-            for key, value in logs.items():
-                print('{} : {}'.format(key, value))
-                self.logger.log_scalar(value, key, itr)
+            print('\n'.join('{} : {}'.format(key, value) for key, value in logs.items()))
+            self.logger.log_scalar_dict(logs, itr)
             print('Done logging...\n\n')
 
             self.logger.flush()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from rob831.infrastructure.sampler import sample_without_replacement
+
+
+class TrajectoryIndex(object):
+    """
+    Start/end offsets of every path stored in a ReplayBuffer's flat arrays.
+
+    Offsets are kept as absolute row counts (rows ever added), so dropping
+    the oldest rows of the buffer only means advancing num_evicted; a path
+    whose first rows were dropped is kept with its remaining rows. All
+    queries return offsets into the buffer as it is now.
+    """
+
+    def __init__(self):
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.num_added = 0
+        self.num_evicted = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, path_lengths, num_rows):
+        """Records paths appended to the buffer; num_rows is the buffer's length afterwards"""
+        ends = self.num_added + np.cumsum(path_lengths, dtype=np.int64)
+        self.starts = np.concatenate([self.starts, ends - path_lengths])
+        self.ends = np.concatenate([self.ends, ends])
+        self.num_added = int(ends[-1]) if len(ends) else self.num_added
+        self.num_evicted = self.num_added - num_rows
+        # forget paths that are gone entirely
+        first_kept = np.searchsorted(self.ends, self.num_evicted, side='right')
+        if first_kept > 0:
+            self.starts = self.starts[first_kept:]
+            self.ends = self.ends[first_kept:]
+
+    def offsets(self, path_indices=slice(None)):
+        """(starts, ends) of the given paths, as row indices into the buffer"""
+        starts = np.maximum(self.starts[path_indices], self.num_evicted) - self.num_evicted
+        return starts, self.ends[path_indices] - self.num_evicted
+
+    def last_k(self, k):
+        return self.offsets(slice(max(len(self) - k, 0), None))
+
+    def random_k(self, k):
+        return self.offsets(sample_without_replacement(len(self), k))
+
+    def first_covering(self, num_rows):
+        """Index of the oldest path such that it and all newer paths hold at least num_rows rows"""
+        buffer_len = self.num_added - self.num_evicted
+        return max(np.searchsorted(self.starts, self.num_evicted + buffer_len - num_rows, side='right') - 1, 0)
+
+    def split(self, array, start_path=0):
+        """Per-path views of array (a flat buffer array), from start_path on"""
+        starts, ends = self.offsets(slice(start_path, None))
+        return [array[start:end] for start, end in zip(starts, ends)]
@@ -1,3 +1,4 @@
+import inspect
 import numpy as np
 import time
 import copy
@@ -54,18 +55,88 @@ def mean_squared_error(a, b):
 ############################################
 ############################################
 
-def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('rgb_array')):
+class FrameRenderer(object):
+    """
+        Renders rgb_array frames of an env into a preallocated uint8 ring.
+
+        MuJoCo renders bottom-up, so the raw frame is stored as is and the
+        flip is a view. Envs whose render() takes no height/width (e.g.
+        CartPole) render at their own size, and the ring is reallocated to
+        match. A frame returned by render() is only valid until the ring
+        wraps around; copy it, or hand it to a VideoStream, to keep it.
+    """
+
+    def __init__(self, height=500, width=500, frame_skip=1, ring_size=64, camera_name='track'):
+        self.height = height
+        self.width = width
+        self.frame_skip = frame_skip
+        self.camera_name = camera_name
+        self.ring = np.empty((ring_size, height, width, 3), dtype=np.uint8)
+        self.num_frames = 0
+        self.flip = False
+
+    def reset(self, max_frames=None):
+        # make room for a whole trajectory if its frames are to be kept
+        if max_frames is not None and max_frames > self.ring.shape[0]:
+            self.ring = np.empty((max_frames, self.height, self.width, 3), dtype=np.uint8)
+        self.num_frames = 0
+
+    def render(self, env):
+        unwrapped = env.unwrapped
+        self.flip = hasattr(unwrapped, 'sim')
+        if self.flip:
+            # mujoco-py
+            slot = self._next_slot()
+            if self.camera_name in unwrapped.model.camera_names:
+                slot[:] = unwrapped.sim.render(camera_name=self.camera_name, height=self.height, width=self.width)
+            else:
+                slot[:] = unwrapped.sim.render(height=self.height, width=self.width)
+            return slot[::-1]
+        render_params = inspect.signature(unwrapped.render).parameters
+        if 'height' in render_params and 'width' in render_params:
+            frame = env.render(mode='rgb_array', height=self.height, width=self.width)
+        else:
+            frame = env.render(mode='rgb_array')
+        if frame.shape[:2] != (self.height, self.width):
+            self.height, self.width = frame.shape[:2]
+            self.ring = np.empty((self.ring.shape[0], self.height, self.width, 3), dtype=np.uint8)
+        slot = self._next_slot()
+        slot[:] = frame
+        return slot
+
+    def _next_slot(self):
+        slot = self.ring[self.num_frames % self.ring.shape[0]]
+        self.num_frames += 1
+        return slot
+
+    def frames(self):
+        """View of every frame since reset(), when they all fit in the ring"""
+        assert self.num_frames <= self.ring.shape[0], "ring wrapped, frames were overwritten"
+        frames = self.ring[:self.num_frames]
+        return frames[:, ::-1] if self.flip else frames
+
+
+def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('rgb_array'),
+                      renderer=None, video_stream=None, clip_idx=0):
+    """
+        renderer: FrameRenderer setting resolution and frame skip of rgb_array frames
+        video_stream: if given, frames are streamed to it instead of being
+            stored in the returned path
+    """
     obs = env.reset()
     obses, acts, rews, nobses, terms, imgs = [], [], [], [], [], []
     steps = 0
+    render_rgb = render and 'rgb_array' in render_mode
+    if render_rgb:
+        if renderer is None:
+            renderer = FrameRenderer()
+        renderer.reset(None if video_stream is not None else max_path_length // renderer.frame_skip + 2)
     while True:
         if render:
-            if 'rgb_array' in render_mode:
-                if hasattr(env.unwrapped, sim):
-                    if 'track' in env.unwrapped.model.camera_names:
-                        imgs.append(env.unwrapped.sim.render(camera_name='track', height=500, width=500)[::-1])
-                    else:
-                        imgs.append(env.unwrapped.sim.render(height=500, width=500)[::-1])
+            if render_rgb and steps % renderer.frame_skip == 0:
+                frame = renderer.render(env)
+                if video_stream is not None:
+                    video_stream.append(clip_idx, frame)
 
             if 'human' in render_mode:
                 env.render(mode=render_mode)
@@ -87,27 +158,60 @@ def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('
         else:
             terms.append(0)
 
+    if render_rgb and video_stream is None:
+        # one copy out of the ring, which the next trajectory reuses
+        imgs = np.array(renderer.frames())
+
     return Path(obses, imgs, acts, rews, nobses, terms)
 
-def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, render=False, render_mode=('rgb_array')):
+def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, render=False, render_mode=('rgb_array'), renderer=None):
     timesteps_this_batch = 0
     paths = []
     while timesteps_this_batch < min_timesteps_per_batch:
-        path = sample_trajectory(env, policy, max_path_length, render, render_mode)
+        path = sample_trajectory(env, policy, max_path_length, render, render_mode, renderer=renderer)
         paths.append(path)
         timesteps_this_batch += get_pathlength(path)
         print('sampled {}/{} timesteps'.format(timesteps_this_batch, min_timesteps_per_batch), end='\r')
 
     return paths, timesteps_this_batch
 
-def sample_n_trajectories(env, policy, ntraj, max_path_length, render=False, render_mode=('rgb_array')):
+def sample_n_trajectories(env, policy, ntraj, max_path_length, render=False, render_mode=('rgb_array'),
+                          renderer=None, video_stream=None):
     paths = []
     for i in range(ntraj):
-        path = sample_trajectory(env, policy, max_path_length, render, render_mode)
+        path = sample_trajectory(env, policy, max_path_length, render, render_mode,
+                                 renderer=renderer, video_stream=video_stream, clip_idx=i)
         paths.append(path)
         print('sampled {}/ {} trajs'.format(i, ntraj), end='\r')
     return paths
 
+def _sample_video_trajectory(env_name, policy, max_path_length, seed, renderer_kwargs):
+    # runs in a worker process, so it builds its own env and keeps torch on cpu
+    from rob831.infrastructure import pytorch_util as ptu
+    from rob831.infrastructure.dqn_utils import register_custom_envs
+    import gym
+    ptu.init_gpu(use_gpu=False)
+    if hasattr(policy, 'to'):
+        policy.to(ptu.device)
+    register_custom_envs()
+    env = gym.make(env_name)
+    env.seed(seed)
+    renderer = FrameRenderer(**renderer_kwargs)
+    return sample_trajectory(env, policy, max_path_length, True, ('rgb_array',), renderer=renderer)
+
+def sample_n_trajectories_in_workers(env_name, policy, ntraj, max_path_length, num_workers, seed=0, renderer_kwargs=None):
+    """
+        Collect ntraj rendered rollouts in separate worker processes, each
+        with its own copy of the env and of the policy
+    """
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    renderer_kwargs = renderer_kwargs or {}
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp.get_context('spawn')) as executor:
+        futures = [executor.submit(_sample_video_trajectory, env_name, policy, max_path_length, seed + i, renderer_kwargs)
+                   for i in range(ntraj)]
+        return [future.result() for future in futures]
+
 ############################################
 ############################################
 
@@ -116,10 +220,10 @@ def Path(obs, image_obs, acs, rewards, next_obs, terminals):
         Take info (separate arrays) from a single rollout
         and return it in a single dictionary
     """
-    if image_obs != []:
+    if isinstance(image_obs, list) and image_obs != []:
         image_obs = np.stack(image_obs, axis=0)
     return {"observation" : np.array(obs, dtype=np.float32),
-            "image_obs" : np.array(image_obs, dtype=np.uint8),
+            "image_obs" : np.asarray(image_obs, dtype=np.uint8),
             "reward" : np.array(rewards, dtype=np.float32),
             "action" : np.array(acs, dtype=np.float32),
             "next_observation": np.array(next_obs, dtype=np.float32),
@@ -126,9 +126,9 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
 class MLPPolicyAC(MLPPolicy):
     def update(self, observations, actions, adv_n=None):
         # TODOX: update the policy and return the loss
-        observations = ptu.from_numpy(observations)
-        actions = ptu.from_numpy(actions)
-        adv_n = ptu.from_numpy(adv_n)
+        observations = ptu.as_tensor(observations)
+        actions = ptu.as_tensor(actions)
+        adv_n = ptu.as_tensor(adv_n)
         self.optimizer.zero_grad()   
         action_dists = self.forward(observations)
         log_prob = action_dists.log_prob(actions)
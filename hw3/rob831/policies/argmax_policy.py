@@ -1,10 +1,14 @@
 import numpy as np
+import torch
 
 
 class ArgMaxPolicy(object):
 
-    def __init__(self, critic):
+    def __init__(self, critic, q_net=None, lock=None):
+        # q_net/lock: act with a separately synced copy of the critic's q_net
         self.critic = critic
+        self.q_net = q_net
+        self.lock = lock
 
     def get_action(self, obs):
         if len(obs.shape) > 3:
@@ -16,5 +20,15 @@ class ArgMaxPolicy(object):
         # at the current observation as the output
         # q_values = self.critic.q_net(ptu.from_numpy(observation))
         # action = q_values.argmax(dim=-1)
-        action = np.argmax(self.critic.qa_values(observation), axis=1)
+        action = np.argmax(self.qa_values(observation), axis=1)
         return action.squeeze()
+
+    def get_actions(self, obs_batch):
+        # one forward pass for a batch of observations, e.g. one per env
+        return np.argmax(self.qa_values(obs_batch), axis=1)
+
+    def qa_values(self, obs):
+        if self.lock is None:
+            return self.critic.qa_values(obs, q_net=self.q_net)
+        with self.lock, torch.no_grad():
+            return self.critic.qa_values(obs, q_net=self.q_net)
@@ -0,0 +1,58 @@
+"""
+Compares LunarLander-v3 with its headless mode (no exhaust particles):
+environment steps per second, and whether both produce the same
+observations, rewards and dones from the same seeds.
+
+    python rob831/scripts/benchmark_lunar_lander.py --num_episodes 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rob831.envs.box2d.lunar_lander import LunarLander, heuristic
+
+
+def heuristic_action(env, ob):
+    """The continuous heuristic controller, rounded to one of the 6 discrete actions"""
+    a = heuristic(env, ob)
+    return (3 if a[0] > 0 else 0) + (0 if a[1] < -0.3 else 2 if a[1] > 0.3 else 1)
+
+
+def rollout(headless, seed, num_episodes, epsilon):
+    """Runs epsilon-heuristic episodes; returns every (ob, rew, done) and the steps per second"""
+    env = LunarLander(headless=headless)
+    env._seed(seed)
+    np.random.seed(seed)  # the helipad position comes from the global RNG
+    rng = np.random.RandomState(seed + 1)
+    transitions = []
+    num_steps = 0
+    start = time.time()
+    for _ in range(num_episodes):
+        ob, done = env.reset(), False
+        while not done:
+            ac = rng.randint(env.action_space.n) if rng.rand() < epsilon else heuristic_action(env, ob)
+            ob, rew, done, _ = env.step(ac)
+            transitions.append(np.append(ob, [rew, done]))
+            num_steps += 1
+    return np.array(transitions), num_steps / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_episodes', type=int, default=20)
+    parser.add_argument('--epsilon', type=float, default=0.2)  # random actions; the rest follow the heuristic, which hovers for long episodes
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = {
+        name: rollout(headless, args.seed, args.num_episodes, args.epsilon)
+        for name, headless in [('default', False), ('headless', True)]
+    }
+    for name, (transitions, steps_per_second) in results.items():
+        print('{:>10} | {:7d} steps | {:9.0f} steps/s'.format(name, len(transitions), steps_per_second))
+    print('identical transitions:', np.array_equal(results['default'][0], results['headless'][0]))
+
+
+if __name__ == '__main__':
+    main()
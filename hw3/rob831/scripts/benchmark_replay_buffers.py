@@ -0,0 +1,78 @@
+"""
+Compares replay buffer storage backends on synthetic Atari-like frames:
+memory per transition and sampled transitions per second.
+
+    python rob831/scripts/benchmark_replay_buffers.py --size 100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rob831.infrastructure.dqn_utils import CompressedReplayBuffer, MemoryOptimizedReplayBuffer
+
+
+def atari_like_frames(num_frames, seed=0):
+    """84x84x1 uint8 frames: a fixed background with a few moving sprites"""
+    rng = np.random.RandomState(seed)
+    background = np.zeros((84, 84, 1), dtype=np.uint8)
+    background[::12] = 80
+    background[:, ::12] = 80
+    positions = rng.randint(0, 76, size=(6, 2))
+    velocities = rng.randint(-2, 3, size=(6, 2))
+    for _ in range(num_frames):
+        frame = background.copy()
+        positions = (positions + velocities) % 76
+        for y, x in positions:
+            frame[y:y + 8, x:x + 8] = 200
+        yield frame
+
+
+def fill(replay_buffer, num_frames):
+    for t, frame in enumerate(atari_like_frames(num_frames)):
+        idx = replay_buffer.store_frame(frame)
+        replay_buffer.store_effect(idx, t % 6, 0.0, t % 1000 == 999)
+
+
+def bytes_per_transition(replay_buffer):
+    if isinstance(replay_buffer, CompressedReplayBuffer):
+        # payload plus the bytes object header and list slot of every frame
+        frames = replay_buffer.frame_nbytes() + replay_buffer.num_in_buffer * (33 + 8)
+    else:
+        frames = replay_buffer.obs.nbytes
+    other = replay_buffer.action.nbytes + replay_buffer.reward.nbytes + replay_buffer.done.nbytes
+    return (frames + other) / replay_buffer.num_in_buffer
+
+
+def samples_per_second(replay_buffer, batch_size, num_batches):
+    replay_buffer.sample(batch_size)
+    start = time.time()
+    for _ in range(num_batches):
+        replay_buffer.sample(batch_size)
+    return batch_size * num_batches / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--frame_history_len', type=int, default=4)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_batches', type=int, default=500)
+    parser.add_argument('--num_threads', type=int, default=4)
+    args = parser.parse_args()
+
+    replay_buffers = {
+        'raw': MemoryOptimizedReplayBuffer(args.size, args.frame_history_len),
+        'compressed': CompressedReplayBuffer(args.size, args.frame_history_len, num_threads=args.num_threads),
+    }
+    for name, replay_buffer in replay_buffers.items():
+        start = time.time()
+        fill(replay_buffer, args.size)
+        fill_time = time.time() - start
+        print('{:>10} | {:8.1f} bytes/transition | {:9.0f} inserts/s | {:9.0f} samples/s'.format(
+            name, bytes_per_transition(replay_buffer), args.size / fill_time,
+            samples_per_second(replay_buffer, args.batch_size, args.num_batches)))
+
+
+if __name__ == '__main__':
+    main()
@@ -70,6 +70,7 @@ def main():
     parser.add_argument('--batch_size', '-b', type=int, default=1000) #steps collected per train iteration
     parser.add_argument('--eval_batch_size', '-eb', type=int, default=400) #steps collected per eval iteration
     parser.add_argument('--train_batch_size', '-tb', type=int, default=1000) ##steps used per gradient step
+    parser.add_argument('--prefetch_batches', type=int, default=0) #>0 samples this many batches ahead on a background thread
 
     parser.add_argument('--discount', type=float, default=1.0)
     parser.add_argument('--learning_rate', '-lr', type=float, default=5e-3)
@@ -83,6 +84,10 @@ def main():
     parser.add_argument('--no_gpu', '-ngpu', action='store_true')
     parser.add_argument('--which_gpu', '-gpu_id', default=0)
     parser.add_argument('--video_log_freq', type=int, default=-1)
+    parser.add_argument('--video_height', type=int, default=500)
+    parser.add_argument('--video_width', type=int, default=500)
+    parser.add_argument('--video_frame_skip', type=int, default=1) #render every n-th step of video rollouts
+    parser.add_argument('--video_workers', type=int, default=0) #>0 renders video rollouts in worker processes
     parser.add_argument('--scalar_log_freq', type=int, default=1)
 
     parser.add_argument('--save_params', action='store_true')
@@ -18,7 +18,7 @@ class Q_Trainer(object):
             'double_q': params['double_q'],
         }
 
-        env_args = get_env_kwargs(params['env_name'])
+        env_args = get_env_kwargs(params['env_name'], params['fast_atari_preprocessing'])
 
         self.agent_params = {**train_args, **env_args, **params}
 
@@ -30,8 +30,9 @@ class Q_Trainer(object):
         self.rl_trainer = RL_Trainer(self.params)
 
     def run_training_loop(self):
+        # every iteration steps num_envs envs
         self.rl_trainer.run_training_loop(
-            self.agent_params['num_timesteps'],
+            self.agent_params['num_timesteps'] // self.params['num_envs'],
             collect_policy = self.rl_trainer.agent.actor,
             eval_policy = self.rl_trainer.agent.actor,
         )
@@ -43,7 +44,7 @@ def main():
     parser.add_argument(
         '--env_name',
         default='MsPacman-v0',
-        choices=('PongNoFrameskip-v4', 'LunarLander-v3', 'MsPacman-v0')
+        choices=('PongNoFrameskip-v4', 'LunarLander-v3', 'LunarLanderHeadless-v3', 'MsPacman-v0')
     )
 
     parser.add_argument('--ep_len', type=int, default=200)
@@ -55,6 +56,19 @@ def main():
     parser.add_argument('--num_agent_train_steps_per_iter', type=int, default=1)
     parser.add_argument('--num_critic_updates_per_agent_update', type=int, default=1)
     parser.add_argument('--double_q', action='store_true')
+    parser.add_argument('--num_envs', type=int, default=1) #envs stepped together per iteration
+    parser.add_argument('--vec_env_workers', type=int, default=0) #>0 steps the extra envs in this many subprocesses
+    parser.add_argument('--updates_per_env_step', type=float, default=None) #defaults to 1/learning_freq
+    parser.add_argument('--async_actor', action='store_true') #step envs on a separate actor thread
+    parser.add_argument('--actor_sync_freq', type=int, default=100) #learner updates between actor q_net syncs
+    parser.add_argument('--max_actor_lead', type=int, default=1000) #env steps the actor may run ahead of the learner
+    parser.add_argument('--replay_buffer_dir', type=str, default=None) #keep replay frames in memory-mapped files here
+    parser.add_argument('--resume_replay_buffer', action='store_true') #reopen the buffer in replay_buffer_dir
+    parser.add_argument('--compress_replay_buffer', action='store_true') #store replay frames zlib-compressed
+    parser.add_argument('--device_replay_buffer', action='store_true') #sample LunarLander transitions on the training device
+    parser.add_argument('--shared_memory_replay_buffer', action='store_true') #with num_envs > 1, the envs write transitions into shared memory
+    parser.add_argument('--fast_atari_preprocessing', action='store_true') #grayscale and max pool raw uint8 Atari frames
+    parser.add_argument('--prefetch_batches', type=int, default=0) #>0 samples this many batches ahead on a background thread
 
     parser.add_argument('--seed', type=int, default=1)
     parser.add_argument('--no_gpu', '-ngpu', action='store_true')
@@ -0,0 +1,52 @@
+"""
+Checks that the headless LunarLander (no exhaust particles) produces the
+same transitions as the default one from the same seeds.
+"""
+
+import numpy as np
+
+from rob831.envs.box2d.lunar_lander import LunarLander, heuristic
+from rob831.infrastructure import dqn_utils
+
+
+def heuristic_action(env, ob):
+    a = heuristic(env, ob)
+    return (3 if a[0] > 0 else 0) + (0 if a[1] < -0.3 else 2 if a[1] > 0.3 else 1)
+
+
+def rollout(env, seed, num_episodes=3, epsilon=0.2):
+    env.seed(seed)
+    np.random.seed(seed)  # the helipad position comes from the global RNG
+    rng = np.random.RandomState(seed + 1)
+    transitions = []
+    for _ in range(num_episodes):
+        ob, done = env.reset(), False
+        while not done:
+            ac = rng.randint(env.action_space.n) if rng.rand() < epsilon else heuristic_action(env.unwrapped, ob)
+            ob, rew, done, _ = env.step(ac)
+            transitions.append(np.append(ob, [rew, done]))
+    return np.array(transitions)
+
+
+def test_headless_matches_default():
+    for seed in range(2):
+        default = rollout(LunarLander(), seed)
+        headless = rollout(LunarLander(headless=True), seed)
+        np.testing.assert_array_equal(headless, default)
+
+
+def test_headless_has_no_particles():
+    env = LunarLander(headless=True)
+    env.seed(0)
+    env.reset()
+    for _ in range(20):
+        env.step(2)  # main engine
+    assert not env.particles
+
+
+def test_registered_headless_env():
+    import gym
+    dqn_utils.register_custom_envs()
+    default = rollout(gym.make('LunarLander-v3'), 0, num_episodes=1)
+    headless = rollout(gym.make('LunarLanderHeadless-v3'), 0, num_episodes=1)
+    np.testing.assert_array_equal(headless, default)
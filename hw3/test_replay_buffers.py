@@ -0,0 +1,160 @@
+"""
+Checks that MemmapReplayBuffer and CompressedReplayBuffer return the same
+observations and batches as MemoryOptimizedReplayBuffer for the same data,
+and SharedMemoryReplayBuffer the same as MultiStreamReplayBuffer.
+"""
+
+import functools
+import random
+
+import numpy as np
+
+from rob831.infrastructure.dqn_utils import (
+    CompressedReplayBuffer, MemmapReplayBuffer, MemoryOptimizedReplayBuffer, MultiStreamReplayBuffer,
+    SharedMemoryReplayBuffer, SubprocVecEnv, make_env)
+
+SIZE, FRAME_HISTORY_LEN, NUM_FRAMES = 50, 4, 130
+
+
+def fill(replay_buffers, frames, lander=False):
+    """Stores the same transitions in every buffer; checks encode_recent_observation at every step"""
+    rng = np.random.RandomState(1)
+    for frame in frames:
+        idxes = [replay_buffer.store_frame(frame) for replay_buffer in replay_buffers]
+        recent = [replay_buffer.encode_recent_observation() for replay_buffer in replay_buffers]
+        for obs in recent[1:]:
+            np.testing.assert_array_equal(obs, recent[0])
+        action, reward, done = rng.randint(6), rng.randn(), rng.rand() < 0.1
+        for replay_buffer, idx in zip(replay_buffers, idxes):
+            replay_buffer.store_effect(idx, action, reward, done)
+
+
+def atari_frames():
+    return np.random.RandomState(0).randint(0, 256, size=(NUM_FRAMES, 8, 8, 1), dtype=np.uint8)
+
+
+def assert_same_batches(replay_buffers):
+    # every transition, then a seeded random batch
+    idxes = list(range(replay_buffers[0].num_in_buffer - 1))
+    batches = [list(replay_buffer._encode_sample(idxes)) for replay_buffer in replay_buffers]
+    for seed in range(3):
+        for batch, replay_buffer in zip(batches, replay_buffers):
+            random.seed(seed)
+            batch.extend(replay_buffer.sample(16))
+    for batch in batches[1:]:
+        assert len(batch) == len(batches[0]) == 20
+        for array, expected in zip(batch, batches[0]):
+            np.testing.assert_array_equal(array, expected)
+
+
+def test_memmap_matches_raw(tmp_path):
+    raw = MemoryOptimizedReplayBuffer(SIZE, FRAME_HISTORY_LEN)
+    memmap = MemmapReplayBuffer(SIZE, FRAME_HISTORY_LEN, str(tmp_path), hot_cache_size=8, metadata_freq=10)
+    fill([raw, memmap], atari_frames())
+    assert_same_batches([raw, memmap])
+
+
+def test_memmap_resume(tmp_path):
+    frames = atari_frames()
+    raw = MemoryOptimizedReplayBuffer(SIZE, FRAME_HISTORY_LEN)
+    memmap = MemmapReplayBuffer(SIZE, FRAME_HISTORY_LEN, str(tmp_path), metadata_freq=10)
+    fill([raw, memmap], frames[:100])
+    memmap.flush()
+
+    # the resumed buffer ends the interrupted episode at its last frame
+    resumed = MemmapReplayBuffer(SIZE, FRAME_HISTORY_LEN, str(tmp_path), resume=True)
+    assert (resumed.next_idx, resumed.num_in_buffer) == (raw.next_idx, raw.num_in_buffer)
+    assert resumed.done[(resumed.next_idx - 1) % SIZE]
+    raw.done[(raw.next_idx - 1) % SIZE] = True
+    fill([raw, resumed], frames[100:])
+    assert_same_batches([raw, resumed])
+
+
+def test_compressed_matches_raw():
+    raw = MemoryOptimizedReplayBuffer(SIZE, FRAME_HISTORY_LEN)
+    compressed = CompressedReplayBuffer(SIZE, FRAME_HISTORY_LEN, num_threads=2)
+    fill([raw, compressed], atari_frames())
+    assert_same_batches([raw, compressed])
+    assert compressed.frame_nbytes() > 0
+
+
+def test_lander_observations():
+    frames = np.random.RandomState(0).randn(NUM_FRAMES, 9).astype(np.float32)
+    raw = MemoryOptimizedReplayBuffer(SIZE, 1, lander=True)
+    compressed = CompressedReplayBuffer(SIZE, 1, lander=True, num_threads=1)
+    fill([raw, compressed], frames)
+    assert_same_batches([raw, compressed])
+
+
+def test_shared_memory_matches_multi_stream():
+    frames = atari_frames()
+    multi_stream = MultiStreamReplayBuffer(SIZE, FRAME_HISTORY_LEN, 2)
+    shared = SharedMemoryReplayBuffer(SIZE, FRAME_HISTORY_LEN, frames.shape[1:], 2)
+    try:
+        rng = np.random.RandomState(1)
+        for frame_pair in frames.reshape(-1, 2, *frames.shape[1:]):
+            idxes = [replay_buffer.store_frames(frame_pair) for replay_buffer in (multi_stream, shared)]
+            np.testing.assert_array_equal(shared.encode_recent_observations(),
+                                          multi_stream.encode_recent_observations())
+            actions, rewards, dones = rng.randint(6, size=2), rng.randn(2), rng.rand(2) < 0.1
+            for replay_buffer, idx in zip((multi_stream, shared), idxes):
+                replay_buffer.store_effects(idx, actions, rewards, dones)
+
+        for seed in range(3):
+            batches = []
+            for replay_buffer in (multi_stream, shared):
+                random.seed(seed)
+                np.random.seed(seed)
+                batches.append(replay_buffer.sample(16))
+            for array, expected in zip(*batches[::-1]):
+                np.testing.assert_array_equal(array, expected)
+    finally:
+        shared.close()
+
+
+def run_vec_env(replay_buffer, attach):
+    """Steps three landers, one in this process and two in a worker, storing
+    their transitions in replay_buffer as DQNAgent.step_vec_env does"""
+    env_fn = functools.partial(make_env, 'LunarLanderHeadless-v3')
+    vec_env = SubprocVecEnv([env_fn] * 2, num_workers=1, local_envs=[env_fn()], start_method='spawn')
+    try:
+        np.random.seed(0)  # the local lander places its helipad with the global RNG
+        vec_env.seed(0)
+        if attach:
+            vec_env.attach_replay_buffer(replay_buffer)
+        else:
+            last_obs = vec_env.reset()
+        rng = np.random.RandomState(1)
+        for _ in range(NUM_FRAMES):
+            if not attach:
+                idxes = replay_buffer.store_frames(last_obs)
+            actions = rng.randint(4, size=3)
+            last_obs, rewards, dones, _ = vec_env.step(actions)
+            if not attach:
+                replay_buffer.store_effects(idxes, actions, rewards, dones)
+        if attach:
+            assert last_obs is None
+        else:
+            # the attached envs store each new frame right away, the agent at its next step
+            replay_buffer.store_frames(last_obs)
+    finally:
+        vec_env.close()
+
+
+def test_vec_env_writes_shared_memory():
+    """The worker of a vec env with an attached buffer stores the same
+    transitions into shared memory as the agent stores without it"""
+    multi_stream = MultiStreamReplayBuffer(SIZE, 1, 3, lander=True)
+    shared = SharedMemoryReplayBuffer(SIZE, 1, (9,), 3, lander=True)
+    try:
+        run_vec_env(multi_stream, attach=False)
+        run_vec_env(shared, attach=True)
+        np.testing.assert_array_equal(shared.encode_recent_observations(),
+                                      multi_stream.encode_recent_observations())
+        for stream, expected_stream in zip(shared.streams, multi_stream.streams):
+            assert stream.num_in_buffer == expected_stream.num_in_buffer
+            idxes = list(range(expected_stream.num_in_buffer - 1))
+            for array, expected in zip(stream._encode_sample(idxes), expected_stream._encode_sample(idxes)):
+                np.testing.assert_array_equal(array, expected)
+    finally:
+        shared.close()
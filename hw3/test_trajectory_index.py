@@ -0,0 +1,80 @@
+"""
+Checks TrajectoryIndex offsets, eviction and first_covering, on its own and
+through ReplayBuffer.
+"""
+
+import numpy as np
+
+from rob831.infrastructure.replay_buffer import ReplayBuffer
+from rob831.infrastructure.trajectory_index import TrajectoryIndex
+from rob831.infrastructure.utils import Path
+
+
+def make_paths(lengths, start=0):
+    paths = []
+    for length in lengths:
+        obs = np.arange(start, start + length, dtype=np.float32)[:, None]
+        paths.append(Path(obs, [], np.zeros((length, 1)), obs[:, 0], obs + 1, np.arange(length) == length - 1))
+        start += length
+    return paths
+
+
+def test_offsets_without_eviction():
+    index = TrajectoryIndex()
+    index.add([3, 4, 5], 12)
+    starts, ends = index.offsets()
+    np.testing.assert_array_equal(starts, [0, 3, 7])
+    np.testing.assert_array_equal(ends, [3, 7, 12])
+    np.testing.assert_array_equal(index.last_k(2)[0], [3, 7])
+    np.testing.assert_array_equal(index.last_k(10)[0], [0, 3, 7])
+
+
+def test_eviction_trims_and_drops_paths():
+    index = TrajectoryIndex()
+    # 12 rows into a buffer of 10: the first path keeps its last row
+    index.add([3, 4, 5], 10)
+    assert len(index) == 3
+    starts, ends = index.offsets()
+    np.testing.assert_array_equal(starts, [0, 1, 5])
+    np.testing.assert_array_equal(ends, [1, 5, 10])
+
+    # 6 more rows: the first two paths are gone, the third keeps 4 rows
+    index.add([6], 10)
+    assert len(index) == 2
+    starts, ends = index.offsets()
+    np.testing.assert_array_equal(starts, [0, 4])
+    np.testing.assert_array_equal(ends, [4, 10])
+
+
+def test_first_covering():
+    index = TrajectoryIndex()
+    index.add([3, 4, 5], 12)
+    assert index.first_covering(1) == 2
+    assert index.first_covering(5) == 2
+    assert index.first_covering(6) == 1
+    assert index.first_covering(9) == 1
+    assert index.first_covering(10) == 0
+    assert index.first_covering(100) == 0
+
+    # after eviction, counts are of the rows still in the buffer
+    index.add([6], 10)
+    assert index.first_covering(6) == 1
+    assert index.first_covering(7) == 0
+
+
+def test_replay_buffer_rollouts_after_eviction():
+    replay_buffer = ReplayBuffer(max_size=10)
+    replay_buffer.add_rollouts(make_paths([3, 4, 5]))
+    replay_buffer.add_rollouts(make_paths([6], start=12))
+
+    rollouts = replay_buffer.sample_recent_rollouts(2)
+    np.testing.assert_array_equal(rollouts[0]["observation"][:, 0], [8, 9, 10, 11])
+    np.testing.assert_array_equal(rollouts[1]["observation"][:, 0], np.arange(12, 18))
+    assert [len(rews) for rews in replay_buffer.unconcatenated_rews] == [4, 6]
+
+    obs, _, unconcatenated_rews, _, _ = replay_buffer.sample_recent_data(batch_size=7, concat_rew=False)
+    np.testing.assert_array_equal(obs[:, 0], np.arange(8, 18))
+    np.testing.assert_array_equal(np.concatenate(unconcatenated_rews), np.arange(8, 18))
+
+    for rollout in replay_buffer.sample_random_rollouts(2):
+        assert rollout["terminal"][-1]
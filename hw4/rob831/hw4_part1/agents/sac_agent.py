@@ -36,8 +36,7 @@ class SACAgent(BaseAgent):
         self.critic_target_update_frequency = self.agent_params['critic_target_update_frequency']
 
         self.critic = SACCritic(self.agent_params)
-        self.critic_target = copy.deepcopy(self.critic).to(ptu.device)
-        self.critic_target.load_state_dict(self.critic.state_dict())
+        self.critic_target = self.critic.make_target()
 
         self.training_step = 0
         self.replay_buffer = ReplayBuffer(max_size=100000)
@@ -1,9 +1,12 @@
+import copy
+
 from .base_critic import BaseCritic
 from torch import nn
 from torch import optim
 import numpy as np
 from rob831.hw4_part1.infrastructure import pytorch_util as ptu
 from rob831.hw4_part1.infrastructure import sac_utils
+from rob831.hw4_part1.infrastructure.stacked_mlp import StackedMLP
 import torch
 
 class SACCritic(nn.Module, BaseCritic):
@@ -45,8 +48,14 @@ class SACCritic(nn.Module, BaseCritic):
             size=self.size,
             activation='relu'
         )
-        self.Q1.to(ptu.device)
-        self.Q2.to(ptu.device)
+        if hparams.get('fused_twin_q', False):
+            # both Q networks as one stacked network; Q1 and Q2 still work on their own
+            self.Q = StackedMLP([self.Q1, self.Q2])
+            self.Q1 = self.Q.head(0)
+            self.Q2 = self.Q.head(1)
+        else:
+            self.Q = None
+        self.to(ptu.device)
         self.loss = nn.MSELoss()
 
         self.optimizer = optim.Adam(
@@ -54,6 +63,22 @@ class SACCritic(nn.Module, BaseCritic):
             self.learning_rate,
         )
 
+    def q_values(self, obs: torch.Tensor, action: torch.Tensor):
+        """Q1 and Q2 of each (obs, action) pair, stacked: shape (2, batch)"""
+        obs_action = torch.cat([obs, action], dim=-1)
+        if self.Q is not None:
+            return self.Q(obs_action).squeeze(-1)
+        return torch.stack([self.Q1(obs_action), self.Q2(obs_action)]).squeeze(-1)
+
+    def make_target(self):
+        """A copy of the Q networks (stacked if these are) without the optimizer, for the target critic"""
+        optimizer, self.optimizer = self.optimizer, None
+        try:
+            target = copy.deepcopy(self)
+        finally:
+            self.optimizer = optimizer
+        return target.requires_grad_(False)
+
     def forward(self, obs: torch.Tensor, action: torch.Tensor):
         # TODO: get this from previous HW
         return values
@@ -0,0 +1,175 @@
+"""
+Reads tensorboard event files without importing tensorflow.
+
+Event files are TFRecord files: every record is
+    uint64 length | uint32 masked crc(length) | data | uint32 masked crc(data)
+where data is a serialized Event proto. The protos and the crc come from
+tensorboardX, which we already use for logging.
+"""
+import glob
+import json
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tensorboardX.proto import event_pb2, summary_pb2
+from tensorboardX.record_writer import RecordWriter
+
+VIDEO_TAG = 'rollouts'
+
+
+def iter_records(path):
+    """Yields the raw bytes of every record in a TFRecord file."""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(12)
+            if len(header) < 12:
+                return
+            length, = struct.unpack('Q', header[:8])
+            data = f.read(length)
+            f.read(4)  # data crc
+            if len(data) < length:
+                # the writer may still be appending to this file
+                return
+            yield data
+
+
+def iter_events(path):
+    for data in iter_records(path):
+        yield event_pb2.Event.FromString(data)
+
+
+def _scalar_value(value):
+    kind = value.WhichOneof('value')
+    if kind == 'simple_value':
+        return value.simple_value
+    if kind == 'tensor':
+        if len(value.tensor.float_val) > 0:
+            return value.tensor.float_val[0]
+        if len(value.tensor.double_val) > 0:
+            return value.tensor.double_val[0]
+    return None
+
+
+def read_scalars(path, tags=None, skip_tag=VIDEO_TAG):
+    """
+    Reads scalar curves out of a single event file.
+
+    :param path: event file
+    :param tags: tags to keep, or None for all scalar tags
+    :param skip_tag: values whose tag contains this are skipped (videos)
+    :return: {tag: (steps, values)} with numpy arrays
+    """
+    curves = {}
+    for event in iter_events(path):
+        if event.WhichOneof('what') != 'summary':
+            continue
+        for value in event.summary.value:
+            if tags is not None and value.tag not in tags:
+                continue
+            if skip_tag and skip_tag in value.tag:
+                continue
+            scalar = _scalar_value(value)
+            if scalar is None:
+                continue
+            steps, values = curves.setdefault(value.tag, ([], []))
+            steps.append(event.step)
+            values.append(scalar)
+    return {tag: (np.array(steps), np.array(values)) for tag, (steps, values) in curves.items()}
+
+
+def find_event_files(logdirs):
+    """Expands run directories (globs allowed) into their event files."""
+    if isinstance(logdirs, str):
+        logdirs = [logdirs]
+    files = []
+    for logdir in logdirs:
+        for run_dir in sorted(glob.glob(logdir)):
+            if os.path.isfile(run_dir):
+                files.append(run_dir)
+            else:
+                files.extend(sorted(glob.glob(os.path.join(run_dir, 'events*'))))
+    return files
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def _read_for_index(path):
+    curves = read_scalars(path)
+    return {tag: [steps.tolist(), values.tolist()] for tag, (steps, values) in curves.items()}
+
+
+class ResultsIndex(object):
+    """
+    Caches the scalar curves of many event files in one json file.
+
+    An entry is reused as long as its event file keeps the same size and
+    mtime, so rerunning a summary over a sweep only parses new or
+    still-growing runs.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.entries = {}
+        if index_path is not None and os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                self.entries = json.load(f)
+
+    def load(self, logdirs, tags=None, num_workers=None):
+        """
+        :param logdirs: run directories, globs or event files
+        :param tags: tags to return, or None for all
+        :param num_workers: processes used to parse stale files
+        :return: {event file: {tag: (steps, values)}}
+        """
+        files = find_event_files(logdirs)
+        keys = {path: _file_key(path) for path in files}
+        stale = [path for path in files
+                 if path not in self.entries or self.entries[path]['key'] != keys[path]]
+
+        if len(stale) > 1 and num_workers != 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                parsed = list(executor.map(_read_for_index, stale))
+        else:
+            parsed = [_read_for_index(path) for path in stale]
+
+        for path, curves in zip(stale, parsed):
+            self.entries[path] = {'key': keys[path], 'curves': curves}
+        if stale:
+            self.save()
+
+        results = {}
+        for path in files:
+            curves = self.entries[path]['curves']
+            results[path] = {tag: (np.array(steps), np.array(values))
+                             for tag, (steps, values) in curves.items()
+                             if tags is None or tag in tags}
+        return results
+
+    def save(self):
+        if self.index_path is None:
+            return
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def filter_events(path, out_dir, skip_tag=VIDEO_TAG):
+    """
+    Copies an event file into out_dir, dropping every summary value whose
+    tag contains skip_tag (by default the video rollouts).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    writer = RecordWriter(os.path.join(out_dir, os.path.basename(path)))
+    for event in iter_events(path):
+        if event.WhichOneof('what') == 'summary':
+            kept = [value for value in event.summary.value if skip_tag not in value.tag]
+            event = event_pb2.Event(wall_time=event.wall_time, step=event.step,
+                                    summary=summary_pb2.Summary(value=kept))
+        writer.write(event.SerializeToString())
+    writer.close()
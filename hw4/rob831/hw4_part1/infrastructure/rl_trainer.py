@@ -13,6 +13,7 @@ from rob831.hw4_part1.agents.mb_agent import MBAgent
 from rob831.hw4_part1.agents.mbpo_agent import MBPOAgent
 from rob831.hw4_part1.infrastructure import pytorch_util as ptu
 from rob831.hw4_part1.infrastructure import utils
+from rob831.hw4_part1.infrastructure.columnar_dataset import load_paths
 from rob831.hw4_part1.infrastructure.logger import Logger
 
 # register all of our envs
@@ -199,7 +200,7 @@ class RL_Trainer(object):
         # TODO: get this from previous HW
         if itr == 0:
             if initial_expertdata:
-                paths = pickle.load(open(self.params['expert_data'], 'rb'))
+                paths = load_paths(self.params['expert_data'])  # pickle or columnar dataset directory
                 return paths, 0, None
             else:
                 num_transitions_to_sample = self.params['batch_size_initial']
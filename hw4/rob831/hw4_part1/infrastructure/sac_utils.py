@@ -1,13 +1,32 @@
 import math
+
+import torch
 from torch import distributions as dist
 import torch.nn.functional as F
 import torch.nn as nn
 
 
 def soft_update_params(net, target_net, tau):
-    for param, target_param in zip(net.parameters(), target_net.parameters()):
-        target_param.data.copy_(tau * param.data +
-                                (1 - tau) * target_param.data)
+    # target <- target + tau * (param - target): one in-place lerp per
+    # parameter (a fused twin-Q critic has one parameter per layer)
+    with torch.no_grad():
+        for param, target_param in zip(net.parameters(), target_net.parameters()):
+            target_param.lerp_(param, tau)
+
+
+def sac_target(actor, critic_target, next_ob_no, re_n, terminal_n, gamma):
+    """
+    Soft Bellman target r + gamma * (1 - done) * (min(Q1', Q2')(s', a') - alpha * log pi(a'|s')),
+    with a' ~ pi(.|s') sampled from the squashed Gaussian. Both target Q heads
+    are evaluated in one critic_target.q_values call, without building a graph.
+    """
+    with torch.no_grad():
+        action_distribution = actor(next_ob_no)
+        next_ac_na = action_distribution.rsample()
+        log_prob_n = action_distribution.log_prob(next_ac_na).sum(-1)
+        q_tp1_n = critic_target.q_values(next_ob_no, next_ac_na).min(dim=0)[0]
+        soft_q_tp1_n = q_tp1_n - actor.alpha * log_prob_n
+        return re_n + gamma * (1 - terminal_n) * soft_q_tp1_n
 
 class TanhTransform(dist.transforms.Transform):
     domain = dist.constraints.real
@@ -4,22 +4,17 @@ Usage:
 
 Run the command
 ```
-python filter_events.py --events SOME_DIRECTORY
+python filter_events.py --event SOME_DIRECTORY/events.out.tfevents...
 ```
 
 and it will generate a directory named `SOME_DIRECTORY_filtered` with the video 
-events removed.
+events removed. Tensorflow is not needed.
 """
-from __future__ import print_function
 import os
 import sys
 import argparse
-import tqdm
 
-# Adapted from
-# https://gist.github.com/serycjon/c9ad58ecc3176d87c49b69b598f4d6c6
-
-import tensorflow as tf
+from rob831.hw4_part1.infrastructure.event_reader import filter_events
 
 
 def parse_arguments():
@@ -31,25 +26,7 @@ def parse_arguments():
 
 def main(args):
     out_path = os.path.dirname(args.event) + '_filtered'
-    writer = tf.summary.FileWriter(out_path)
-
-    total = None
-    for event in tqdm.tqdm(tf.train.summary_iterator(args.event), total=total):
-        event_type = event.WhichOneof('what')
-        if event_type != 'summary':
-            writer.add_event(event)
-        else:
-            wall_time = event.wall_time
-            step = event.step
-            filtered_values = [value for value in event.summary.value if
-                               'rollouts' not in value.tag]
-            summary = tf.Summary(value=filtered_values)
-
-            filtered_event = tf.summary.Event(summary=summary,
-                                              wall_time=wall_time,
-                                              step=step)
-            writer.add_event(filtered_event)
-    writer.close()
+    filter_events(args.event, out_path)
     return 0
 
 
@@ -28,7 +28,8 @@ class MBPO_Trainer(object):
             'learning_rate': params['sac_learning_rate'],
             'init_temperature': params['sac_init_temperature'],
             'actor_update_frequency': params['sac_actor_update_frequency'],
-            'critic_target_update_frequency': params['sac_critic_target_update_frequency']
+            'critic_target_update_frequency': params['sac_critic_target_update_frequency'],
+            'fused_twin_q': params['sac_fused_twin_q'],
         }
         
         mb_train_args = {
@@ -121,6 +122,7 @@ def main():
     parser.add_argument('--sac_actor_update_frequency', type=int, default=1)
     parser.add_argument('--sac_critic_target_update_frequency', type=int, default=1)
     parser.add_argument('--sac_train_batch_size', type=int, default=256) ##steps used per gradient step
+    parser.add_argument('--sac_fused_twin_q', action='store_true') #evaluate both SAC Q networks as one stacked network
     parser.add_argument('--sac_batch_size', type=int, default=1000) #steps collected per train iteration
     parser.add_argument('--sac_discount', type=float, default=0.99)
     parser.add_argument('--sac_init_temperature', type=float, default=1.0)
@@ -2,6 +2,7 @@ from collections import OrderedDict
 
 from rob831.hw4_part2.critics.dqn_critic import DQNCritic
 from rob831.hw4_part2.critics.cql_critic import CQLCritic
+from rob831.hw4_part2.critics.fused_critic import FusedExplorationCritic
 from rob831.hw4_part2.infrastructure.replay_buffer import ReplayBuffer
 from rob831.hw4_part2.infrastructure.utils import *
 from rob831.hw4_part2.policies.argmax_policy import ArgMaxPolicy
@@ -23,6 +24,11 @@ class ExplorationOrExploitationAgent(DQNAgent):
         self.exploration_critic = DQNCritic(agent_params, self.optimizer_spec)
         
         self.exploration_model = RNDModel(agent_params, self.optimizer_spec)
+        self.fused_critic = None
+        if agent_params.get('fused_critic_update', False):
+            # one stacked update for both critics; the RND model still trains through its own update
+            self.fused_critic = FusedExplorationCritic(
+                self.exploration_critic, self.exploitation_critic, self.exploration_model, self.optimizer_spec)
         self.explore_weight_schedule = agent_params['explore_weight_schedule']
         self.exploit_weight_schedule = agent_params['exploit_weight_schedule']
         
@@ -56,6 +62,24 @@ class ExplorationOrExploitationAgent(DQNAgent):
             explore_weight = self.explore_weight_schedule.value(self.t)
             exploit_weight = self.exploit_weight_schedule.value(self.t)
 
+            # Calculate the environment reward
+            # HINT: For part 1, env_reward is just 're_n'
+            #       After this, env_reward is 're_n' shifted by self.exploit_rew_shift,
+            #       and scaled by self.exploit_rew_scale
+            # 这里是为了方便训练 做了shift
+            env_reward = (re_n + self.exploit_rew_shift) * self.exploit_rew_scale
+
+            if self.fused_critic is not None:
+                log = self.fused_critic.update(
+                    ob_no, ac_na, next_ob_no, env_reward, terminal_n,
+                    explore_weight, exploit_weight, self.running_rnd_rew_std)
+                self.running_rnd_rew_std = self.rnd_gamma * self.running_rnd_rew_std + (1 - self.rnd_gamma) * log['Exploration Bonus Std']
+                if self.num_param_updates % self.target_update_freq == 0:
+                    self.fused_critic.update_target_network()
+                self.num_param_updates += 1
+                self.t += 1
+                return log
+
             # Run Exploration Model #
             # Evaluate the exploration model on s to get the exploration bonus
             # HINT: Normalize the exploration bonus, as RND values vary highly in magnitude.
@@ -70,13 +94,6 @@ class ExplorationOrExploitationAgent(DQNAgent):
             # HINT: See doc for definition of mixed_reward
             mixed_reward = explore_weight * expl_bonus + exploit_weight * env_reward
 
-            # Calculate the environment reward
-            # HINT: For part 1, env_reward is just 're_n'
-            #       After this, env_reward is 're_n' shifted by self.exploit_rew_shift,
-            #       and scaled by self.exploit_rew_scale
-            # 这里是为了方便训练 做了shift
-            env_reward = (re_n + self.exploit_rew_shift) * self.exploit_rew_scale
-
             # Update Critics And Exploration Model #
 
             # 1): Update the exploration model (based off s')
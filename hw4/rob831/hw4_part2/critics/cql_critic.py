@@ -64,11 +64,11 @@ class CQLCritic(BaseCritic):
             returns:
                 nothing
         """
-        ob_no = ptu.from_numpy(ob_no)
-        ac_na = ptu.from_numpy(ac_na).to(torch.long)
-        next_ob_no = ptu.from_numpy(next_ob_no)
-        reward_n = ptu.from_numpy(reward_n)
-        terminal_n = ptu.from_numpy(terminal_n)
+        ob_no = ptu.as_tensor(ob_no)
+        ac_na = ptu.as_tensor(ac_na).to(torch.long)
+        next_ob_no = ptu.as_tensor(next_ob_no)
+        reward_n = ptu.as_tensor(reward_n)
+        terminal_n = ptu.as_tensor(terminal_n)
 
         # Compute the DQN Loss 
         loss, qa_t_values, q_t_values = self.dqn_loss(
@@ -0,0 +1,113 @@
+import torch
+import torch.optim as optim
+from torch.nn import functional as F
+from torch.nn import utils
+
+from rob831.hw4_part2.infrastructure import pytorch_util as ptu
+from rob831.hw4_part2.infrastructure.stacked_mlp import StackedMLP
+
+
+class FusedExplorationCritic(object):
+    """
+    Updates the exploration and exploitation DQN critics of
+    ExplorationOrExploitationAgent together, next to its exploration model.
+
+    The two critics' q_net and q_net_target become heads of StackedMLPs, so
+    each update converts the batch once, does one stacked online pass over
+    [ob; next_ob] and one stacked target pass over next_ob, and takes one
+    optimizer step on the sum of the two Huber losses. The heads share no
+    parameters, so the step is that of the two separate updates. The
+    critics keep working as before (qa_values, update_target_network) for
+    the actor and for logging.
+
+    The exploration model is only used through its own interface: its
+    forward pass gives the bonus, as in the agent's unfused path, and its
+    update trains it with its own optimizer.
+    """
+
+    def __init__(self, exploration_critic, exploitation_critic, exploration_model, optimizer_spec):
+        self.exploration_critic = exploration_critic
+        self.exploitation_critic = exploitation_critic
+        self.exploration_model = exploration_model
+        critics = [exploration_critic, exploitation_critic]
+
+        self.q_net = StackedMLP([critic.q_net for critic in critics]).to(ptu.device)
+        self.q_net_target = StackedMLP([critic.q_net_target for critic in critics]).to(ptu.device)
+        for head, critic in enumerate(critics):
+            critic.q_net = self.q_net.head(head)
+            critic.q_net_target = self.q_net_target.head(head)
+
+        self.gamma = exploitation_critic.gamma
+        self.double_q = exploitation_critic.double_q
+        self.grad_norm_clipping = exploitation_critic.grad_norm_clipping
+        self.optimizer = optimizer_spec.constructor(
+            self.q_net.parameters(),
+            **optimizer_spec.optim_kwargs
+        )
+        self.learning_rate_scheduler = optim.lr_scheduler.LambdaLR(
+            self.optimizer,
+            optimizer_spec.learning_rate_schedule,
+        )
+
+    def update(self, ob_no, ac_na, next_ob_no, env_reward_n, terminal_n,
+               explore_weight, exploit_weight, rnd_std):
+        """
+            arguments:
+                env_reward_n: reward for the exploitation critic (already shifted and scaled)
+                explore_weight, exploit_weight: weights of the mixed exploration reward
+                rnd_std: running std used to normalize the RND bonus
+            returns:
+                the per-head losses and the exploration model's loss under
+                the agent's log keys, plus the std of this batch's
+                exploration bonus ('Exploration Bonus Std')
+        """
+        model_ob_no = ob_no
+        ob_no = ptu.as_tensor(ob_no)
+        ac_na = ptu.as_tensor(ac_na).to(torch.long)
+        next_ob_no = ptu.as_tensor(next_ob_no)
+        env_reward_n = ptu.as_tensor(env_reward_n)
+        terminal_n = ptu.as_tensor(terminal_n)
+        batch_size = ob_no.shape[0]
+
+        with torch.no_grad():
+            bonus = self.exploration_model(ob_no)
+        expl_bonus = (bonus - bonus.mean()) / (rnd_std + 1e-8)
+        mixed_reward = explore_weight * expl_bonus + exploit_weight * env_reward_n
+        reward_gn = torch.stack([mixed_reward, env_reward_n])
+
+        if self.double_q:
+            qa_values = self.q_net(torch.cat([ob_no, next_ob_no]))
+            qa_t_values, qa_tp1_online = qa_values[:, :batch_size], qa_values[:, batch_size:]
+        else:
+            qa_t_values = self.q_net(ob_no)
+        with torch.no_grad():
+            qa_tp1_values = self.q_net_target(next_ob_no)
+            if self.double_q:
+                next_actions = qa_tp1_online.argmax(dim=2, keepdim=True)
+                q_tp1 = qa_tp1_values.gather(2, next_actions).squeeze(2)
+            else:
+                q_tp1, _ = qa_tp1_values.max(dim=2)
+            target = reward_gn + self.gamma * q_tp1 * (1 - terminal_n)
+
+        actions = ac_na.view(1, -1, 1).expand(qa_t_values.shape[0], -1, 1)
+        q_t_values = qa_t_values.gather(2, actions).squeeze(2)
+        # Huber loss per head, as in DQNCritic
+        critic_losses = F.smooth_l1_loss(q_t_values, target, reduction='none').mean(dim=1)
+
+        self.optimizer.zero_grad()
+        critic_losses.sum().backward()
+        utils.clip_grad_value_(self.q_net.parameters(), self.grad_norm_clipping)
+        self.optimizer.step()
+        self.learning_rate_scheduler.step()
+        expl_model_loss = self.exploration_model.update(model_ob_no)
+
+        critic_losses = ptu.to_numpy(critic_losses)
+        return {
+            'Exploration Critic Loss': critic_losses[0],
+            'Exploitation Critic Loss': critic_losses[1],
+            'Exploration Model Loss': expl_model_loss,
+            'Exploration Bonus Std': bonus.std(correction=0).item(),
+        }
+
+    def update_target_network(self):
+        self.q_net_target.load_state_dict(self.q_net.state_dict())
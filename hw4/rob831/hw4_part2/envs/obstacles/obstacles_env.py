@@ -37,6 +37,18 @@ class Obstacles(gym.Env):
         self.obstacles.append([-0.1, 0.2, 0.15, 0.4])
         self.obstacles.append([0.1, -0.7, 0.3, 0.15])
 
+        #obstacle bounds as arrays of shape (num_obstacles,), so that collision
+        #checks can broadcast over a whole batch of points at once
+        obstacles = np.array(self.obstacles)
+        self.obstacle_min_x = obstacles[:, 0]
+        self.obstacle_max_x = obstacles[:, 0] + obstacles[:, 2]
+        self.obstacle_min_y = obstacles[:, 1] - obstacles[:, 3]
+        self.obstacle_max_y = obstacles[:, 1]
+
+        # old way
+        self.a = self.boundary_min + (self.boundary_max-self.boundary_min)/3.0
+        self.b = self.boundary_min + 2*(self.boundary_max-self.boundary_min)/3.0
+
         self.eps = 0.1
         self.fig = self.plt.figure()
 
@@ -192,33 +204,57 @@ class Obstacles(gym.Env):
         return img
 
     def is_valid(self, dat):
+        # single point (1, 2): True if it is in bounds and not in any obstacle
+        return bool(np.all(self.is_valid_batch(dat)))
 
-        oob_mask = np.any(self.oob(dat), axis=1)
+    def is_valid_batch(self, dat):
 
-        # old way
-        self.a = self.boundary_min + (self.boundary_max-self.boundary_min)/3.0
-        self.b = self.boundary_min + 2*(self.boundary_max-self.boundary_min)/3.0
-        data_mask = (dat[:, 0] < self.a) | (dat[:, 0] > self.b) | \
-                    (dat[:, 1] < self.a) | (dat[:, 1] > self.b)
+        """check B points against the boundaries and all obstacles at once
 
-        #
-        in_obstacle = False
-        for obstacle in self.obstacles:
-            tl_x = obstacle[0]
-            tl_y = obstacle[1]
-            tr_x = tl_x + obstacle[2]
-            tr_y = tl_y
-            bl_x = tl_x
-            bl_y = tl_y - obstacle[3]
-            br_x = tr_x
-            br_y = bl_y
+        Args:
+            dat: (batchsize, 2) or (2,) array of positions
+
+        Return:
+            valid: boolean mask of shape (batchsize,)
+        """
+
+        dat = np.atleast_2d(dat)
+        x = dat[:, 0:1]
+        y = dat[:, 1:2]
+
+        #(batchsize, num_obstacles)
+        in_obstacle = (x > self.obstacle_min_x) & (x < self.obstacle_max_x) & \
+                      (y > self.obstacle_min_y) & (y < self.obstacle_max_y)
+
+        oob_mask = np.any(self.oob(dat[:, :2]), axis=1)
+        return ~(oob_mask | np.any(in_obstacle, axis=1))
+
+    def step_batch(self, observations, actions):
+
+        """step B copies of the env at once, without touching self.current
+
+        Args:
+            observations: (batchsize, obs_dim)
+            actions: (batchsize, ac_dim)
+
+        Return:
+            obs: next observations, (batchsize, obs_dim)
+            r_total: rewards, (batchsize,)
+            done: (batchsize,)
+        """
+
+        actions = np.clip(actions, -1, 1) #clip (-1, 1)
+        actions = actions / 10. #scale (-1,1) to (-0.1, 0.1)
 
-            if dat[:, 0]>tl_x and dat[:, 0]<tr_x and dat[:, 1]>bl_y and dat[:, 1]<tl_y:
-                in_obstacle = True
-                return False
+        # move only the points whose move is valid, same as step
+        current = observations[:, :2]
+        temp = current + actions
+        valid = self.is_valid_batch(temp)
+        next_pos = np.where(valid[:, None], temp, current)
 
-        # not in obstacle, so return whether or not its in bounds
-        return (not oob_mask)
+        obs = np.concatenate([next_pos, observations[:, 2:]], axis=1)
+        reward, done = self.get_reward(obs, actions)
+        return obs, reward, done
 
 
     def oob(self, x):
@@ -0,0 +1,97 @@
+"""
+Columnar on-disk format for expert and offline datasets.
+
+A dataset is a directory with one .npy file per field, holding the rows
+of every path back to back, plus path_offsets.npy: path i is rows
+path_offsets[i]:path_offsets[i + 1] of each field. Loading memory-maps
+the files, so a dataset opens instantly however large it is, and jobs
+reading the same dataset share one copy of it through the page cache.
+
+Convert an existing pickle of paths with
+
+    python -m rob831.hw4_part2.infrastructure.columnar_dataset expert_data_Ant-v2.pkl expert_data_Ant-v2
+"""
+import os
+import pickle
+import sys
+
+import numpy as np
+
+FIELDS = ('observation', 'action', 'reward', 'next_observation', 'terminal')
+
+
+def _path_field(path, field):
+    # the pointmass offline buffers name their fields in the plural
+    if field in path:
+        return np.asarray(path[field])
+    return np.asarray(path[field + 's'])
+
+
+def save_columnar(paths, directory):
+    """Writes a list of path dicts (per-step fields only; image_obs is dropped)"""
+    os.makedirs(directory, exist_ok=True)
+    lengths = [len(_path_field(path, 'reward')) for path in paths]
+    np.save(os.path.join(directory, 'path_offsets.npy'), np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64))
+    for field in FIELDS:
+        np.save(os.path.join(directory, field + '.npy'),
+                np.concatenate([_path_field(path, field) for path in paths]))
+
+
+def convert_pickle(filename, directory):
+    with open(filename, 'rb') as f:
+        paths = pickle.load(f)
+    save_columnar(paths, directory)
+
+
+class ColumnarDataset(object):
+    """
+    A columnar dataset opened with np.load(mmap_mode=...).
+
+    Behaves as a read-only sequence of path dicts (views into the columns),
+    so it can be passed wherever a list of paths is expected;
+    convert_listofrollouts returns its columns directly instead of
+    concatenating the paths.
+    """
+
+    def __init__(self, directory, mmap_mode='r'):
+        self.directory = directory
+        self.path_offsets = np.load(os.path.join(directory, 'path_offsets.npy'))
+        self.columns = {
+            field: np.load(os.path.join(directory, field + '.npy'), mmap_mode=mmap_mode)
+            for field in FIELDS
+        }
+
+    def __len__(self):
+        return len(self.path_offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = self.path_offsets[i], self.path_offsets[i + 1]
+        return {field: column[start:end] for field, column in self.columns.items()}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def num_transitions(self):
+        return int(self.path_offsets[-1])
+
+    def split_by_path(self, field):
+        """Per-path views of one column"""
+        return np.split(self.columns[field], self.path_offsets[1:-1])
+
+
+def load_paths(filename):
+    """Opens a columnar dataset directory, or unpickles a list of paths"""
+    if os.path.isdir(filename):
+        return ColumnarDataset(filename)
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == '__main__':
+    convert_pickle(sys.argv[1], sys.argv[2])
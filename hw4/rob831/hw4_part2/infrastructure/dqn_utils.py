@@ -35,6 +35,15 @@ def register_custom_envs():
             max_episode_steps=1000,
             reward_threshold=200,
         )
+    if 'LunarLanderHeadless-v3' not in registry.env_specs:
+        # same dynamics as LunarLander-v3, without the exhaust particles
+        register(
+            id='LunarLanderHeadless-v3',
+            entry_point='rob831.hw4_part2.envs.box2d.lunar_lander:LunarLander',
+            max_episode_steps=1000,
+            reward_threshold=200,
+            kwargs={'headless': True},
+        )
     if 'PointmassEasy-v0' not in registry.env_specs:
         register(
             id='PointmassEasy-v0',
@@ -79,7 +88,7 @@ def get_env_kwargs(env_name):
         kwargs['optimizer_spec'] = atari_optimizer(kwargs['num_timesteps'])
         kwargs['exploration_schedule'] = atari_exploration_schedule(kwargs['num_timesteps'])
 
-    elif env_name == 'LunarLander-v3':
+    elif env_name in ['LunarLander-v3', 'LunarLanderHeadless-v3']:
         def lunar_empty_wrapper(env):
             return env
         kwargs = {
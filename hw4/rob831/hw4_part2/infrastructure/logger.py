@@ -1,18 +1,268 @@
+import atexit
+import json
+import multiprocessing as mp
 import os
+import queue
+import threading
 from tensorboardX import SummaryWriter
 import numpy as np
 
+
+class AsyncScalarWriter(object):
+    """
+    Writes batches of scalars from a background thread.
+
+    Each batch is a (step, {name: value}) pair; it is written to the
+    tensorboard summary writer and appended as one line to a JSONL file.
+    The event file is only flushed once the queue has drained, so many
+    logging steps share a single disk write.
+    """
+
+    def __init__(self, summ_writer, jsonl_path=None, max_queue=1000):
+        self._summ_writer = summ_writer
+        self._jsonl_file = open(jsonl_path, 'a') if jsonl_path is not None else None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, step, scalar_dict):
+        # blocks if the writer falls max_queue batches behind
+        self._queue.put((step, scalar_dict))
+
+    def flush(self):
+        """Wait until every queued batch has been written to disk."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._jsonl_file is not None:
+            self._jsonl_file.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    self._write_to_disk()
+                    return
+                step, scalar_dict = item
+                for name, value in scalar_dict.items():
+                    self._summ_writer.add_scalar(name, value, step)
+                if self._jsonl_file is not None:
+                    record = {'step': step}
+                    record.update(scalar_dict)
+                    self._jsonl_file.write(json.dumps(record) + '\n')
+                if self._queue.empty():
+                    self._write_to_disk()
+            finally:
+                self._queue.task_done()
+
+    def _write_to_disk(self):
+        self._summ_writer.flush()
+        if self._jsonl_file is not None:
+            self._jsonl_file.flush()
+
+
+def downscale_frames(frames, factor):
+    """Strided downscale of (..., H, W, C) frames by an integer factor."""
+    if factor <= 1:
+        return frames
+    return frames[..., ::factor, ::factor, :]
+
+
+def pad_videos(clips):
+    """
+    Stacks (T_i, H, W, C) clips into one [N, T, C, H, W] array, repeating
+    the last frame of the shorter clips. The output is allocated once and
+    filled in place instead of tiling and concatenating each clip.
+    """
+    max_length = max(clip.shape[0] for clip in clips)
+    _, h, w, c = clips[0].shape
+    videos = np.empty((len(clips), max_length, c, h, w), dtype=np.uint8)
+    for i, clip in enumerate(clips):
+        videos[i, :clip.shape[0]] = np.transpose(clip, [0, 3, 1, 2])
+        videos[i, clip.shape[0]:] = videos[i, clip.shape[0] - 1]
+    return videos
+
+
+def _encode_videos(log_dir, messages):
+    """
+    Body of the video encoder process. Its event file goes in a videos/
+    subdirectory of the run, so the run directory keeps a single event
+    file of scalars for the result readers.
+    """
+    summ_writer = SummaryWriter(os.path.join(log_dir, 'videos'))
+    clips = {}
+    while True:
+        message = messages.get()
+        if message is None:
+            break
+        kind, key = message[:2]
+        if kind == 'frames':
+            clip_idx, frames = message[2:]
+            clips.setdefault(key, {}).setdefault(clip_idx, []).append(frames)
+        elif kind == 'finish':
+            name, step, fps = message[2:]
+            video = clips.pop(key, {})
+            if video:
+                videos = pad_videos([np.concatenate(video[i], 0) for i in sorted(video)])
+                summ_writer.add_video(name, videos, step, fps=fps)
+                summ_writer.flush()
+    summ_writer.close()
+
+
+class VideoEncoder(object):
+    """
+    Streams rollout frames to a background process that pads, encodes and
+    writes the videos, so the training process never holds a full 5-D
+    video array. The process is only started on the first video.
+    """
+
+    def __init__(self, log_dir, max_queue=256):
+        self._log_dir = log_dir
+        self._max_queue = max_queue
+        self._proc = None
+        self._num_videos = 0
+
+    def _start(self):
+        ctx = mp.get_context('spawn')
+        self._messages = ctx.Queue(maxsize=self._max_queue)
+        self._proc = ctx.Process(target=_encode_videos, args=(self._log_dir, self._messages), daemon=True)
+        self._proc.start()
+
+    def new_video(self):
+        if self._proc is None:
+            self._start()
+        self._num_videos += 1
+        return self._num_videos
+
+    def _put(self, message, timeout=1.0):
+        # a dead encoder never drains the queue, so don't block on it forever
+        while True:
+            try:
+                self._messages.put(message, timeout=timeout)
+                return
+            except queue.Full:
+                if not self._proc.is_alive():
+                    raise RuntimeError('video encoder process exited with code {}'.format(self._proc.exitcode))
+
+    def add_frames(self, key, clip_idx, frames):
+        # frames: (T, H, W, C) uint8; can be called repeatedly to stream a clip
+        self._put(('frames', key, clip_idx, np.ascontiguousarray(frames, dtype=np.uint8)))
+
+    def finish(self, key, name, step, fps):
+        self._put(('finish', key, name, step, fps))
+
+    def close(self):
+        if self._proc is None:
+            return
+        if self._proc.is_alive():
+            self._put(None)
+        self._proc.join()
+        self._proc = None
+
+
+class VideoStream(object):
+    """
+    Collects the frames of up to max_videos rollouts as they are rendered.
+    Frames are downscaled and sent to the encoder in chunks of chunk_size.
+    """
+
+    def __init__(self, encoder, name, step, fps, downscale=1, max_videos=2, chunk_size=32):
+        self._encoder = encoder
+        self._key = encoder.new_video()
+        self._name = name
+        self._step = step
+        self._fps = fps
+        self._downscale = downscale
+        self._max_videos = max_videos
+        self._chunk_size = chunk_size
+        self._buffers = {}
+
+    def append(self, clip_idx, frame):
+        if clip_idx >= self._max_videos:
+            return
+        buffer = self._buffers.setdefault(clip_idx, [])
+        # copy: frame may be a view into a renderer's ring buffer
+        buffer.append(np.array(downscale_frames(frame, self._downscale)))
+        if len(buffer) >= self._chunk_size:
+            self._send(clip_idx)
+
+    def extend(self, clip_idx, frames):
+        """Adds a whole (T, H, W, C) clip at once."""
+        if clip_idx >= self._max_videos:
+            return
+        self._send(clip_idx)
+        self._encoder.add_frames(self._key, clip_idx, downscale_frames(frames, self._downscale))
+
+    def _send(self, clip_idx):
+        buffer = self._buffers.get(clip_idx)
+        if buffer:
+            self._encoder.add_frames(self._key, clip_idx, np.stack(buffer, 0))
+            self._buffers[clip_idx] = []
+
+    def close(self):
+        for clip_idx in list(self._buffers):
+            self._send(clip_idx)
+        self._encoder.finish(self._key, self._name, self._step, self._fps)
+
+
 class Logger:
-    def __init__(self, log_dir, n_logged_samples=10, summary_writer=None):
+    def __init__(self, log_dir, n_logged_samples=10, summary_writer=None,
+                 async_scalars=True, scalars_jsonl='scalars.jsonl', video_downscale=1):
         self._log_dir = log_dir
         print('########################')
         print('logging outputs to ', log_dir)
         print('########################')
         self._n_logged_samples = n_logged_samples
-        self._summ_writer = SummaryWriter(log_dir, flush_secs=1, max_queue=1)
+
+        if async_scalars:
+            # scalars are batched per step and written by AsyncScalarWriter,
+            # so tensorboard's own queue no longer needs to flush every call
+            self._summ_writer = SummaryWriter(log_dir)
+            jsonl_path = os.path.join(log_dir, scalars_jsonl) if scalars_jsonl else None
+            self._scalar_writer = AsyncScalarWriter(self._summ_writer, jsonl_path)
+        else:
+            self._summ_writer = SummaryWriter(log_dir, flush_secs=1, max_queue=1)
+            self._scalar_writer = None
+        self._pending_step = None
+        self._pending_scalars = {}
+        self._closed = False
+
+        self._video_downscale = video_downscale
+        self._video_encoder = VideoEncoder(log_dir)
+
+        # make sure everything queued reaches disk, even if training crashes
+        atexit.register(self.close)
 
     def log_scalar(self, scalar, name, step_):
-        self._summ_writer.add_scalar('{}'.format(name), scalar, step_)
+        if self._scalar_writer is None:
+            self._summ_writer.add_scalar('{}'.format(name), scalar, step_)
+            return
+        if step_ != self._pending_step:
+            self._submit_pending()
+            self._pending_step = step_
+        self._pending_scalars['{}'.format(name)] = float(scalar)
+
+    def log_scalar_dict(self, scalar_dict, step):
+        """Log every entry of scalar_dict at the same step, as one batch."""
+        if self._scalar_writer is None:
+            for name, value in scalar_dict.items():
+                self.log_scalar(value, name, step)
+            return
+        self._submit_pending()
+        self._scalar_writer.write(step, {'{}'.format(name): float(value) for name, value in scalar_dict.items()})
+
+    def _submit_pending(self):
+        if self._pending_scalars:
+            self._scalar_writer.write(self._pending_step, self._pending_scalars)
+        self._pending_step = None
+        self._pending_scalars = {}
 
     def log_scalars(self, scalar_dict, group_name, step, phase):
         """Will log all scalars in the same plot."""
@@ -26,27 +276,17 @@ class Logger:
         assert len(video_frames.shape) == 5, "Need [N, T, C, H, W] input tensor for video logging!"
         self._summ_writer.add_video('{}'.format(name), video_frames, step, fps=fps)
 
-    def log_paths_as_videos(self, paths, step, max_videos_to_save=2, fps=10, video_title='video'):
-
-        # reshape the rollouts
-        videos = [np.transpose(p['image_obs'], [0, 3, 1, 2]) for p in paths]
+    def video_stream(self, step, max_videos_to_save=2, fps=10, video_title='video'):
+        """Returns a VideoStream that rollouts can append rendered frames to."""
+        return VideoStream(self._video_encoder, '{}'.format(video_title), step, fps,
+                           downscale=self._video_downscale, max_videos=max_videos_to_save)
 
-        # max rollout length
-        max_videos_to_save = np.min([max_videos_to_save, len(videos)])
-        max_length = videos[0].shape[0]
-        for i in range(max_videos_to_save):
-            if videos[i].shape[0]>max_length:
-                max_length = videos[i].shape[0]
-
-        # pad rollouts to all be same length
-        for i in range(max_videos_to_save):
-            if videos[i].shape[0]<max_length:
-                padding = np.tile([videos[i][-1]], (max_length-videos[i].shape[0],1,1,1))
-                videos[i] = np.concatenate([videos[i], padding], 0)
-
-        # log videos to tensorboard event file
-        videos = np.stack(videos[:max_videos_to_save], 0)
-        self.log_video(videos, video_title, step, fps=fps)
+    def log_paths_as_videos(self, paths, step, max_videos_to_save=2, fps=10, video_title='video'):
+        # frames are downscaled here and padded/encoded in the encoder process
+        stream = self.video_stream(step, max_videos_to_save, fps, video_title)
+        for i, p in enumerate(paths[:max_videos_to_save]):
+            stream.extend(i, p['image_obs'])
+        stream.close()
 
     def log_figures(self, figure, name, step, phase):
         """figure: matplotlib.pyplot figure handle"""
@@ -67,7 +307,21 @@ class Logger:
         self._summ_writer.export_scalars_to_json(log_path)
 
     def flush(self):
-        self._summ_writer.flush()
+        if self._scalar_writer is None:
+            self._summ_writer.flush()
+        else:
+            # hand the current batch to the writer thread without waiting on disk
+            self._submit_pending()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._scalar_writer is not None:
+            self._submit_pending()
+            self._scalar_writer.close()
+        self._video_encoder.close()
+        self._summ_writer.close()
 
 
 
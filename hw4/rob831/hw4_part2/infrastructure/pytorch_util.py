@@ -84,6 +84,13 @@ def set_device(gpu_id):
 def from_numpy(*args, **kwargs):
     return torch.from_numpy(*args, **kwargs).float().to(device)
 
+
+def as_tensor(data):
+    # like from_numpy, but also takes batches that are already tensors
+    if isinstance(data, torch.Tensor):
+        return data.to(device).float()
+    return from_numpy(data)
+
 def ones(*args, **kwargs):
     return torch.ones(*args, **kwargs).to(device)
 
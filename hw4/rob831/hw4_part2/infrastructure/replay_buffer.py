@@ -1,3 +1,6 @@
+from rob831.hw4_part2.infrastructure.columnar_dataset import ColumnarDataset
+from rob831.hw4_part2.infrastructure.sampler import EpochSampler, sample_without_replacement
+from rob831.hw4_part2.infrastructure.trajectory_index import TrajectoryIndex
 from rob831.hw4_part2.infrastructure.utils import *
 
 
@@ -6,29 +9,34 @@ class ReplayBuffer(object):
     def __init__(self, max_size=1000000):
 
         self.max_size = max_size
-        self.paths = []
+        # where each rollout lives in the arrays below; rollouts are not stored separately
+        self.trajectories = TrajectoryIndex()
         self.obs = None
         self.acs = None
         self.concatenated_rews = None
-        self.unconcatenated_rews = None
         self.next_obs = None
         self.terminals = None
 
     def add_rollouts(self, paths, noised=False):
 
-        # add new rollouts into our list of rollouts
-        for path in paths:
-            tpath = dict()
-            # print (path.keys())
-            tpath['observation'] = path['observations']
-            tpath['next_observation'] = path['next_observations']
-            tpath['reward'] = path['rewards']
-            tpath['action'] = path['actions']
-            tpath['terminal'] = path['terminals']
-            self.paths.append(tpath)
+        if isinstance(paths, ColumnarDataset):
+            # already uses the singular keys, and its columns are used as they are
+            rollouts = paths
+        else:
+            # rename the plural keys of the offline buffers
+            rollouts = []
+            for path in paths:
+                tpath = dict()
+                # print (path.keys())
+                tpath['observation'] = path['observations']
+                tpath['next_observation'] = path['next_observations']
+                tpath['reward'] = path['rewards']
+                tpath['action'] = path['actions']
+                tpath['terminal'] = path['terminals']
+                rollouts.append(tpath)
 
         # convert new rollouts into their component arrays, and append them onto our arrays
-        observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(self.paths)
+        observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(rollouts)
 
         if noised:
             observations = add_noise(observations)
@@ -40,7 +48,6 @@ class ReplayBuffer(object):
             self.next_obs = next_observations[-self.max_size:]
             self.terminals = terminals[-self.max_size:]
             self.concatenated_rews = concatenated_rews[-self.max_size:]
-            self.unconcatenated_rews = unconcatenated_rews[-self.max_size:]
         else:
             self.obs = np.concatenate([self.obs, observations])[-self.max_size:]
             self.acs = np.concatenate([self.acs, actions])[-self.max_size:]
@@ -53,21 +60,32 @@ class ReplayBuffer(object):
             self.concatenated_rews = np.concatenate(
                 [self.concatenated_rews, concatenated_rews]
             )[-self.max_size:]
-            if isinstance(unconcatenated_rews, list):
-                self.unconcatenated_rews += unconcatenated_rews  # TODO keep only latest max_size around
-            else:
-                self.unconcatenated_rews.append(unconcatenated_rews)  # TODO keep only latest max_size around
+
+        self.trajectories.add([len(rews) for rews in unconcatenated_rews], len(self.obs))
 
         print (self.terminals.sum())
     ########################################
     ########################################
 
+    def _rollouts(self, starts, ends):
+        # views into the flat arrays, not copies
+        return [
+            {"observation": self.obs[start:end], "action": self.acs[start:end],
+             "reward": self.concatenated_rews[start:end], "next_observation": self.next_obs[start:end],
+             "terminal": self.terminals[start:end]}
+            for start, end in zip(starts, ends)
+        ]
+
     def sample_random_rollouts(self, num_rollouts):
-        rand_indices = np.random.permutation(len(self.paths))[:num_rollouts]
-        return self.paths[rand_indices]
+        return self._rollouts(*self.trajectories.random_k(num_rollouts))
 
     def sample_recent_rollouts(self, num_rollouts=1):
-        return self.paths[-num_rollouts:]
+        return self._rollouts(*self.trajectories.last_k(num_rollouts))
+
+    @property
+    def unconcatenated_rews(self):
+        """Per-rollout views of concatenated_rews"""
+        return self.trajectories.split(self.concatenated_rews)
 
     def can_sample(self, batch_size):
         # print (self.obs.shape[0])
@@ -82,8 +100,17 @@ class ReplayBuffer(object):
     def sample_random_data(self, batch_size):
 
         assert self.obs.shape[0] == self.acs.shape[0] == self.concatenated_rews.shape[0] == self.next_obs.shape[0] == self.terminals.shape[0]
-        rand_indices = np.random.permutation(self.obs.shape[0])[:batch_size]
-        return self.obs[rand_indices], self.acs[rand_indices], self.concatenated_rews[rand_indices], self.next_obs[rand_indices], self.terminals[rand_indices]
+        # batch_size distinct indices in O(batch_size), however large the buffer
+        rand_indices = sample_without_replacement(self.obs.shape[0], batch_size)
+        return self._gather(rand_indices)
+
+    def _gather(self, indices):
+        return self.obs[indices], self.acs[indices], self.concatenated_rews[indices], self.next_obs[indices], self.terminals[indices]
+
+    def iterate_epoch(self, batch_size, shuffle=True):
+        """Yields batches that together cover every stored transition exactly once"""
+        for indices in EpochSampler(self.obs.shape[0], batch_size, shuffle=shuffle):
+            yield self._gather(indices)
 
     def sample(self, batch_size):
         return self.sample_random_data(batch_size)
@@ -93,14 +120,8 @@ class ReplayBuffer(object):
         if concat_rew:
             return self.obs[-batch_size:], self.acs[-batch_size:], self.concatenated_rews[-batch_size:], self.next_obs[-batch_size:], self.terminals[-batch_size:]
         else:
-            num_recent_rollouts_to_return = 0
-            num_datapoints_so_far = 0
-            index = -1
-            while num_datapoints_so_far < batch_size:
-                recent_rollout = self.paths[index]
-                index -=1
-                num_recent_rollouts_to_return +=1
-                num_datapoints_so_far += get_pathlength(recent_rollout)
-            rollouts_to_return = self.paths[-num_recent_rollouts_to_return:]
-            observations, actions, next_observations, terminals, concatenated_rews, unconcatenated_rews = convert_listofrollouts(rollouts_to_return)
-            return observations, actions, unconcatenated_rews, next_observations, terminals
+            # the most recent whole rollouts holding at least batch_size transitions, as views
+            first_path = self.trajectories.first_covering(batch_size)
+            start = self.trajectories.offsets(first_path)[0]
+            unconcatenated_rews = self.trajectories.split(self.concatenated_rews, first_path)
+            return self.obs[start:], self.acs[start:], unconcatenated_rews, self.next_obs[start:], self.terminals[start:]
@@ -13,6 +13,7 @@ from rob831.hw4_part2.infrastructure import pytorch_util as ptu
 from rob831.hw4_part2.infrastructure.atari_wrappers import ReturnWrapper
 
 from rob831.hw4_part2.infrastructure import utils
+from rob831.hw4_part2.infrastructure.columnar_dataset import load_paths
 from rob831.hw4_part2.infrastructure.logger import Logger
 
 from rob831.hw4_part2.agents.explore_or_exploit_agent import ExplorationOrExploitationAgent
@@ -228,11 +229,11 @@ class RL_Trainer(object):
         :return:
             paths: a list trajectories
             envsteps_this_batch: the sum over the numbers of environment steps in paths
-            train_video_paths: paths which also contain videos for visualization purposes
+            train_video_paths: rollouts whose frames were streamed to the logger as videos
         """
         if itr == 0:
             if initial_expertdata is not None:
-                paths = pickle.load(open(self.params['expert_data'], 'rb'))
+                paths = load_paths(self.params['expert_data'])  # pickle or columnar dataset directory
                 return paths, 0, None
             if save_expert_data_to_disk:
                 num_transitions_to_sample = self.params['batch_size_initial']
@@ -245,7 +246,7 @@ class RL_Trainer(object):
         train_video_paths = None
         if self.logvideo:
             print('\nCollecting train rollouts to be used for saving videos...')
-            train_video_paths = utils.sample_n_trajectories(self.env, collect_policy, MAX_NVIDEO, MAX_VIDEO_LEN, True)
+            train_video_paths = self.sample_video_paths(collect_policy, itr, 'train_rollouts')
 
         if save_expert_data_to_disk and itr == 0:
             with open('expert_data_{}.pkl'.format(self.params['env_name']), 'wb') as file:
@@ -253,6 +254,17 @@ class RL_Trainer(object):
 
         return paths, envsteps_this_batch, train_video_paths
 
+    def sample_video_paths(self, policy, itr, video_title):
+        """
+        Collects MAX_NVIDEO rendered rollouts, streaming their frames to the
+        logger's video encoder as they are rendered
+        """
+        stream = self.logger.video_stream(itr, max_videos_to_save=MAX_NVIDEO, fps=self.fps, video_title=video_title)
+        video_paths = utils.sample_n_trajectories(self.env, policy, MAX_NVIDEO, MAX_VIDEO_LEN, True,
+                                                  video_stream=stream)
+        stream.close()
+        return video_paths
+
     def train_agent(self):
         all_logs = []
         for train_step in range(self.params['num_agent_train_steps_per_iter']):
@@ -313,9 +325,8 @@ class RL_Trainer(object):
 
         sys.stdout.flush()
 
-        for key, value in logs.items():
-            print('{} : {}'.format(key, value))
-            self.logger.log_scalar(value, key, self.agent.t)
+        print('\n'.join('{} : {}'.format(key, value) for key, value in logs.items()))
+        self.logger.log_scalar_dict(logs, self.agent.t)
         print('Done logging...\n\n')
 
         self.logger.flush()
@@ -332,15 +343,9 @@ class RL_Trainer(object):
 
         # save eval rollouts as videos in tensorboard event file
         if self.logvideo and train_video_paths != None:
+            # the train rollouts were streamed to the logger when they were collected
             print('\nCollecting video rollouts eval')
-            eval_video_paths = utils.sample_n_trajectories(self.env, eval_policy, MAX_NVIDEO, MAX_VIDEO_LEN, True)
-
-            #save train/eval videos
-            print('\nSaving train rollouts as videos...')
-            self.logger.log_paths_as_videos(train_video_paths, itr, fps=self.fps, max_videos_to_save=MAX_NVIDEO,
-                                            video_title='train_rollouts')
-            self.logger.log_paths_as_videos(eval_video_paths, itr, fps=self.fps,max_videos_to_save=MAX_NVIDEO,
-                                             video_title='eval_rollouts')
+            self.sample_video_paths(eval_policy, itr, 'eval_rollouts')
 
         #######################
 
@@ -377,12 +382,11 @@ class RL_Trainer(object):
             logs["Initial_DataCollection_AverageReturn"] = self.initial_return
 
             # perform the logging
-            for key, value in logs.items():
-                print('{} : {}'.format(key, value))
-                try:
-                    self.logger.log_scalar(value, key, itr)
-                except:
-                    pdb.set_trace()
+            print('\n'.join('{} : {}'.format(key, value) for key, value in logs.items()))
+            try:
+                self.logger.log_scalar_dict(logs, itr)
+            except:
+                pdb.set_trace()
             print('Done logging...\n\n')
 
             self.logger.flush()
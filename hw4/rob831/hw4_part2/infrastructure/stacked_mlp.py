@@ -0,0 +1,79 @@
+import torch
+from torch import nn
+
+
+class StackedMLP(nn.Module):
+    """
+    G MLPs with identical layer shapes, evaluated together.
+
+    The weights of every Linear layer are stacked into one (G, in, out)
+    parameter, so a forward pass over all G networks is one batched matmul
+    per layer instead of G separate passes.
+    """
+
+    def __init__(self, mlps):
+        super().__init__()
+        assert self.can_stack(mlps), 'only Sequentials of Linear layers and activations can be stacked'
+        self.num_heads = len(mlps)
+        self.weights = nn.ParameterList()
+        self.biases = nn.ParameterList()
+        self.layers = []
+        for layers in zip(*mlps):
+            if isinstance(layers[0], nn.Linear):
+                self.weights.append(nn.Parameter(torch.stack([layer.weight.detach().t() for layer in layers])))
+                self.biases.append(nn.Parameter(torch.stack([layer.bias.detach()[None] for layer in layers])))
+                self.layers.append(len(self.weights) - 1)
+            else:
+                self.layers.append(layers[0])
+
+    @staticmethod
+    def can_stack(mlps):
+        for layers in zip(*mlps):
+            if isinstance(layers[0], nn.Linear):
+                if not all(isinstance(layer, nn.Linear) and layer.weight.shape == layers[0].weight.shape
+                           and layer.bias is not None for layer in layers):
+                    return False
+            elif any(len(list(layer.parameters())) > 0 or type(layer) is not type(layers[0]) for layer in layers):
+                return False
+        return all(isinstance(mlp, nn.Sequential) and len(mlp) == len(mlps[0]) for mlp in mlps)
+
+    def forward(self, x):
+        """(batch, in) or (G, batch, in) -> (G, batch, out)"""
+        if x.dim() == 2:
+            x = x.expand(self.num_heads, *x.shape)
+        for layer in self.layers:
+            if isinstance(layer, int):
+                x = torch.baddbmm(self.biases[layer], x, self.weights[layer])
+            else:
+                x = layer(x)
+        return x
+
+    def forward_head(self, x, head):
+        """Runs a single network: (batch, in) -> (batch, out)"""
+        for layer in self.layers:
+            if isinstance(layer, int):
+                x = torch.addmm(self.biases[layer][head], x, self.weights[layer][head])
+            else:
+                x = layer(x)
+        return x
+
+    def head(self, head):
+        return StackedMLPHead(self, head)
+
+
+class StackedMLPHead(nn.Module):
+    """
+    One network of a StackedMLP, callable like the MLP it replaces.
+
+    The stack is a registered submodule, so parameters() of a head are the
+    whole stack; a module holding the stack and its heads still lists each
+    parameter once.
+    """
+
+    def __init__(self, stacked, head):
+        super().__init__()
+        self.stacked = stacked
+        self.index = head
+
+    def forward(self, x):
+        return self.stacked.forward_head(x, self.index)
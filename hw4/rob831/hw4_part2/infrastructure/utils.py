@@ -1,5 +1,7 @@
 import numpy as np
 import time
+
+from rob831.hw4_part2.infrastructure.columnar_dataset import ColumnarDataset
 import copy
 
 ############################################
@@ -54,7 +56,12 @@ def mean_squared_error(a, b):
 ############################################
 ############################################
 
-def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('rgb_array')):
+def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('rgb_array'),
+                      video_stream=None, clip_idx=0):
+    """
+        video_stream: if given, rgb_array frames are streamed to it instead of
+            being stored in the returned path
+    """
     ob = env.reset()
     obs, acs, rewards, next_obs, terminals, image_obs = [], [], [], [], [], []
     steps = 0
@@ -63,11 +70,15 @@ def sample_trajectory(env, policy, max_path_length, render=False, render_mode=('
             if 'rgb_array' in render_mode:
                 if hasattr(env.unwrapped, 'sim'):
                     if 'track' in env.unwrapped.model.camera_names:
-                        image_obs.append(env.unwrapped.sim.render(camera_name='track', height=500, width=500)[::-1])
+                        frame = env.unwrapped.sim.render(camera_name='track', height=500, width=500)[::-1]
                     else:
-                        image_obs.append(env.unwrapped.sim.render(height=500, width=500)[::-1])
+                        frame = env.unwrapped.sim.render(height=500, width=500)[::-1]
                 else:
-                    image_obs.append(env.render(mode=render_mode))
+                    frame = env.render(mode=render_mode)
+                if video_stream is not None:
+                    video_stream.append(clip_idx, frame)
+                else:
+                    image_obs.append(frame)
             if 'human' in render_mode:
                 env.render(mode=render_mode)
                 time.sleep(env.model.opt.timestep)
@@ -105,12 +116,14 @@ def sample_trajectories(env, policy, min_timesteps_per_batch, max_path_length, r
 
     return paths, timesteps_this_batch
 
-def sample_n_trajectories(env, policy, ntraj, max_path_length, render=False, render_mode=('rgb_array')):
+def sample_n_trajectories(env, policy, ntraj, max_path_length, render=False, render_mode=('rgb_array'),
+                          video_stream=None):
 
     paths = []
     for i in range(ntraj):
         # collect rollout
-        path = sample_trajectory(env, policy, max_path_length, render, render_mode)
+        path = sample_trajectory(env, policy, max_path_length, render, render_mode,
+                                 video_stream=video_stream, clip_idx=i)
         paths.append(path)
 
     return paths
@@ -136,6 +149,11 @@ def convert_listofrollouts(paths):
         and return separate arrays,
         where each array is a concatenation of that array from across the rollouts
     """
+    if isinstance(paths, ColumnarDataset):
+        # already concatenated (and memory-mapped): no copies
+        columns = paths.columns
+        return (columns["observation"], columns["action"], columns["next_observation"], columns["terminal"],
+                columns["reward"], paths.split_by_path("reward"))
     observations = np.concatenate([path["observation"] for path in paths])
     actions = np.concatenate([path["action"] for path in paths])
     next_observations = np.concatenate([path["next_observation"] for path in paths])
@@ -1,26 +1,40 @@
-import glob
-import tensorflow as tf
+import argparse
+import os
+
+import numpy as np
+
+from rob831.hw4_part2.infrastructure.event_reader import ResultsIndex, read_scalars
+
+X_TAG = 'Train_EnvstepsSoFar'
+Y_TAG = 'Eval_AverageReturn'
+
+
+def align_section_results(curves):
+    """pairs each return with the env step count logged at the same step"""
+    if X_TAG not in curves or Y_TAG not in curves:
+        return [], []
+    x_steps, x_values = curves[X_TAG]
+    y_steps, y_values = curves[Y_TAG]
+    mask = np.isin(y_steps, x_steps)
+    X = x_values[np.searchsorted(x_steps, y_steps[mask])]
+    return list(X), list(y_values[mask])
+
 
 def get_section_results(file):
-    """
-        requires tensorflow==1.12.0
-    """
-    X = []
-    Y = []
-    for e in tf.train.summary_iterator(file):
-        for v in e.summary.value:
-            if v.tag == 'Train_EnvstepsSoFar':
-                X.append(v.simple_value)
-            elif v.tag == 'Eval_AverageReturn':
-                Y.append(v.simple_value)
-    return X, Y
+    return align_section_results(read_scalars(file, tags=[X_TAG, Y_TAG]))
+
 
 if __name__ == '__main__':
-    import glob
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logdir', type=str, nargs='+', required=True, help='path(s) or globs of directories contaning tensorboard results (i.e. data/q1*)')
+    parser.add_argument('--index', type=str, default=None, help='json file used to cache parsed results between calls')
+    parser.add_argument('--num_workers', type=int, default=None)
+    args = parser.parse_args()
 
-    logdir = 'data/q1_lb_rtg_na_CartPole-v0_13-09-2020_23-32-10/events*'
-    eventfile = glob.glob(logdir)[0]
+    results = ResultsIndex(args.index).load(args.logdir, tags=[X_TAG, Y_TAG], num_workers=args.num_workers)
 
-    X, Y = get_section_results(eventfile)
-    for i, (x, y) in enumerate(zip(X, Y)):
-        print('Iteration {:d} | Train steps: {:d} | Return: {}'.format(i, int(x), y))
\ No newline at end of file
+    for eventfile, curves in results.items():
+        print(os.path.dirname(eventfile))
+        X, Y = align_section_results(curves)
+        for i, (x, y) in enumerate(zip(X, Y)):
+            print('Iteration {:d} | Train steps: {:d} | Return: {}'.format(i, int(x), y))
@@ -65,6 +65,7 @@ def main():
     parser.add_argument('--rnd_output_size', type=int, default=5)
     parser.add_argument('--rnd_n_layers', type=int, default=2)
     parser.add_argument('--rnd_size', type=int, default=400)
+    parser.add_argument('--fused_critic_update', action='store_true') #update both critics in one stacked step
 
     parser.add_argument('--seed', type=int, default=2)
     parser.add_argument('--no_gpu', '-ngpu', action='store_true')
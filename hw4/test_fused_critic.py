@@ -0,0 +1,124 @@
+"""
+Checks that FusedExplorationCritic takes the same step as the separate
+DQNCritic updates and exploration model update it replaces.
+"""
+
+import copy
+
+import numpy as np
+import torch
+from torch import nn
+
+from rob831.hw4_part2.critics.dqn_critic import DQNCritic
+from rob831.hw4_part2.critics.fused_critic import FusedExplorationCritic
+from rob831.hw4_part2.exploration.base_exploration_model import BaseExplorationModel
+from rob831.hw4_part2.infrastructure import dqn_utils
+from rob831.hw4_part2.infrastructure import pytorch_util as ptu
+
+OB_DIM, AC_DIM, BATCH_SIZE = 8, 6, 32
+
+
+class LinearRND(nn.Module, BaseExplorationModel):
+    """A small exploration model with RNDModel's interface: a per-observation error and an update"""
+
+    def __init__(self, optimizer_spec):
+        super().__init__()
+        self.f = nn.Linear(OB_DIM, 5)
+        self.f_hat = nn.Linear(OB_DIM, 5)
+        self.optimizer = optimizer_spec.constructor(self.f_hat.parameters(), **optimizer_spec.optim_kwargs)
+
+    def forward(self, ob_no):
+        return torch.norm(self.f(ob_no).detach() - self.f_hat(ob_no), dim=1)
+
+    def forward_np(self, ob_no):
+        return ptu.to_numpy(self(ptu.from_numpy(ob_no)))
+
+    def update(self, ob_no):
+        loss = self(ptu.from_numpy(ob_no)).mean()
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        return loss.item()
+
+
+def make_models(double_q):
+    ptu.init_gpu(use_gpu=False)
+    torch.manual_seed(0)
+    hparams = {
+        'env_name': 'LunarLander-v3',
+        'ob_dim': OB_DIM,
+        'ac_dim': AC_DIM,
+        'double_q': double_q,
+        'grad_norm_clipping': 10,
+        'gamma': 0.99,
+        'q_func': dqn_utils.create_lander_q_network,
+    }
+    optimizer_spec = dqn_utils.lander_optimizer()
+    exploration_critic = DQNCritic(hparams, optimizer_spec)
+    exploitation_critic = DQNCritic(hparams, optimizer_spec)
+    exploration_model = LinearRND(optimizer_spec)
+    return exploration_critic, exploitation_critic, exploration_model, optimizer_spec
+
+
+def sample_batch(rng):
+    return (
+        rng.randn(BATCH_SIZE, OB_DIM).astype(np.float32),
+        rng.randint(AC_DIM, size=BATCH_SIZE),
+        rng.randn(BATCH_SIZE, OB_DIM).astype(np.float32),
+        rng.randn(BATCH_SIZE).astype(np.float32),
+        (rng.rand(BATCH_SIZE) < 0.1).astype(np.float32),
+    )
+
+
+def assert_outputs_close(module_a, module_b):
+    # the fused critics' heads hold the whole stack, so compare outputs rather than parameters
+    ob_no = ptu.from_numpy(np.random.RandomState(1).randn(16, OB_DIM).astype(np.float32))
+    np.testing.assert_allclose(ptu.to_numpy(module_a(ob_no)), ptu.to_numpy(module_b(ob_no)), rtol=1e-4, atol=1e-5)
+
+
+def check_fused_matches_separate(double_q):
+    separate = make_models(double_q)
+    fused_models = copy.deepcopy(separate)
+    fused = FusedExplorationCritic(*fused_models)
+    exploration_critic, exploitation_critic, exploration_model, _ = separate
+    explore_weight, exploit_weight, rnd_std = 0.7, 0.3, 1.5
+
+    rng = np.random.RandomState(0)
+    for _ in range(3):
+        ob_no, ac_na, next_ob_no, env_reward_n, terminal_n = sample_batch(rng)
+
+        # the agent's unfused path
+        bonus = exploration_model.forward_np(ob_no)
+        expl_bonus = (bonus - bonus.mean()) / (rnd_std + 1e-8)
+        mixed_reward = explore_weight * expl_bonus + exploit_weight * env_reward_n
+        model_loss = exploration_model.update(ob_no)
+        explore_loss = exploration_critic.update(ob_no, ac_na, next_ob_no, mixed_reward, terminal_n)
+        exploit_loss = exploitation_critic.update(ob_no, ac_na, next_ob_no, env_reward_n, terminal_n)
+
+        log = fused.update(ob_no, ac_na, next_ob_no, env_reward_n, terminal_n,
+                           explore_weight, exploit_weight, rnd_std)
+
+        np.testing.assert_allclose(log['Exploration Critic Loss'], explore_loss['Training Loss'], rtol=1e-4)
+        np.testing.assert_allclose(log['Exploitation Critic Loss'], exploit_loss['Training Loss'], rtol=1e-4)
+        np.testing.assert_allclose(log['Exploration Model Loss'], model_loss, rtol=1e-4)
+        np.testing.assert_allclose(log['Exploration Bonus Std'], bonus.std(), rtol=1e-4)
+        for critic, fused_critic in zip(separate[:2], fused_models[:2]):
+            assert_outputs_close(critic.q_net, fused_critic.q_net)
+        assert_outputs_close(exploration_model.f_hat, fused_models[2].f_hat)
+
+
+def test_fused_update_matches_separate_updates():
+    check_fused_matches_separate(double_q=False)
+
+
+def test_fused_update_matches_separate_updates_double_q():
+    check_fused_matches_separate(double_q=True)
+
+
+def test_fused_target_network_update():
+    exploration_critic, exploitation_critic, exploration_model, optimizer_spec = make_models(double_q=True)
+    fused = FusedExplorationCritic(exploration_critic, exploitation_critic, exploration_model, optimizer_spec)
+    fused.update(*sample_batch(np.random.RandomState(0)), 0.5, 0.5, 1.0)
+    fused.update_target_network()
+    for critic in [exploration_critic, exploitation_critic]:
+        assert_outputs_close(critic.q_net, critic.q_net_target)
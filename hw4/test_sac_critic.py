@@ -0,0 +1,105 @@
+"""
+Checks the fused twin-Q SACCritic against the separate Q1/Q2 networks, and
+the SAC target and soft update helpers that run on it.
+"""
+
+import numpy as np
+import torch
+from torch import nn
+
+from rob831.hw4_part1.critics.sac_critic import SACCritic
+from rob831.hw4_part1.infrastructure import pytorch_util as ptu
+from rob831.hw4_part1.infrastructure import sac_utils
+
+OB_DIM, AC_DIM, BATCH_SIZE = 5, 3, 64
+
+
+def make_critic(fused_twin_q):
+    ptu.init_gpu(use_gpu=False)
+    torch.manual_seed(0)
+    return SACCritic({
+        'ob_dim': OB_DIM, 'ac_dim': AC_DIM, 'discrete': False, 'size': 32, 'n_layers': 2,
+        'learning_rate': 3e-4, 'gamma': 0.99, 'fused_twin_q': fused_twin_q,
+    })
+
+
+class GaussianActor(nn.Module):
+    """The squashed-Gaussian policy head that sac_target expects of the actor"""
+
+    def __init__(self):
+        super().__init__()
+        self.mean = nn.Linear(OB_DIM, AC_DIM)
+        self.alpha = 0.1
+
+    def forward(self, obs):
+        return sac_utils.SquashedNormal(self.mean(obs), torch.full((len(obs), AC_DIM), 0.5))
+
+
+def sample_batch(seed):
+    rng = np.random.RandomState(seed)
+    return [ptu.from_numpy(array) for array in (
+        rng.randn(BATCH_SIZE, OB_DIM), rng.uniform(-1, 1, (BATCH_SIZE, AC_DIM)),
+        rng.randn(BATCH_SIZE), rng.randn(BATCH_SIZE, OB_DIM), rng.rand(BATCH_SIZE) < 0.1)]
+
+
+def test_fused_critic_matches_separate():
+    separate, fused = make_critic(False), make_critic(True)
+    assert sum(p.numel() for p in separate.parameters()) == sum(p.numel() for p in fused.parameters())
+    for step in range(3):
+        ob_no, ac_na, re_n, _, _ = sample_batch(step)
+        for critic in (separate, fused):
+            q_values = critic.q_values(ob_no, ac_na)
+            assert q_values.shape == (2, BATCH_SIZE)
+            loss = critic.loss(q_values, re_n.expand(2, -1))
+            critic.optimizer.zero_grad()
+            loss.backward()
+            critic.optimizer.step()
+        ob_no, ac_na = sample_batch(10)[:2]
+        np.testing.assert_allclose(ptu.to_numpy(fused.q_values(ob_no, ac_na)),
+                                   ptu.to_numpy(separate.q_values(ob_no, ac_na)), rtol=1e-4, atol=1e-5)
+        obs_action = torch.cat([ob_no, ac_na], dim=1)
+        np.testing.assert_allclose(ptu.to_numpy(fused.Q2(obs_action)),
+                                   ptu.to_numpy(separate.Q2(obs_action)), rtol=1e-4, atol=1e-5)
+
+
+def test_make_target_and_soft_update():
+    for fused_twin_q in (False, True):
+        critic = make_critic(fused_twin_q)
+        target = critic.make_target()
+        assert target.optimizer is None and critic.optimizer is not None
+        assert not any(param.requires_grad for param in target.parameters())
+        if fused_twin_q:
+            # the heads of the copy run on the copied stack
+            assert target.Q1.stacked is target.Q
+
+        ob_no, ac_na = sample_batch(0)[:2]
+        with torch.no_grad():
+            for param in critic.parameters():
+                param.add_(1.0)
+        expected = [0.995 * t + 0.005 * p for p, t in zip(critic.parameters(), target.parameters())]
+        sac_utils.soft_update_params(critic, target, 0.005)
+        for param, expected_param in zip(target.parameters(), expected):
+            np.testing.assert_allclose(ptu.to_numpy(param), ptu.to_numpy(expected_param), rtol=1e-5, atol=1e-6)
+        assert target.q_values(ob_no, ac_na).grad_fn is None
+
+
+def test_sac_target():
+    torch.manual_seed(0)
+    actor = GaussianActor()
+    _, _, re_n, next_ob_no, terminal_n = sample_batch(0)
+    terminal_n = terminal_n.float()
+    for fused_twin_q in (False, True):
+        critic_target = make_critic(fused_twin_q).make_target()
+        torch.manual_seed(1)
+        target = sac_utils.sac_target(actor, critic_target, next_ob_no, re_n, terminal_n, 0.99)
+
+        torch.manual_seed(1)
+        with torch.no_grad():
+            action_distribution = actor(next_ob_no)
+            next_ac_na = action_distribution.rsample()
+            obs_action = torch.cat([next_ob_no, next_ac_na], dim=1)
+            q_tp1 = torch.min(critic_target.Q1(obs_action), critic_target.Q2(obs_action)).squeeze(1)
+            log_prob = action_distribution.log_prob(next_ac_na).sum(1)
+            expected = re_n + 0.99 * (1 - terminal_n) * (q_tp1 - actor.alpha * log_prob)
+        assert target.shape == (BATCH_SIZE,) and target.grad_fn is None
+        np.testing.assert_allclose(ptu.to_numpy(target), ptu.to_numpy(expected), rtol=1e-5, atol=1e-6)